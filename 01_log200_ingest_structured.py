@@ -1,9 +1,11 @@
+import argparse
 import json
 import os
 import random
-import requests
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Tuple
+from logscale_client import (DEFAULT_PREVIEW_EVENTS, JSON_BACKEND, LogScaleClient,
+                             client_from_config, encode_structured, preview_lines)
 
 # Set up logging
 import logging
@@ -11,7 +13,6 @@ logging.basicConfig(level=logging.DEBUG)
 
 CONFIG_FILE = 'config.json'
 REQUIRED_FIELDS = ['logscale_api_token_structured', 'encounter_id', 'alias']
-LOGSCALE_URL = 'https://cloud.us.humio.com/api/v1/ingest/humio-structured'
 
 # Load configuration
 def load_config():
@@ -71,13 +72,13 @@ def generate_weather_event(encounter_id: str, alias: str, units: str = "metric")
     }
     return json_event
 
-def construct_curl_command(logscale_api_url, logscale_api_token, data):
+def construct_curl_command(logscale_api_url, logscale_api_token, body):
     """
     Construct a curl command for sending the structured data to LogScale.
     Args:
         logscale_api_url (str): The LogScale API URL.
         logscale_api_token (str): The LogScale API token.
-        data (List[Dict[str, Any]]): The structured data to send.
+        body (bytes): The encoded request body that is sent.
     Returns:
         str: The constructed curl command.
     """
@@ -85,51 +86,49 @@ def construct_curl_command(logscale_api_url, logscale_api_token, data):
         f"curl {logscale_api_url} -X POST "
         f"-H 'Authorization: Bearer {logscale_api_token}' "
         f"-H 'Content-Type: application/json' "
-        f"--data '{json.dumps(data)}'"
+        f"--data '{body.decode('utf-8')}'"
     )
     return curl_command
 
-def send_to_logscale(logscale_api_token: str, data: List[Dict[str, Any]]) -> Tuple[int, str]:
-    headers = {
-        "Authorization": f"Bearer {logscale_api_token}",
-        "Content-Type": "application/json"
-    }
-    structured_data = [{
-        "tags": {
-            "host": "weatherhost",
-            "source": "weatherdata"
-        },
-        "events": data
-    }]
-    curl_command = construct_curl_command(LOGSCALE_URL, logscale_api_token, structured_data)
-    
-    print(f"\nSample Message:\n{json.dumps(data[0], indent=4)}")
-    print(f"\nSample Curl Command:\n{curl_command}")
-    print("\nBreakdown of Curl Command:")
-    print("1. `curl`: Command line tool for transferring data with URLs.")
-    print(f"2. `{LOGSCALE_URL}`: The URL to which the data is sent.")
-    print("3. `-X POST`: Specifies the request method to be POST.")
-    print("4. `-H 'Authorization: Bearer {logscale_api_token}'`: Adds the authorization header with the Bearer token for authentication.")
-    print("5. `-H 'Content-Type: application/json'`: Specifies the content type of the data being sent as JSON.")
-    print("6. `--data '{json.dumps(data)}'`: The actual structured data to be sent in the body of the POST request.")
-    
-    response = requests.post(LOGSCALE_URL, json=structured_data, headers=headers)
-    return response.status_code, response.text
-
-def main():
-    if not validate_config():
-        return
-
-    config = load_config()
-    logscale_api_token = config['logscale_api_token_structured']
-    encounter_id = config['encounter_id']
-    alias = config['alias']
+def send_to_logscale(client: LogScaleClient, data: List[Dict[str, Any]], output_mode: str = 'demo',
+                     preview_events: int = DEFAULT_PREVIEW_EVENTS) -> Tuple[int, str]:
+    """
+    Encode the events once and send them to LogScale.
 
-    # Generate weather events
-    weather_events = [generate_weather_event(encounter_id, alias) for _ in range(5)]
+    The encoded bytes are reused for the demo walkthrough or, in production mode,
+    for a preview of the first `preview_events` events (0 disables it).
+    Args:
+        client (LogScaleClient): The pooled client for the structured endpoint.
+        data (List[Dict[str, Any]]): The events to send.
+        output_mode (str): Either 'demo' or 'production'.
+        preview_events (int): Number of events previewed in production mode.
+    Returns:
+        Tuple[int, str]: The HTTP status code and response text.
+    """
+    body, encoded_events = encode_structured(data)
+
+    if output_mode == 'demo':
+        curl_command = construct_curl_command(client.url, client.api_token, body)
+        print(f"\nSample Message:\n{json.dumps(data[0], indent=4)}")
+        print(f"\nSample Curl Command:\n{curl_command}")
+        print("\nBreakdown of Curl Command:")
+        print("1. `curl`: Command line tool for transferring data with URLs.")
+        print(f"2. `{client.url}`: The URL to which the data is sent.")
+        print("3. `-X POST`: Specifies the request method to be POST.")
+        print("4. `-H 'Authorization: Bearer {logscale_api_token}'`: Adds the authorization header with the Bearer token for authentication.")
+        print("5. `-H 'Content-Type: application/json'`: Specifies the content type of the data being sent as JSON.")
+        print("6. `--data '{json.dumps(data)}'`: The actual structured data to be sent in the body of the POST request.")
+    elif preview_events:
+        logging.info(f"Sending {len(encoded_events)} events ({len(body)} bytes, {JSON_BACKEND}):\n"
+                     f"{preview_lines(encoded_events, preview_events)}")
+
+    response = client.post(body=body, spooled=True)
+    return response.status_code, response.text
 
+def explain_log_line(example_event, encounter_id, alias):
+    """Print the example log line, its structure and how to search for it in LogScale."""
     # Display an example log line for user reference
-    example_log_line = json.dumps(weather_events[0], indent=4)
+    example_log_line = json.dumps(example_event, indent=4)
     print("\nExample Log Line:")
     print(example_log_line)
 
@@ -152,9 +151,61 @@ def main():
     print(f"2. Use the following query to search for your data:")
     print(f"observer.id={encounter_id} AND observer.alias={alias}")
 
+def main():
+    if not validate_config():
+        return
+
+    config = load_config()
+    # Bodies that earlier runs could not send are replayed first; this run's are spooled until accepted
+    client = client_from_config(config, 'logscale_api_token_structured', spool=True, replay='once')
+    encounter_id = config['encounter_id']
+    alias = config['alias']
+    output_mode = config.get('output_mode', 'demo')
+    preview_events = int(config.get('preview_events', DEFAULT_PREVIEW_EVENTS))
+
+    # Generate weather events
+    weather_events = [generate_weather_event(encounter_id, alias) for _ in range(5)]
+
+    if output_mode == 'demo':
+        explain_log_line(weather_events[0], encounter_id, alias)
+
     # Send data to LogScale
-    status_code, response_text = send_to_logscale(logscale_api_token, weather_events)
+    status_code, response_text = send_to_logscale(client, weather_events, output_mode, preview_events)
     logging.debug(f"Response from LogScale: Status Code: {status_code}, Response: {response_text}")
 
+def load_test(events, rate, batch_size, seed):
+    """Stream `events` synthetic structured events into LogScale at `rate` events/s."""
+    import numpy as np
+    from loadgen import run_load_test, structured_batch
+
+    if not validate_config():
+        return
+
+    config = load_config()
+    client = client_from_config(config, 'logscale_api_token_structured')
+    rng = np.random.default_rng(seed)
+    summary = run_load_test(
+        lambda size: structured_batch(rng, size, config['encounter_id'], config['alias']),
+        lambda batch: client.send_encoded(batch)['failed_events'],
+        events, rate, batch_size,
+    )
+    print(f"\nSent {summary['events']} events ({summary['failed_events']} failed) at {summary['events_per_s']:.0f} events/s")
+    print(f"Request latency: {client.latency_summary()}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    from loadgen import DEFAULT_LOAD_BATCH_SIZE, DEFAULT_LOAD_RATE
+
+    parser = argparse.ArgumentParser(description="Send synthetic structured weather events to LogScale.")
+    parser.add_argument('--load-test', action='store_true',
+                        help="stream generated batches at a controlled rate instead of sending 5 demo events")
+    parser.add_argument('--events', type=int, default=1000000, help="events to send in a load test (default: 1000000)")
+    parser.add_argument('--rate', type=float, default=DEFAULT_LOAD_RATE,
+                        help=f"target events per second, 0 for unthrottled (default: {DEFAULT_LOAD_RATE})")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_LOAD_BATCH_SIZE,
+                        help=f"events generated per batch (default: {DEFAULT_LOAD_BATCH_SIZE})")
+    parser.add_argument('--seed', type=int, default=None, help="random seed for reproducible events")
+    args = parser.parse_args()
+    if args.load_test:
+        load_test(args.events, args.rate, args.batch_size, args.seed)
+    else:
+        main()
\ No newline at end of file
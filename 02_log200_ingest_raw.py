@@ -1,9 +1,12 @@
+import argparse
 import json
 import os
 import random
 import requests
 from datetime import datetime, timedelta
 from typing import Dict, Any
+from logscale_client import (DEFAULT_PREVIEW_EVENTS, LogScaleClient, client_from_config,
+                             preview_lines, raw_batcher_from_config)
 
 # Set up logging
 import logging
@@ -11,7 +14,6 @@ logging.basicConfig(level=logging.DEBUG)
 
 CONFIG_FILE = 'config.json'
 REQUIRED_FIELDS = ['logscale_api_token_raw', 'encounter_id', 'alias']
-LOGSCALE_URL = 'https://cloud.us.humio.com/api/v1/ingest/raw'
 
 # Load configuration
 def load_config():
@@ -64,40 +66,53 @@ def construct_curl_command(logscale_api_url, logscale_api_token, raw_log):
     curl_command = f"curl {logscale_api_url} -X POST -H 'Authorization: Bearer {logscale_api_token}' -H 'Content-Type: text/plain' --data '{raw_log}'"
     return curl_command
 
-def send_to_logscale(logscale_api_url, logscale_api_token, raw_log):
-    """
-    Send raw log data to LogScale.
-    Args:
-        logscale_api_url (str): The LogScale API URL.
-        logscale_api_token (str): The LogScale API token.
-        raw_log (str): The raw log message.
-    Returns:
-        Tuple[int, str]: The HTTP status code and response text.
-    """
+def print_curl_walkthrough(client: LogScaleClient, raw_log):
+    """Print the example log, the equivalent curl command and what each part of it does."""
     logging.info("Sending raw log data to LogScale...")
-    headers = {
-        "Authorization": f"Bearer {logscale_api_token}",
-        "Content-Type": "text/plain"
-    }
-    curl_command = construct_curl_command(logscale_api_url, logscale_api_token, raw_log)
+    curl_command = construct_curl_command(client.url, client.api_token, raw_log)
     
     print(f"\nExample Log:\n{raw_log}")
     print(f"\nExample Curl Command:\n{curl_command}")
     print("\nBreakdown of Curl Command:")
     print("1. `curl`: Command line tool for transferring data with URLs.")
-    print(f"2. `{logscale_api_url}`: The URL to which the data is sent.")
+    print(f"2. `{client.url}`: The URL to which the data is sent.")
     print("3. `-X POST`: Specifies the request method to be POST.")
     print("4. `-H 'Authorization: Bearer {logscale_api_token}'`: Adds the authorization header with the Bearer token for authentication.")
     print("5. `-H 'Content-Type: text/plain'`: Specifies the content type of the data being sent as plain text.")
     print("6. `--data '{raw_log}'`: The actual raw log data to be sent in the body of the POST request.")
-    
+
+def send_to_logscale(client: LogScaleClient, raw_log, output_mode='demo', preview_events=DEFAULT_PREVIEW_EVENTS):
+    """
+    Send raw log data to LogScale.
+
+    The log is encoded once; in production mode the walkthrough is skipped and
+    only the first `preview_events` lines of the encoded body are logged.
+    Args:
+        client (LogScaleClient): The pooled client for the raw endpoint.
+        raw_log (str): The raw log message(s), newline separated.
+        output_mode (str): Either 'demo' or 'production'.
+        preview_events (int): Number of lines previewed in production mode.
+    Returns:
+        Tuple[int, str]: The HTTP status code and response text.
+    """
+    body = raw_log.encode('utf-8')
+    if output_mode == 'demo':
+        print_curl_walkthrough(client, raw_log)
+    elif preview_events:
+        line_count = body.count(b'\n') + 1
+        shown = body.split(b'\n', preview_events)[:preview_events]
+        logging.info(f"Sending {line_count} raw log lines ({len(body)} bytes):\n{preview_lines(shown, preview_events)}")
+
     try:
-        response = requests.post(logscale_api_url, data=raw_log, headers=headers)
+        response = client.post(body=body, spooled=True)
         response.raise_for_status()
         logging.info(f"Response from LogScale: Status Code: {response.status_code}, Response: {response.text}")
         return response.status_code, response.text
     except requests.RequestException as e:
-        logging.error(f"Failed to send raw log data to LogScale: {e}")
+        if client.spool is not None:
+            logging.error(f"Failed to send raw log data to LogScale, it is kept in {client.spool.directory} for replay: {e}")
+        else:
+            logging.error(f"Failed to send raw log data to LogScale: {e}")
         raise
 
 def main():
@@ -107,16 +122,21 @@ def main():
             return
 
         config = load_config()
-        logscale_api_url = LOGSCALE_URL
-        logscale_api_token = config['logscale_api_token_raw']
+        # Bodies that earlier runs could not send are replayed first; this run's are spooled until accepted
+        client = client_from_config(config, 'logscale_api_token_raw', endpoint='raw', spool=True, replay='once')
         encounter_id = config['encounter_id']
         alias = config['alias']
         units = config.get('units', 'metric')
+        output_mode = config.get('output_mode', 'demo')
+        preview_events = int(config.get('preview_events', DEFAULT_PREVIEW_EVENTS))
 
         raw_log = generate_raw_log(encounter_id, alias, units)
-        logging.info(f"Generated raw log: {raw_log}")
-        status_code, response_text = send_to_logscale(logscale_api_url, logscale_api_token, raw_log)
+        if output_mode == 'demo':
+            logging.info(f"Generated raw log: {raw_log}")
+        status_code, response_text = send_to_logscale(client, raw_log, output_mode, preview_events)
         logging.info(f"Status Code: {status_code}, Response: {response_text}")
+        if output_mode != 'demo':
+            return
 
         # Display an example log line for user reference
         print("\nExample Log Line:")
@@ -144,5 +164,44 @@ def main():
         logging.error("An error occurred: ", exc_info=True)
         print(e)
 
+def load_test(events, rate, batch_size, seed):
+    """Stream `events` synthetic raw log lines into LogScale at `rate` lines/s."""
+    import numpy as np
+    from loadgen import raw_batch, run_load_test
+
+    if not validate_config():
+        return
+
+    config = load_config()
+    client = client_from_config(config, 'logscale_api_token_raw', endpoint='raw')
+    rng = np.random.default_rng(seed)
+
+    # Lines are collected into newline-delimited bodies; failures are counted by the batcher
+    with raw_batcher_from_config(config, client) as batcher:
+        summary = run_load_test(
+            lambda size: raw_batch(rng, size, config['encounter_id'], config['alias']),
+            lambda lines: batcher.add_many(lines) or 0,
+            events, rate, batch_size,
+        )
+    stats = batcher.stats()
+    print(f"\nSent {stats['lines']} lines ({stats['failed_lines']} failed) at {summary['events_per_s']:.0f} lines/s")
+    print(f"Batches: {stats['flushes']} ({stats['avg_lines_per_flush']:.0f} lines, {stats['avg_bytes_per_flush'] / 1024:.0f} KiB on average)")
+    print(f"Request latency: {client.latency_summary()}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    from loadgen import DEFAULT_LOAD_BATCH_SIZE, DEFAULT_LOAD_RATE
+
+    parser = argparse.ArgumentParser(description="Send synthetic raw weather logs to LogScale.")
+    parser.add_argument('--load-test', action='store_true',
+                        help="stream generated batches at a controlled rate instead of sending one demo line")
+    parser.add_argument('--events', type=int, default=1000000, help="lines to send in a load test (default: 1000000)")
+    parser.add_argument('--rate', type=float, default=DEFAULT_LOAD_RATE,
+                        help=f"target lines per second, 0 for unthrottled (default: {DEFAULT_LOAD_RATE})")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_LOAD_BATCH_SIZE,
+                        help=f"lines generated per batch (default: {DEFAULT_LOAD_BATCH_SIZE})")
+    parser.add_argument('--seed', type=int, default=None, help="random seed for reproducible lines")
+    args = parser.parse_args()
+    if args.load_test:
+        load_test(args.events, args.rate, args.batch_size, args.seed)
+    else:
+        main()
\ No newline at end of file
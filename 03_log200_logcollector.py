@@ -1,13 +1,25 @@
+import argparse
 import random
 import json
 import time
 from datetime import datetime
 import logging
-from typing import List, Dict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from log_writer import FSYNC_POLICIES, writer_from_config
+from threshold_rules import load_rules
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 
+LOG_FILE_PATH = 'atmospheric_data.log'
+DEFAULT_DURATION_SECONDS = 900  # Run for 15 minutes
+HIGH_RATE_TICK_SECONDS = 0.1  # events due in high-rate mode are generated and written once per tick
+
+rng = np.random.default_rng()
+
 def load_config() -> Dict[str, str]:
     """Load and validate the configuration from the config.json file."""
     config_path = 'config.json'
@@ -28,72 +40,115 @@ def load_config() -> Dict[str, str]:
 
     return config
 
-def generate_random_data(min_val: float, max_val: float) -> float:
-    """Generate random float value within the specified range."""
-    return round(random.uniform(min_val, max_val), 2)
+def generate_atmospheric_events(encounter_id: str, units: str, count: int, site: Optional[str] = None) -> List[str]:
+    """
+    Generate a batch of atmospheric event log entries.
+
+    Readings for the whole batch are drawn at once and checked against the
+    threshold rules in atmospheric_thresholds.csv in one vectorized pass.
+    """
+    readings = {
+        'pm10': rng.uniform(0, 150, count).round(2).tolist(),
+        'pm2_5': rng.uniform(0, 100, count).round(2).tolist(),
+        'no2': rng.uniform(0, 150, count).round(2).tolist(),
+        'so2': rng.uniform(0, 100, count).round(2).tolist(),
+        'co': rng.uniform(0, 50, count).round(2).tolist(),
+        'o3': rng.uniform(0, 100, count).round(2).tolist(),
+        'aqi': rng.integers(0, 501, count).tolist(),
+    }
+    abnormal_conditions = load_rules().evaluate(readings, site)
+
+    # Each value is formatted once and reused in the summary and the raw fields
+    text = {name: [str(value) for value in values] for name, values in readings.items()}
+    raw_log_lines = []
+    for pm10, pm2_5, no2, so2, co, o3, aqi, conditions in zip(
+            text['pm10'], text['pm2_5'], text['no2'], text['so2'],
+            text['co'], text['o3'], text['aqi'], abnormal_conditions):
+        timestamp = (datetime.now()).isoformat() + 'Z'
+        message = f"Atmospheric data recorded at {timestamp}. PM10: {pm10} µg/m³, PM2.5: {pm2_5} µg/m³, NO2: {no2} µg/m³, SO2: {so2} µg/m³, CO: {co} ppm, O3: {o3} µg/m³, AQI: {aqi}."
+        if conditions:
+            message += " Conditions out of normal range. " + " ".join(conditions)
+        raw_log_lines.append(f"[{timestamp}] \"{pm10} µg/m³\" \"{pm2_5} µg/m³\" \"{no2} µg/m³\" \"{so2} µg/m³\" \"{co} ppm\" \"{o3} µg/m³\" \"{aqi}\" \"{message}\" {encounter_id}\n")
 
-def generate_atmospheric_event(encounter_id: str, units: str) -> str:
+    return raw_log_lines
+
+def generate_atmospheric_event(encounter_id: str, units: str, site: Optional[str] = None) -> str:
     """Generate a single atmospheric event log entry."""
-    timestamp = (datetime.now()).isoformat() + 'Z'
-    
-    pm10 = generate_random_data(0, 150)
-    pm2_5 = generate_random_data(0, 100)
-    no2 = generate_random_data(0, 150)
-    so2 = generate_random_data(0, 100)
-    co = generate_random_data(0, 50)
-    o3 = generate_random_data(0, 100)
-    aqi = random.randint(0, 500)
-
-    message = f"Atmospheric data recorded at {timestamp}. PM10: {pm10} µg/m³, PM2.5: {pm2_5} µg/m³, NO2: {no2} µg/m³, SO2: {so2} µg/m³, CO: {co} ppm, O3: {o3} µg/m³, AQI: {aqi}."
-    
-    abnormal_conditions = []
-    if pm10 > 50:
-        abnormal_conditions.append(f"PM10 level of {pm10} µg/m³ is high, can cause respiratory issues.")
-    if pm2_5 > 35:
-        abnormal_conditions.append(f"PM2.5 level of {pm2_5} µg/m³ is high, can penetrate lungs and affect heart.")
-    if no2 > 100:
-        abnormal_conditions.append(f"NO2 level of {no2} µg/m³ is high, can cause lung inflammation and decrease immunity.")
-    if so2 > 20:
-        abnormal_conditions.append(f"SO2 level of {so2} µg/m³ is high, can irritate airways and exacerbate asthma.")
-    if co > 10:
-        abnormal_conditions.append(f"CO level of {co} ppm is high, can cause headache, dizziness, and confusion.")
-    if o3 > 70:
-        abnormal_conditions.append(f"O3 level of {o3} µg/m³ is high, can cause respiratory issues and decrease lung function.")
-    
-    if abnormal_conditions:
-        message += " Conditions out of normal range. " + " ".join(abnormal_conditions)
-
-    raw_log_line = f"[{timestamp}] \"{pm10} µg/m³\" \"{pm2_5} µg/m³\" \"{no2} µg/m³\" \"{so2} µg/m³\" \"{co} ppm\" \"{o3} µg/m³\" \"{aqi}\" \"{message}\" {encounter_id}\n"
-
-    return raw_log_line
-
-def write_to_log_file(events: List[str], log_file_path: str):
-    """Write the list of events to the specified log file."""
-    with open(log_file_path, 'a') as file:
-        file.writelines(events)
-
-def main():
-    """Main function to load configuration, generate events, and write them to a log file."""
+    return generate_atmospheric_events(encounter_id, units, 1, site)[0]
+
+def run_simulated_sensor(writer, encounter_id: str, units: str, duration: float, site: Optional[str] = None):
+    """Write one event every 1 to 5 minutes, like a single slow sensor."""
+    start_time = time.monotonic()
+    while time.monotonic() - start_time < duration:
+        atmospheric_event = generate_atmospheric_event(encounter_id, units, site)
+        writer.write(atmospheric_event)
+        writer.flush()
+        logging.debug(f"Data written to {writer.path}: {atmospheric_event}")
+        time.sleep(random.randint(60, 300))  # Sleep between 1 and 5 minutes
+
+def run_high_rate(writer, encounter_id: str, units: str, duration: float, interval: float,
+                  site: Optional[str] = None):
+    """
+    Write one event every `interval` seconds, like a dense sensor network.
+
+    Events that came due since the last tick are generated and written together,
+    so the achieved rate does not depend on the resolution of time.sleep.
+    """
+    start_time = time.monotonic()
+    next_tick = start_time
+    emitted = 0
+    while time.monotonic() - start_time < duration:
+        due = int((time.monotonic() - start_time) / interval) - emitted
+        if due > 0:
+            writer.write_many(generate_atmospheric_events(encounter_id, units, due, site))
+            emitted += due
+        next_tick += HIGH_RATE_TICK_SECONDS
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+    elapsed = time.monotonic() - start_time
+    logging.info(f"Wrote {emitted} events in {elapsed:.1f}s ({emitted / elapsed:.0f} events/s) to {writer.path}")
+
+def main(interval: Optional[float] = None, duration: float = DEFAULT_DURATION_SECONDS, **writer_overrides):
+    """
+    Main function to load configuration, generate events, and write them to a log file.
+    Args:
+        interval (float): Seconds between events for high-rate mode; None keeps the 1 to 5 minute sleep.
+        duration (float): Seconds to run for.
+        writer_overrides: Log writer settings that replace the configured ones.
+    """
     try:
         config = load_config()
         logging.debug(f"Config loaded: {config}")
 
         encounter_id = config['encounter_id']
         units = config.get('units', 'metric')
-        log_file_path = 'atmospheric_data.log'
+        site = config.get('site') or None  # selects site-specific rules in atmospheric_thresholds.csv
 
-        start_time = datetime.now()
-        while (datetime.now() - start_time).total_seconds() < 900:  # Run for 15 minutes
-            atmospheric_event = generate_atmospheric_event(encounter_id, units)
-            write_to_log_file([atmospheric_event], log_file_path)
-            logging.debug(f"Data written to {log_file_path}: {atmospheric_event}")
-            time.sleep(random.randint(60, 300))  # Sleep between 1 and 5 minutes
+        with writer_from_config(config, LOG_FILE_PATH, **writer_overrides) as writer:
+            if interval:
+                logging.getLogger().setLevel(logging.INFO)  # per-event debug output would dominate
+                run_high_rate(writer, encounter_id, units, duration, interval, site)
+            else:
+                run_simulated_sensor(writer, encounter_id, units, duration, site)
+        logging.info(f"Log writer stats: {writer.stats}")
 
     except Exception as e:
         logging.error("An error occurred: ", exc_info=True)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write simulated atmospheric sensor events to atmospheric_data.log.")
+    parser.add_argument('--interval', type=float, default=None,
+                        help="high-rate mode: seconds between events, e.g. 0.0002 for 5000 events/s")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION_SECONDS,
+                        help=f"seconds to run for (default: {DEFAULT_DURATION_SECONDS})")
+    parser.add_argument('--rotate-bytes', type=int, default=None, help="rotate the log when it would exceed this size")
+    parser.add_argument('--rotate-seconds', type=float, default=None, help="rotate the log after this many seconds")
+    parser.add_argument('--compress', action='store_true', default=None, help="gzip rotated segments")
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, default=None, help="when to fsync the log file")
+    args = parser.parse_args()
+
     from multiprocessing import Process
-    p = Process(target=main)
+    p = Process(target=main, args=(args.interval, args.duration),
+                kwargs={'rotate_bytes': args.rotate_bytes, 'rotate_seconds': args.rotate_seconds,
+                        'compress': args.compress, 'fsync': args.fsync})
     p.start()
     p.join()
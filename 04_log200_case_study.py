@@ -1,16 +1,23 @@
+import argparse
+import asyncio
 import json
 import os
 import logging
-import requests
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from astral import LocationInfo
-from astral.sun import sun
-from astral.moon import phase
-from timezonefinder import TimezoneFinder
-from zoneinfo import ZoneInfo
 import pandas as pd
 import numpy as np
-from meteostat import Point, Daily, Stations
+from meteostat import Daily
+from backfill import DEFAULT_CHUNK_DAYS, WorkUnit, format_duration, plan_work_units
+from ephemeris_cache import get_location_cache
+from logscale_client import LogScaleClient, client_from_config, encode_json
+from pipeline import DEFAULT_QUEUE_SIZE, DEFAULT_SEND_CONCURRENCY, AsyncSender, Stage, run_pipeline
+from station_index import nearest_station
+from timezone_cache import get_timezone
+from watermarks import WatermarkStore, location_key
+from weather_store import WeatherStore, store_from_config
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -20,7 +27,7 @@ REQUIRED_FIELDS = [
     'logscale_api_token_case_study', 'encounter_id', 'alias',
     'city_name', 'country_name', 'latitude', 'longitude', 'date_start', 'date_end', 'units'
 ]
-LOGSCALE_URL = 'https://cloud.us.humio.com/api/v1/ingest/humio-structured'
+LOCATION_FIELDS = ['city_name', 'country_name', 'latitude', 'longitude']
 
 # Load configuration
 def load_config():
@@ -32,19 +39,26 @@ def load_config():
 # Validate configuration
 def validate_config():
     config = load_config()
-    missing_fields = [field for field in REQUIRED_FIELDS if field not in config or config[field] == '']
+    required_fields = REQUIRED_FIELDS
+    if config.get('locations'):
+        # A locations list replaces the single top-level location
+        required_fields = [field for field in REQUIRED_FIELDS if field not in LOCATION_FIELDS]
+        for i, location in enumerate(config['locations']):
+            missing = [field for field in LOCATION_FIELDS if location.get(field) in (None, '', 'REPLACEME')]
+            if missing:
+                print(f"\nMissing required fields for location {i + 1}: {', '.join(missing)}")
+                return False
+    missing_fields = [field for field in required_fields if field not in config or config[field] == '']
     if missing_fields:
         print(f"\nMissing required fields: {', '.join(missing_fields)}")
         return False
     return True
 
-def get_timezone(latitude, longitude):
-    tf = TimezoneFinder()
-    tz_name = tf.timezone_at(lat=latitude, lng=longitude)
-    if tz_name:
-        return ZoneInfo(tz_name)
-    else:
-        raise Exception("Could not determine the timezone.")
+def get_locations(config):
+    """Return the configured locations, falling back to the single top-level location."""
+    if config.get('locations'):
+        return config['locations']
+    return [{field: config[field] for field in LOCATION_FIELDS}]
 
 def convert_units(data, units):
     if units == 'imperial':
@@ -58,20 +72,19 @@ def convert_units(data, units):
         data['pres'] = data['pres'] * 0.02953 if 'pres' in data else None
     return data
 
-def fetch_weather_data(latitude, longitude, date_start, date_end, units):
-    location = Point(latitude, longitude)
+def fetch_weather_data(latitude, longitude, date_start, date_end, units, store=None):
     start = datetime.strptime(date_start, '%Y-%m-%d')
     end = datetime.strptime(date_end, '%Y-%m-%d')
-    data = Daily(location, start, end)
-    data = data.fetch()
 
     # Enrich data with nearest weather station information
-    stations = Stations()
-    stations = stations.nearby(latitude, longitude)
-    station = stations.fetch(1)
-    if not station.empty:
-        station_name = station.name.iloc[0]
-        data['station_name'] = station_name
+    station_id, station_name, _ = nearest_station(latitude, longitude)
+
+    # Read from the local weather store first and only fetch the days it lacks. The days
+    # are fetched for the station itself, so they match the station the store keys them by.
+    store = store or WeatherStore()
+    data = store.read_through('daily', station_id, start, end,
+                              lambda first, last: Daily(station_id, first, last).fetch())
+    data['station_name'] = station_name
 
     # Convert units if necessary
     data = convert_units(data, units)
@@ -80,45 +93,41 @@ def fetch_weather_data(latitude, longitude, date_start, date_end, units):
     data = data.replace([np.nan, np.inf, -np.inf], None)
     return data
 
-def get_moon_phase_name(moon_phase_value):
-    if moon_phase_value < 0.125:
-        return "New Moon"
-    elif moon_phase_value < 0.25:
-        return "Waxing Crescent"
-    elif moon_phase_value < 0.375:
-        return "First Quarter"
-    elif moon_phase_value < 0.5:
-        return "Waxing Gibbous"
-    elif moon_phase_value < 0.625:
-        return "Full Moon"
-    elif moon_phase_value < 0.75:
-        return "Waning Gibbous"
-    elif moon_phase_value < 0.875:
-        return "Last Quarter"
-    else:
-        return "Waning Crescent"
+def column_values(weather_data, column, default=None):
+    """Return a column as a plain Python list, or a list of `default` if the column is missing."""
+    if column in weather_data:
+        return weather_data[column].tolist()
+    return [default] * len(weather_data)
 
 def generate_log_lines(weather_data, encounter_id, alias, config):
+    # Build events column-wise: timestamps are formatted for the whole index at once
+    # and every column is pulled out as a list once, instead of per-row iterrows lookups.
+    timestamps = weather_data.index.strftime('%Y-%m-%dT%H:%M:%SZ').tolist()
+    dates = weather_data.index.date.tolist()
+    columns = zip(
+        timestamps, dates,
+        column_values(weather_data, "tavg"), column_values(weather_data, "tmin"),
+        column_values(weather_data, "tmax"), column_values(weather_data, "dwpt"),
+        column_values(weather_data, "prcp"), column_values(weather_data, "wspd"),
+        column_values(weather_data, "wdir"), column_values(weather_data, "wpgt"),
+        column_values(weather_data, "pres"), column_values(weather_data, "tsun"),
+        column_values(weather_data, "rhum"), column_values(weather_data, "snow"),
+        column_values(weather_data, "coco"), column_values(weather_data, "station_name", "N/A"),
+    )
+
+    # Sun and moon information comes from the on-disk ephemeris cache, filled for the whole range in one call
+    ephemeris = get_location_cache(config['latitude'], config['longitude'], config['timezone'])
+    if dates:
+        ephemeris.precompute(min(dates), max(dates))
+    created = datetime.utcnow().isoformat() + "Z"
+
     log_lines = []
-    for time, row in weather_data.iterrows():
-        date = time.date()
-        city = LocationInfo(config['city_name'], config['country_name'], config['timezone'], config['latitude'], config['longitude'])
-        s = sun(city.observer, date=date, tzinfo=city.timezone)
-        moon_phase_value = (phase(date) % 30) / 30  # Normalize to [0, 1] range
-        moon_phase_name = get_moon_phase_name(moon_phase_value)
-        sun_and_moon_info = {
-            'sun_info': {
-                'dawn': s['dawn'].isoformat(),
-                'sunrise': s['sunrise'].isoformat(),
-                'noon': s['noon'].isoformat(),
-                'sunset': s['sunset'].isoformat(),
-                'dusk': s['dusk'].isoformat(),
-            },
-            'moon_phase': moon_phase_name
-        }
+    for (timestamp, date, tavg, tmin, tmax, dwpt, prcp, wspd, wdir, wpgt,
+         pres, tsun, rhum, snow, coco, station_name) in columns:
+        sun_and_moon_info = ephemeris.get(date)
 
         log_entry = {
-            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "timestamp": timestamp,
             "attributes": {
                 "geo": {
                     "city_name": config["city_name"],
@@ -137,25 +146,25 @@ def generate_log_lines(weather_data, encounter_id, alias, config):
                 },
                 "moon.phase": sun_and_moon_info["moon_phase"],
                 "weather": {
-                    "temperature": row.get("tavg"),
-                    "min_temperature": row.get("tmin"),
-                    "max_temperature": row.get("tmax"),
-                    "dew_point": row.get("dwpt"),
-                    "precipitation": row.get("prcp"),
+                    "temperature": tavg,
+                    "min_temperature": tmin,
+                    "max_temperature": tmax,
+                    "dew_point": dwpt,
+                    "precipitation": prcp,
                     "wind": {
-                        "speed": row.get("wspd"),
-                        "direction": row.get("wdir"),
-                        "gust": row.get("wpgt")
+                        "speed": wspd,
+                        "direction": wdir,
+                        "gust": wpgt
                     },
-                    "pressure": row.get("pres"),
-                    "sunshine": row.get("tsun"),
-                    "humidity": row.get("rhum"),  # Include relative humidity
-                    "snow": row.get("snow"),
-                    "weather_condition_code": row.get("coco"),
-                    "station_name": row.get("station_name", "N/A")
+                    "pressure": pres,
+                    "sunshine": tsun,
+                    "humidity": rhum,  # Include relative humidity
+                    "snow": snow,
+                    "weather_condition_code": coco,
+                    "station_name": station_name
                 },
                 "event": {
-                    "created": datetime.utcnow().isoformat() + "Z",
+                    "created": created,
                     "module": "weather",
                     "dataset": "weather"
                 },
@@ -171,55 +180,44 @@ def generate_log_lines(weather_data, encounter_id, alias, config):
         log_lines.append(log_entry)
     return log_lines
 
-def send_to_logscale(log_lines, logscale_api_token):
-    headers = {
-        "Authorization": f"Bearer {logscale_api_token}",
-        "Content-Type": "application/json"
-    }
-    payload = [{
-        "tags": {
-            "host": "weatherhost",
-            "source": "weatherdata"
-        },
-        "events": log_lines
-    }]
-    response = requests.post(LOGSCALE_URL, json=payload, headers=headers)
-    return response.status_code, response.text
-
-def main():
-    if not validate_config():
-        return
+def send_to_logscale(log_lines, client: LogScaleClient):
+    # Large date ranges are split into size-bounded chunks and uploaded in parallel
+    return client.send_batched(log_lines)
 
-    config = load_config()
-    logscale_api_token = config['logscale_api_token_case_study']
-    encounter_id = config['encounter_id']
-    alias = config['alias']
+def build_unit_events(unit: WorkUnit):
+    """Fetch and enrich one (location x date range) work unit; runs in a backfill worker process."""
+    config = dict(load_config(), **unit.location)
     latitude = float(config['latitude'])
     longitude = float(config['longitude'])
-    date_start = config['date_start']
-    date_end = config['date_end']
-    units = config['units']
 
     # Get timezone
-    timezone = get_timezone(latitude, longitude)
-    config['timezone'] = timezone
+    config['timezone'] = get_timezone(latitude, longitude)
 
     # Fetch weather data
-    weather_data = fetch_weather_data(latitude, longitude, date_start, date_end, units)
+    weather_data = fetch_weather_data(latitude, longitude, unit.date_start, unit.date_end, config['units'],
+                                      store_from_config(config))
     if weather_data.empty:
-        logging.error("No weather data fetched.")
-        return
+        logging.warning(f"No weather data fetched for {config['city_name']} {unit.date_start}..{unit.date_end}.")
+        return unit, []
 
     # Generate log lines
-    log_lines = generate_log_lines(weather_data, encounter_id, alias, config)
-    if not log_lines:
-        logging.error("No log lines generated.")
-        return
+    return unit, generate_log_lines(weather_data, config['encounter_id'], config['alias'], config)
+
+def main(full=False):
+    """
+    Backfill the configured date range for every location.
+    Returns:
+        int: 0 if every work unit was enriched and accepted by LogScale, 1 otherwise.
+    """
+    if not validate_config():
+        return 1
 
-    # Display an example log line for user reference
-    example_log_line = json.dumps(log_lines[0], indent=4)
-    print("\nExample Log Line:")
-    print(example_log_line)
+    config = load_config()
+    client = client_from_config(config, 'logscale_api_token_case_study')
+    encounter_id = config['encounter_id']
+    alias = config['alias']
+    date_start = config['date_start']
+    date_end = config['date_end']
 
     # Description of the log line structure
     print("\nDescription:")
@@ -237,8 +235,102 @@ def main():
     print(f"2. Use the following query to search for your data:")
     print(f"observer.id={encounter_id} AND observer.alias={alias}")
 
-    status_code, response_text = send_to_logscale(log_lines, logscale_api_token)
-    logging.debug(f"Response from LogScale: Status Code: {status_code}, Response: {response_text}")
+    # Only the parts of the range that LogScale has not acknowledged yet are fetched,
+    # unless a full resend is requested.
+    watermarks = WatermarkStore()
+    chunk_days = int(config.get('backfill_chunk_days', DEFAULT_CHUNK_DAYS))
+    start = datetime.strptime(date_start, '%Y-%m-%d').date()
+    end = datetime.strptime(date_end, '%Y-%m-%d').date()
+    units = []
+    for location in get_locations(config):
+        gaps = [(start, end)] if full else watermarks.missing(location_key(config, location), start, end)
+        for gap_start, gap_end in gaps:
+            units += plan_work_units([location], gap_start.isoformat(), gap_end.isoformat(), chunk_days)
+    if not units:
+        print(f"\nNothing to do: {date_start} to {date_end} has already been ingested for every location.")
+        return 0
+    logging.info(f"Backfilling {len(units)} work units.")
+
+    # Run the units through a staged pipeline: fetching and enriching on a process pool,
+    # encoding on a thread and uploading with aiohttp all overlap, with bounded queues in
+    # between. Each unit's date range is committed to the watermark store once LogScale
+    # accepted all of its events.
+    processes = int(config.get('backfill_processes') or os.cpu_count() or 1)
+    upload = {"events": 0, "bytes": 0, "failed_chunks": 0, "failed_events": 0, "elapsed_s": 0.0}
+    progress = {"units": 0, "events": 0, "failed_units": 0}
+    stage_stats = {}  # filled by run_pipeline, so units dropped by a failing stage count as done
+    start_time = time.perf_counter()
+
+    def serialize_unit(result):
+        unit, log_lines = result
+        if log_lines and progress["events"] == 0:
+            # Display an example log line for user reference
+            print("\nExample Log Line:")
+            print(json.dumps(log_lines[0], indent=4))
+        progress["events"] += len(log_lines)
+        return unit, [encode_json(line) for line in log_lines]
+
+    def commit_unit(result):
+        unit, summary = result
+        if summary is not None:
+            for key in upload:
+                upload[key] += summary[key]
+            if summary["failed_chunks"] == 0:
+                watermarks.mark(location_key(config, unit.location),
+                                datetime.strptime(unit.date_start, '%Y-%m-%d').date(),
+                                datetime.strptime(unit.date_end, '%Y-%m-%d').date())
+            else:
+                progress["failed_units"] += 1
+        progress["units"] += 1
+        dropped = sum(stage["failed"] for stage in stage_stats.values())
+        done = progress["units"] + dropped
+        elapsed = time.perf_counter() - start_time
+        eta = elapsed / done * (len(units) - done)
+        logging.info(
+            f"Backfill progress: {done}/{len(units)} units ({done / len(units):.0%}, "
+            f"{dropped + progress['failed_units']} failed), {upload['events']} events sent, "
+            f"elapsed {format_duration(elapsed)}, ETA {format_duration(eta)}"
+        )
+
+    async def backfill():
+        async with AsyncSender(client) as sender:
+            async def send_unit(result):
+                unit, encoded = result
+                return unit, (await sender.send_encoded(encoded) if encoded else None)
+
+            with ProcessPoolExecutor(max_workers=processes) as process_pool, \
+                    ThreadPoolExecutor(max_workers=1) as encoder:
+                return await run_pipeline(units, [
+                    Stage('enrich', build_unit_events, concurrency=processes, executor=process_pool),
+                    Stage('serialize', serialize_unit, executor=encoder),
+                    Stage('send', send_unit, concurrency=int(config.get('pipeline_send_concurrency', DEFAULT_SEND_CONCURRENCY))),
+                    Stage('commit', commit_unit),
+                ], queue_size=int(config.get('pipeline_queue_size', DEFAULT_QUEUE_SIZE)), stats=stage_stats)
+
+    totals = asyncio.run(backfill())
+    # A unit whose enrich, serialize or send stage raised was logged and dropped by the
+    # pipeline and never reached commit_unit; count it from the stage statistics
+    dropped_units = sum(stage["failed"] for stage in totals["stages"].values())
+    failed_units = dropped_units + progress["failed_units"]
+    if progress["events"] == 0:
+        logging.error(f"No log lines generated ({dropped_units} of {len(units)} work units failed).")
+        return 1
+
+    print("\nUpload Summary:")
+    print(f"- Work units: {progress['units']}/{len(units)} completed in {totals['elapsed_s']:.1f}s")
+    if failed_units:
+        print(f"- Failed work units: {failed_units} ({dropped_units} failed before sending, "
+              f"{progress['failed_units']} not fully accepted); rerun to retry them")
+    print(f"- Events sent: {upload['events']}")
+    print(f"- Throughput: {upload['events'] / totals['elapsed_s']:.0f} events/s, "
+          f"{upload['bytes'] / totals['elapsed_s'] / (1024 * 1024):.2f} MB/s")
+    if upload['failed_chunks']:
+        print(f"- Failed: {upload['failed_events']} events in {upload['failed_chunks']} chunks")
+    return 1 if failed_units else 0
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Backfill historical weather data into LogScale.")
+    parser.add_argument('--full', action='store_true',
+                        help="resend the whole date range, ignoring what has already been ingested")
+    args = parser.parse_args()
+    sys.exit(main(full=args.full))
@@ -1,16 +1,20 @@
+import argparse
 import json
 import os
 import logging
-import requests
+import re
+import subprocess
+import sys
+import time
 from datetime import datetime, timedelta
-from astral import LocationInfo
-from astral.sun import sun
-from astral.moon import phase
-from timezonefinder import TimezoneFinder
-from zoneinfo import ZoneInfo
-import pandas as pd
-import numpy as np
-from meteostat import Point, Hourly, Stations
+from typing import TYPE_CHECKING, NamedTuple
+
+# Heavy modules (pandas, numpy, meteostat, astral, timezonefinder, requests) are
+# imported inside the functions that need them so the hourly run validates its
+# configuration, and can bail out, without paying for them.
+if TYPE_CHECKING:
+    import pandas as pd
+    from logscale_client import LogScaleClient
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -20,7 +24,13 @@ REQUIRED_FIELDS = [
     'logscale_api_token_case_study', 'encounter_id', 'alias',
     'city_name', 'country_name', 'latitude', 'longitude', 'units', 'extreme_field', 'extreme_level'
 ]
-LOGSCALE_URL = 'https://cloud.us.humio.com/api/v1/ingest/humio-structured'
+LOCATION_FIELDS = ['city_name', 'country_name', 'latitude', 'longitude']
+DEFAULT_FETCH_WORKERS = 16
+
+# Time from interpreter start to the first network call that --startup-report enforces
+STARTUP_BUDGET_SECONDS = 3.0
+STARTUP_PROBE_ENV = 'WEATHER_STARTUP_PROBE'
+STARTUP_PROBE_EXIT_CODE = 75  # a probe run that reached the checkpoint exits with this status
 
 # Load configuration
 def load_config():
@@ -32,37 +42,39 @@ def load_config():
 # Validate configuration
 def validate_config():
     config = load_config()
-    missing_fields = [field for field in REQUIRED_FIELDS if field not in config or config[field] == '']
+    required_fields = REQUIRED_FIELDS
+    if config.get('locations'):
+        # A locations list replaces the single top-level location
+        required_fields = [field for field in REQUIRED_FIELDS if field not in LOCATION_FIELDS]
+        for i, location in enumerate(config['locations']):
+            missing = [field for field in LOCATION_FIELDS if location.get(field) in (None, '', 'REPLACEME')]
+            if missing:
+                print(f"\nMissing required fields for location {i + 1}: {', '.join(missing)}")
+                return False
+    missing_fields = [field for field in required_fields if config.get(field) in (None, '', 'REPLACEME')]
     if missing_fields:
         print(f"\nMissing required fields: {', '.join(missing_fields)}")
         return False
     return True
 
-def get_timezone(latitude, longitude):
-    tf = TimezoneFinder()
-    tz_name = tf.timezone_at(lat=latitude, lng=longitude)
-    if tz_name:
-        return ZoneInfo(tz_name)
-    else:
-        raise Exception("Could not determine the timezone.")
-
-def fetch_weather_data(latitude, longitude, units):
-    location = Point(latitude, longitude)
-    now = datetime.utcnow()
-    start = now - timedelta(hours=1)
-    end = now
-    data = Hourly(location, start, end)
-    data = data.fetch()
+def get_locations(config):
+    """Return the configured locations, falling back to the single top-level location."""
+    if config.get('locations'):
+        return config['locations']
+    return [{field: config[field] for field in LOCATION_FIELDS}]
 
-    # Enrich data with nearest weather station information
-    stations = Stations()
-    stations = stations.nearby(latitude, longitude)
-    station = stations.fetch(1)
-    if not station.empty:
-        station_name = station.name.iloc[0]
-        data['station_name'] = station_name
+def startup_checkpoint():
+    """
+    Mark the point just before the first network call; a --startup-report
+    probe run stops here. It may be reached on a fetch worker thread, so the
+    process is ended directly instead of raising SystemExit.
+    """
+    if os.environ.get(STARTUP_PROBE_ENV):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(STARTUP_PROBE_EXIT_CODE)
 
-    # Convert units if necessary
+def convert_units(data, units):
     if units == "imperial":
         data["temp"] = data["temp"] * 9/5 + 32 if 'temp' in data else None
         data["dwpt"] = data["dwpt"] * 9/5 + 32 if 'dwpt' in data else None
@@ -71,6 +83,31 @@ def fetch_weather_data(latitude, longitude, units):
         data["prcp"] = data["prcp"] / 25.4 if 'prcp' in data else None
         data["snow"] = data["snow"] / 25.4 if 'snow' in data else None
         data["pres"] = data["pres"] * 0.02953 if 'pres' in data else None
+    return data
+
+def fetch_weather_data(latitude, longitude, units, start=None, end=None, store=None):
+    import numpy as np
+    from meteostat import Hourly
+    from station_index import nearest_station
+    from weather_store import WeatherStore
+
+    if end is None:
+        end = datetime.utcnow()
+    if start is None:
+        start = end - timedelta(hours=1)
+
+    # Enrich data with nearest weather station information
+    station_id, station_name, _ = nearest_station(latitude, longitude)
+
+    # Read from the local weather store first and only fetch the hours it lacks. The hours
+    # are fetched for the station itself, so they match the station the store keys them by.
+    store = store or WeatherStore()
+    data = store.read_through('hourly', station_id, start, end,
+                              lambda first, last: Hourly(station_id, first, last).fetch())
+    data['station_name'] = station_name
+
+    # Convert units if necessary
+    data = convert_units(data, units)
 
     # Replace NaN and infinite values with None to avoid JSON serialization issues
     data = data.replace([np.nan, np.inf, -np.inf], None)
@@ -112,19 +149,41 @@ def generate_extreme_weather_data(weather_data, extreme_field, extreme_level, un
     weather_data["alert"] = alert_message
     return weather_data, alert_message
 
-def generate_log_lines(weather_data, sun_and_moon_info, encounter_id, alias, config, alert_message):
+def column_values(weather_data, column, default=None):
+    """Return a column as a plain Python list, or a list of `default` if the column is missing."""
+    if column in weather_data:
+        return weather_data[column].tolist()
+    return [default] * len(weather_data)
+
+def generate_log_lines(weather_data, sun_and_moon_info, encounter_id, alias, config, alert_message, anomalies=None):
     if weather_data.empty:
         logging.error("Weather data is empty.")
         return []
 
+    # Build events column-wise: timestamps are formatted for the whole index at once
+    # and every column is pulled out as a list once, instead of per-row iterrows lookups.
+    # Events are stamped with their observation time, so a re-fetched row always
+    # maps to the same event.
+    report_times = weather_data.index.strftime('%Y-%m-%dT%H:%M:%SZ').tolist()
+    columns = zip(
+        report_times,
+        column_values(weather_data, "temp"), column_values(weather_data, "dwpt"),
+        column_values(weather_data, "rhum"), column_values(weather_data, "prcp"),
+        column_values(weather_data, "snow"), column_values(weather_data, "wspd"),
+        column_values(weather_data, "wdir"), column_values(weather_data, "wpgt"),
+        column_values(weather_data, "pres"), column_values(weather_data, "tsun"),
+        column_values(weather_data, "station_name", "N/A"), column_values(weather_data, "coco"),
+        anomalies if anomalies is not None else [[] for _ in report_times],
+    )
+
     log_lines = []
-    for index, (time, row) in enumerate(weather_data.iterrows()):
-        event_time = datetime.utcnow() + timedelta(seconds=index)  # Ensure each event has a unique timestamp
+    for (report_time, temp, dwpt, rhum, prcp, snow, wspd, wdir, wpgt,
+         pres, tsun, station_name, coco, breaches) in columns:
         log_entry = {
-            "timestamp": event_time.isoformat() + "Z",
+            "timestamp": report_time,
             "event": {
-                "report_time": time.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                "created": time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                "report_time": report_time,
+                "created": report_time,
                 "module": "weather",
                 "dataset": "weather"
             },
@@ -148,21 +207,26 @@ def generate_log_lines(weather_data, sun_and_moon_info, encounter_id, alias, con
                     "phase": sun_and_moon_info["moon.phase"]
                 },
                 "weather": {
-                    "temperature": row.get("temp"),
-                    "dew_point": row.get("dwpt"),
-                    "relative_humidity": row.get("rhum"),
-                    "precipitation": row.get("prcp"),
-                    "snow": row.get("snow"),
+                    "temperature": temp,
+                    "dew_point": dwpt,
+                    "relative_humidity": rhum,
+                    "precipitation": prcp,
+                    "snow": snow,
                     "wind": {
-                        "speed": row.get("wspd"),
-                        "direction": row.get("wdir"),
-                        "gust": row.get("wpgt")
+                        "speed": wspd,
+                        "direction": wdir,
+                        "gust": wpgt
                     },
-                    "pressure": row.get("pres"),
-                    "sunshine": row.get("tsun"),
-                    "station_name": row.get("station_name", "N/A"),
-                    "condition_code": row.get("coco"),
-                    "alert": alert_message
+                    "pressure": pres,
+                    "sunshine": tsun,
+                    "station_name": station_name,
+                    "condition_code": coco,
+                    "alert": alert_message,
+                    "anomaly": {
+                        "detected": bool(breaches),
+                        "fields": [breach["field"] for breach in breaches],
+                        "breaches": breaches
+                    }
                 },
                 "sun": {
                     "sunrise": sun_and_moon_info["sun_info"]["sunrise"],
@@ -176,45 +240,88 @@ def generate_log_lines(weather_data, sun_and_moon_info, encounter_id, alias, con
         log_lines.append(log_entry)
     return log_lines
 
-def send_to_logscale(log_lines, logscale_api_token):
-    headers = {
-        "Authorization": f"Bearer {logscale_api_token}",
-        "Content-Type": "application/json"
-    }
-    payload = [{
-        "tags": {
-            "host": "weatherhost",
-            "source": "weatherdata"
-        },
-        "events": log_lines
-    }]
-    response = requests.post(LOGSCALE_URL, json=payload, headers=headers)
-    return response.status_code, response.text
-
-def get_moon_phase_name(moon_phase_value):
-    if moon_phase_value < 0.125:
-        return "New Moon"
-    elif moon_phase_value < 0.25:
-        return "Waxing Crescent"
-    elif moon_phase_value < 0.375:
-        return "First Quarter"
-    elif moon_phase_value < 0.5:
-        return "Waxing Gibbous"
-    elif moon_phase_value < 0.625:
-        return "Full Moon"
-    elif moon_phase_value < 0.75:
-        return "Waning Gibbous"
-    elif moon_phase_value < 0.875:
-        return "Last Quarter"
-    else:
-        return "Waning Crescent"
+def send_to_logscale(log_lines, client: "LogScaleClient"):
+    return client.send_batched(log_lines)
 
-def main():
-    if not validate_config():
-        return
+def summarize_import_times(importtime_output, top=10):
+    """
+    Summarize `python -X importtime` output by top-level package.
+    Args:
+        importtime_output (str): The stderr of a run with -X importtime.
+        top (int): Number of packages to list.
+    Returns:
+        Tuple[float, List[Tuple[str, float]]]: Total import seconds and the slowest packages.
+    """
+    per_package = {}
+    pattern = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+    for line in importtime_output.splitlines():
+        match = pattern.match(line)
+        if not match or match.group(3):
+            continue  # only count imports made directly by the script, cumulative
+        package = match.group(4).split('.')[0]
+        per_package[package] = per_package.get(package, 0) + int(match.group(2)) / 1e6
+    ranked = sorted(per_package.items(), key=lambda item: item[1], reverse=True)
+    return sum(per_package.values()), ranked[:top]
 
-    config = load_config()
-    logscale_api_token = config['logscale_api_token_case_study']
+def startup_report():
+    """
+    Re-run this script up to its first network call under -X importtime and
+    print where the startup time goes.
+    Returns:
+        int: 0 if time to first network call is within STARTUP_BUDGET_SECONDS, 1 otherwise.
+    """
+    env = dict(os.environ, **{STARTUP_PROBE_ENV: '1'})
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__)],
+                            capture_output=True, text=True, env=env)
+    elapsed = time.perf_counter() - start
+    total_imports, ranked = summarize_import_times(result.stderr)
+
+    print("\nStartup Report:")
+    print(f"- Time to first network call: {elapsed:.3f}s (budget {STARTUP_BUDGET_SECONDS:.1f}s)")
+    print(f"- Time spent importing: {total_imports:.3f}s")
+    print("- Slowest imports (cumulative):")
+    for package, seconds in ranked:
+        print(f"    {package:<24} {seconds * 1000:8.1f} ms")
+    if result.returncode != STARTUP_PROBE_EXIT_CODE:
+        print(f"- Probe run exited with status {result.returncode} before reaching the network")
+        return 1
+    if elapsed > STARTUP_BUDGET_SECONDS:
+        print("- Startup budget exceeded")
+        return 1
+    return 0
+
+class LocationResult(NamedTuple):
+    log_lines: list
+    alert_message: str
+    weather_data: "pd.DataFrame"
+    watermark_key: str
+    event_keys: list
+    detector_state: dict
+
+def fetch_location(config, location, start, end, watermarks, sent_events, detector):
+    """
+    Fetch and enrich the weather observations for one location between start and end.
+
+    If the station's high watermark is older than start (a run was missed), the
+    fetch reaches back to it, up to `max_catchup_hours`. Rows that the watermarks
+    record as acknowledged were delivered by an earlier, overlapping window and
+    are dropped before any events are built; the sent-event filter only decides
+    which rows are looked up there. The remaining rows are fed to the
+    anomaly detector before any simulated extremes are applied.
+    Returns:
+        LocationResult: The log lines, the alert message, the weather data, the
+        watermark key and the event keys of the rows to send.
+    """
+    from anomaly_detector import DEFAULT_FIELDS
+    from ephemeris_cache import get_sun_and_moon_info
+    from fetch_daemon import DEFAULT_MAX_CATCHUP_HOURS
+    from station_index import nearest_station
+    from timezone_cache import get_timezone
+    from watermarks import location_key
+    from weather_store import store_from_config
+
+    config = dict(config, **location)
     encounter_id = config['encounter_id']
     alias = config['alias']
     latitude = float(config['latitude'])
@@ -226,28 +333,53 @@ def main():
     # Get timezone
     timezone = get_timezone(latitude, longitude)
 
-    # Fetch sun and moon data
-    city = LocationInfo(config['city_name'], config['country_name'], timezone, latitude, longitude)
-    date_specified = datetime.utcnow()
-    s = sun(city.observer, date=date_specified, tzinfo=city.timezone)
-    moon_phase_value = (phase(date_specified) % 30) / 30  # Normalize to [0, 1] range
-    moon_phase_name = get_moon_phase_name(moon_phase_value)
+    # Fetch sun and moon data (astral is only loaded when today's entry is not cached yet)
+    ephemeris = get_sun_and_moon_info(latitude, longitude, timezone, datetime.utcnow().date())
     sun_and_moon_info = {
-        'sun_info': {
-            'dawn': s['dawn'].isoformat(),
-            'sunrise': s['sunrise'].isoformat(),
-            'noon': s['noon'].isoformat(),
-            'sunset': s['sunset'].isoformat(),
-            'dusk': s['dusk'].isoformat(),
-        },
-        'moon.phase': moon_phase_name
+        'sun_info': ephemeris['sun_info'],
+        'moon.phase': ephemeris['moon_phase']
     }
 
+    # Reach back to the station's high watermark so no hour is skipped. The station
+    # lookup may download the station catalogue, so it is the first network call.
+    startup_checkpoint()
+    station_id, _, _ = nearest_station(latitude, longitude)
+    watermark_key = f"{location_key(config, location)}@{station_id}"
+    high_watermark = watermarks.high_watermark(watermark_key)
+    if high_watermark is not None:
+        max_catchup = timedelta(hours=float(config.get('max_catchup_hours', DEFAULT_MAX_CATCHUP_HOURS)))
+        start = min(start, max(high_watermark, end - max_catchup))
+    else:
+        # First run for this station: seed the watermark with the window start before anything
+        # is sent, so if LogScale does not accept this window the next run fetches it again
+        watermarks.advance(watermark_key, start, save=False)
+
     # Fetch weather data
-    weather_data = fetch_weather_data(latitude, longitude, units)
+    weather_data = fetch_weather_data(latitude, longitude, units, start, end, store_from_config(config))
     if weather_data.empty:
-        logging.error("No weather data fetched.")
-        return
+        logging.error(f"No weather data fetched for {config['city_name']}.")
+        return LocationResult([], "", weather_data, watermark_key, [], {})
+
+    # Drop rows that were already sent. The sent-event filter only picks the rows worth
+    # checking; a row is dropped only if the watermarks record it as acknowledged, so a
+    # false positive of the filter cannot lose an hour.
+    event_keys = [f"{watermark_key}|{report_time}" for report_time in weather_data.index.strftime('%Y-%m-%dT%H:%M:%SZ')]
+    observed = weather_data.index.to_pydatetime().tolist()
+    candidates = [time for key, time in zip(event_keys, observed) if key in sent_events]
+    already_sent = set(watermarks.acknowledged(watermark_key, candidates)) if candidates else set()
+    unsent = [time not in already_sent for time in observed]
+    if not all(unsent):
+        logging.info(f"Skipping {unsent.count(False)} already sent rows for {config['city_name']}")
+        weather_data = weather_data[unsent]
+        event_keys = [key for key, keep in zip(event_keys, unsent) if keep]
+    if weather_data.empty:
+        return LocationResult([], "", weather_data, watermark_key, [], {})
+
+    # Flag anomalies in the real observations
+    observation_times = (weather_data.index.asi8 // 10**9).tolist()
+    anomalies, detector_state = detector.evaluate(
+        watermark_key, observation_times,
+        {field: column_values(weather_data, field) for field in DEFAULT_FIELDS if field in weather_data})
 
     # Generate extreme weather data if specified
     alert_message = ""
@@ -255,30 +387,177 @@ def main():
         weather_data, alert_message = generate_extreme_weather_data(weather_data, extreme_field, extreme_level, units)
 
     # Generate log lines
-    log_lines = generate_log_lines(weather_data, sun_and_moon_info, encounter_id, alias, config, alert_message)
-    if not log_lines:
-        logging.error("No log lines generated.")
+    log_lines = generate_log_lines(weather_data, sun_and_moon_info, encounter_id, alias, config, alert_message, anomalies)
+    return LocationResult(log_lines, alert_message, weather_data, watermark_key, event_keys, detector_state)
+
+def run_fetch(config, client, start, end, verbose=True):
+    """
+    Fetch, enrich and send the weather observations between start and end for
+    every configured location. Locations are fetched and enriched concurrently
+    on a bounded thread pool. As they finish, their events are grouped into
+    batches of up to `batch_max_events`, encoded on a thread and uploaded with
+    aiohttp, so earlier batches are sent while later locations are still being
+    fetched.
+    Returns:
+        bool: True if every location was fetched and its events were accepted by LogScale.
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from anomaly_detector import detector_from_config
+    from dedup import RotatingBloomFilter
+    from ephemeris_cache import save_caches
+    from logscale_client import encode_json
+    from pipeline import DEFAULT_QUEUE_SIZE, DEFAULT_SEND_CONCURRENCY, AsyncSender, Stage, run_pipeline
+    from watermarks import WatermarkStore
+
+    locations = get_locations(config)
+    watermarks = WatermarkStore()
+    sent_events = RotatingBloomFilter()
+    detector = detector_from_config(config)
+    workers = min(int(config.get('fetch_workers', DEFAULT_FETCH_WORKERS)), len(locations))
+    pending = []  # fetched locations waiting to fill a batch
+    totals = {"events": 0, "anomalies": 0, "failed_batches": 0}
+
+    def fetch(location):
+        return fetch_location(config, location, start, end, watermarks, sent_events, detector)
+
+    def flush_batch():
+        if not pending:
+            return None
+        batch = list(pending)
+        pending.clear()
+        return batch
+
+    def collect(result):
+        if not result.log_lines:
+            return None
+        pending.append(result)
+        if sum(len(pending_result.log_lines) for pending_result in pending) >= client.batch_max_events:
+            return flush_batch()
+        return None
+
+    def serialize(batch):
+        log_lines = [line for result in batch for line in result.log_lines]
+        if verbose and totals["events"] == 0:
+            extreme_field = config.get('extreme_field', 'none')
+            alert_message, weather_data = batch[0].alert_message, batch[0].weather_data
+            # Display a summary for user reference
+            print("\nSummary of Changes:")
+            if alert_message:
+                print(f"- Extreme values applied for {extreme_field}: {weather_data.loc[weather_data.index[0], extreme_field]}")
+                print(f"- Alert generated: {alert_message}")
+            else:
+                print("- No extreme values applied.")
+            print(f"\nSearch for the following fields in LogScale:")
+            print(f"- observer.id: {config['encounter_id']}")
+            print(f"- observer.alias: {config['alias']}")
+
+            # Display an example log line for user reference
+            example_log_line = json.dumps(log_lines[0], indent=4)
+            print("\nExample Log Line:")
+            print(example_log_line)
+        totals["events"] += len(log_lines)
+        totals["anomalies"] += sum(line["attributes"]["weather"]["anomaly"]["detected"] for line in log_lines)
+        return batch, [encode_json(line) for line in log_lines]
+
+    def commit(sent):
+        batch, summary = sent
+        if summary['failed_chunks']:
+            totals["failed_batches"] += 1
+            return
+        # Only rows LogScale accepted advance the watermarks, the sent-event filter and
+        # the anomaly statistics, so rows fetched again after a failure are counted once
+        for result in batch:
+            watermarks.advance(result.watermark_key, result.weather_data.index.max().to_pydatetime(), save=False)
+            watermarks.mark_hours(result.watermark_key, result.weather_data.index.to_pydatetime(), save=False)
+            sent_events.add_many(result.event_keys)
+            detector.apply(result.watermark_key, result.detector_state)
+
+    async def fetch_and_send():
+        async with AsyncSender(client) as sender:
+            async def send(batch_and_encoded):
+                batch, encoded = batch_and_encoded
+                return batch, await sender.send_encoded(encoded)
+
+            with ThreadPoolExecutor(max_workers=workers) as fetch_pool, \
+                    ThreadPoolExecutor(max_workers=1) as encoder:
+                return await run_pipeline(locations, [
+                    Stage('fetch', fetch, concurrency=workers, executor=fetch_pool),
+                    Stage('batch', collect, flush=flush_batch),
+                    Stage('serialize', serialize, executor=encoder),
+                    Stage('send', send, concurrency=int(config.get('pipeline_send_concurrency', DEFAULT_SEND_CONCURRENCY))),
+                    Stage('commit', commit),
+                ], queue_size=int(config.get('pipeline_queue_size', DEFAULT_QUEUE_SIZE)))
+
+    stats = asyncio.run(fetch_and_send())
+    save_caches()
+    watermarks.save()
+    fetched = stats["stages"]["fetch"]["items"]
+    logging.info(f"Fetched {fetched}/{len(locations)} locations in {stats['elapsed_s']:.2f}s")
+    if totals["events"] == 0:
+        logging.info("No new observations to send.")
+        return fetched == len(locations)
+
+    sent_events.save()
+    detector.save()
+    if totals["failed_batches"]:
+        return False
+    if totals["anomalies"]:
+        logging.warning(f"{totals['anomalies']} observations flagged as anomalous")
+    return fetched == len(locations)
+
+def main(catchup_hours=1.0):
+    if not validate_config():
         return
 
-    # Display a summary for user reference
-    print("\nSummary of Changes:")
-    if alert_message:
-        print(f"- Extreme values applied for {extreme_field}: {weather_data.loc[weather_data.index[0], extreme_field]}")
-        print(f"- Alert generated: {alert_message}")
-    else:
-        print("- No extreme values applied.")
-    print(f"\nSearch for the following fields in LogScale:")
-    print(f"- observer.id: {encounter_id}")
-    print(f"- observer.alias: {alias}")
+    from fetch_daemon import fetch_lock, record_failure, record_success
+    from logscale_client import client_from_config
+
+    config = load_config()
+    client = client_from_config(config, 'logscale_api_token_case_study')
+
+    # Never overlap with a run that is still going (from cron or the daemon)
+    with fetch_lock() as acquired:
+        if not acquired:
+            logging.warning("Another fetch is still running; skipping this run.")
+            return
+        end = datetime.utcnow()
+        if run_fetch(config, client, end - timedelta(hours=catchup_hours), end):
+            record_success(end)
+        else:
+            record_failure()
 
-    # Display an example log line for user reference
-    example_log_line = json.dumps(log_lines[0], indent=4)
-    print("\nExample Log Line:")
-    print(example_log_line)
+def daemon_main():
+    """Run the fetch on an internal schedule in a long-lived process."""
+    if not validate_config():
+        return
 
-    # Send log lines to LogScale
-    status_code, response_text = send_to_logscale(log_lines, logscale_api_token)
-    logging.info(f"Response from LogScale: Status Code: {status_code}, Response: {response_text}")
+    from fetch_daemon import (FetchDaemon, DEFAULT_INTERVAL_MINUTES,
+                              DEFAULT_JITTER_SECONDS, DEFAULT_MAX_CATCHUP_HOURS)
+    from logscale_client import client_from_config
+
+    config = load_config()
+    client = client_from_config(config, 'logscale_api_token_case_study')
+    daemon = FetchDaemon(
+        lambda start, end: run_fetch(config, client, start, end, verbose=False),
+        interval_minutes=float(config.get('fetch_interval_minutes', DEFAULT_INTERVAL_MINUTES)),
+        jitter_seconds=float(config.get('fetch_jitter_seconds', DEFAULT_JITTER_SECONDS)),
+        max_catchup_hours=float(config.get('max_catchup_hours', DEFAULT_MAX_CATCHUP_HOURS)),
+    )
+    daemon.run()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Fetch the last hour of weather data and send it to LogScale.")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="print an import-time breakdown up to the first network call and check the startup budget")
+    parser.add_argument('--daemon', action='store_true',
+                        help="stay resident and fetch on an internal schedule instead of once")
+    parser.add_argument('--catchup-hours', type=float, default=1.0,
+                        help="fetch this many hours back; rows that were already sent are skipped (default: 1)")
+    args = parser.parse_args()
+    if args.startup_report:
+        sys.exit(startup_report())
+    if args.daemon:
+        daemon_main()
+    else:
+        main(args.catchup_hours)
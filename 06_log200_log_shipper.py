@@ -0,0 +1,56 @@
+import argparse
+import json
+import logging
+import os
+import signal
+
+from log_shipper import shipper_from_config
+from logscale_client import client_from_config
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+
+CONFIG_FILE = 'config.json'
+REQUIRED_FIELDS = ['logscale_api_token_raw']
+LOG_FILE_PATH = 'atmospheric_data.log'
+
+# Load configuration
+def load_config():
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r') as file:
+            return json.load(file)
+    return {}
+
+# Validate configuration
+def validate_config():
+    config = load_config()
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in config or config[field] in ('', 'REPLACEME')]
+    if missing_fields:
+        print(f"\nMissing required fields: {', '.join(missing_fields)}")
+        return False
+    return True
+
+def main(log_file_path=LOG_FILE_PATH, follow=True):
+    """Ship atmospheric_data.log and its rotated segments to the LogScale raw endpoint."""
+    if not validate_config():
+        return
+
+    config = load_config()
+    # The shipper resends from its checkpoints and spools nothing itself, but it drains
+    # the raw bodies that 02 could not send, in the background while it follows the file
+    client = client_from_config(config, 'logscale_api_token_raw', endpoint='raw', spool=True,
+                                replay='background' if follow else 'once')
+    shipper = shipper_from_config(config, client, log_file_path)
+    signal.signal(signal.SIGTERM, lambda signum, frame: shipper.stop())
+    logging.info(f"Shipping {log_file_path} to {client.url}")
+    try:
+        shipper.run(follow=follow)
+    except KeyboardInterrupt:
+        logging.info("Stopped; the next run resumes after the last acknowledged line.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tail atmospheric_data.log and ship new lines to LogScale.")
+    parser.add_argument('--file', default=LOG_FILE_PATH, help=f"log file to ship (default: {LOG_FILE_PATH})")
+    parser.add_argument('--once', action='store_true', help="ship what is there now and exit instead of following the file")
+    args = parser.parse_args()
+    main(args.file, follow=not args.once)
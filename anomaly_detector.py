@@ -0,0 +1,175 @@
+import json
+import logging
+import math
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+ANOMALY_STATE_FILE = os.path.join('cache', 'anomaly_state.json')
+DEFAULT_FIELDS = ['temp', 'dwpt', 'rhum', 'prcp', 'wspd', 'wpgt', 'pres']
+DEFAULT_ALPHA = 0.1  # EWMA weight of the newest observation
+DEFAULT_Z_THRESHOLD = 4.0
+DEFAULT_WARMUP = 24  # observations before z-scores are trusted
+MAX_RATE_GAP_HOURS = 6.0  # no rate of change across longer gaps
+
+# Largest plausible change per hour in metric units (°C, %, hPa, km/h); no limit for precipitation
+RATE_LIMITS_METRIC = {
+    'temp': 8.0,
+    'dwpt': 8.0,
+    'rhum': 40.0,
+    'pres': 4.0,
+    'wspd': 40.0,
+    'wpgt': 60.0,
+}
+# Scale of the imperial conversions in 05_log200_periodic_fetch.py, for rate limits
+IMPERIAL_SCALE = {
+    'temp': 9 / 5,
+    'dwpt': 9 / 5,
+    'wspd': 2.23694,
+    'wpgt': 2.23694,
+    'prcp': 1 / 25.4,
+    'snow': 1 / 25.4,
+    'pres': 0.02953,
+}
+
+# Positions in a field's persisted state list
+COUNT, MEAN, VARIANCE, LAST_VALUE, LAST_TIME, MINIMUM, MAXIMUM = range(7)
+
+
+class AnomalyDetector:
+    """
+    Streaming per-station, per-field anomaly detector with O(1) updates.
+
+    For every key (a station) and field it keeps an exponentially weighted mean
+    and variance, the last value and its time, and the running minimum and
+    maximum. A new observation is flagged when its z-score against the EWMA
+    statistics reaches `z_threshold` (after `warmup` observations) or when its
+    change per hour since the previous observation reaches the field's rate
+    limit. Observations at or before a field's last time are skipped, so
+    re-processing a window never updates the statistics twice.
+
+    State is kept in ANOMALY_STATE_FILE per key and units. `evaluate` scores
+    observations without touching it, and callers `apply` the returned state
+    and save it only once the events it annotated have been accepted, so rows
+    that are fetched again after a failed send are not counted twice.
+    """
+
+    def __init__(self, path: str = ANOMALY_STATE_FILE, units: str = 'metric',
+                 alpha: float = DEFAULT_ALPHA, z_threshold: float = DEFAULT_Z_THRESHOLD,
+                 warmup: int = DEFAULT_WARMUP, rate_limits: Optional[Dict[str, float]] = None):
+        self.path = path
+        self.units = units
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        if rate_limits is None:
+            scale = IMPERIAL_SCALE if units == 'imperial' else {}
+            rate_limits = {field: limit * scale.get(field, 1.0) for field, limit in RATE_LIMITS_METRIC.items()}
+        self.rate_limits = rate_limits
+        self.lock = threading.Lock()
+        self.state: Dict[str, Dict[str, List[float]]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as file:
+                    self.state = json.load(file)
+            except (OSError, json.JSONDecodeError):
+                logging.warning(f"Ignoring unreadable anomaly state {path}")
+
+    def evaluate(self, key: str, times: Sequence[float],
+                 columns: Dict[str, Sequence[Any]]) -> Tuple[List[List[Dict[str, Any]]], Dict[str, List[float]]]:
+        """
+        Score a station's observations, oldest first, without changing the detector's state.
+        Args:
+            key (str): The station key.
+            times (Sequence[float]): Observation times in epoch seconds.
+            columns (Dict[str, Sequence[Any]]): Values per field; None or NaN values are skipped.
+        Returns:
+            Tuple[List[List[Dict[str, Any]]], Dict[str, List[float]]]: For every
+            observation, the fields that breached a limit; and the station's
+            state after these observations, for `apply`.
+        """
+        breaches: List[List[Dict[str, Any]]] = [[] for _ in times]
+        alpha, warmup, z_threshold = self.alpha, self.warmup, self.z_threshold
+        with self.lock:
+            station = {field: list(stats) for field, stats in self.state.get(f"{key}:{self.units}", {}).items()}
+        for field, values in columns.items():
+            stats = station.get(field)
+            rate_limit = self.rate_limits.get(field)
+            for row, (time_s, value) in enumerate(zip(times, values)):
+                if value is None or value != value:
+                    continue
+                if stats is None:
+                    stats = station[field] = [1, value, 0.0, value, time_s, value, value]
+                    continue
+                if time_s <= stats[LAST_TIME]:
+                    continue
+
+                mean, variance = stats[MEAN], stats[VARIANCE]
+                zscore = None
+                if stats[COUNT] >= warmup and variance > 0:
+                    zscore = (value - mean) / math.sqrt(variance)
+                hours = (time_s - stats[LAST_TIME]) / 3600
+                rate = (value - stats[LAST_VALUE]) / hours if hours <= MAX_RATE_GAP_HOURS else None
+
+                reasons = []
+                if zscore is not None and abs(zscore) >= z_threshold:
+                    reasons.append('zscore')
+                if rate is not None and rate_limit is not None and abs(rate) >= rate_limit:
+                    reasons.append('rate_of_change')
+                if reasons:
+                    breaches[row].append({
+                        'field': field,
+                        'value': value,
+                        'reasons': reasons,
+                        'zscore': round(zscore, 2) if zscore is not None else None,
+                        'rate_per_hour': round(rate, 2) if rate is not None else None,
+                        'mean': round(mean, 2),
+                        'stddev': round(math.sqrt(variance), 2),
+                        'min': stats[MINIMUM],
+                        'max': stats[MAXIMUM],
+                    })
+
+                diff = value - mean
+                increment = alpha * diff
+                stats[MEAN] = mean + increment
+                stats[VARIANCE] = (1 - alpha) * (variance + diff * increment)
+                stats[COUNT] += 1
+                stats[LAST_VALUE] = value
+                stats[LAST_TIME] = time_s
+                if value < stats[MINIMUM]:
+                    stats[MINIMUM] = value
+                if value > stats[MAXIMUM]:
+                    stats[MAXIMUM] = value
+        return breaches, station
+
+    def apply(self, key: str, station: Dict[str, List[float]]):
+        """Keep a station's state from `evaluate`, once its observations were delivered."""
+        with self.lock:
+            current = self.state.setdefault(f"{key}:{self.units}", {})
+            for field, stats in station.items():
+                if field not in current or stats[LAST_TIME] >= current[field][LAST_TIME]:
+                    current[field] = stats
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with self.lock, open(tmp_path, 'w') as file:
+            json.dump(self.state, file, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+
+def detector_from_config(config: Dict[str, Any]) -> AnomalyDetector:
+    """
+    Build an anomaly detector from the script configuration.
+    Args:
+        config (Dict[str, Any]): The loaded config.json contents.
+    Returns:
+        AnomalyDetector: The detector, with its persisted state loaded.
+    """
+    return AnomalyDetector(
+        units=config.get('units', 'metric'),
+        alpha=float(config.get('anomaly_alpha', DEFAULT_ALPHA)),
+        z_threshold=float(config.get('anomaly_z_threshold', DEFAULT_Z_THRESHOLD)),
+        warmup=int(config.get('anomaly_warmup', DEFAULT_WARMUP)),
+        rate_limits=config.get('anomaly_rate_limits'),
+    )
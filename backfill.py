@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple
+
+DEFAULT_CHUNK_DAYS = 365
+
+
+class WorkUnit(NamedTuple):
+    """One (location x date range) slice of a backfill."""
+    location: Dict[str, Any]
+    date_start: str  # YYYY-MM-DD, inclusive
+    date_end: str  # YYYY-MM-DD, inclusive
+
+
+def plan_work_units(locations: List[Dict[str, Any]], date_start: str, date_end: str,
+                    chunk_days: int = DEFAULT_CHUNK_DAYS) -> List[WorkUnit]:
+    """
+    Split a backfill into work units of at most `chunk_days` days per location.
+    Args:
+        locations (List[Dict[str, Any]]): The locations to backfill.
+        date_start (str): First date of the range (YYYY-MM-DD).
+        date_end (str): Last date of the range (YYYY-MM-DD).
+        chunk_days (int): Maximum number of days in one work unit.
+    Returns:
+        List[WorkUnit]: The work units, location by location in date order.
+    """
+    start = datetime.strptime(date_start, '%Y-%m-%d')
+    end = datetime.strptime(date_end, '%Y-%m-%d')
+    units = []
+    for location in locations:
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end)
+            units.append(WorkUnit(location, chunk_start.strftime('%Y-%m-%d'), chunk_end.strftime('%Y-%m-%d')))
+            chunk_start = chunk_end + timedelta(days=1)
+    return units
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}"
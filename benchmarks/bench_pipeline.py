@@ -0,0 +1,253 @@
+"""
+Per-stage benchmarks of the fetch -> enrich -> serialize -> send pipeline of 04 and 05.
+
+Synthetic Meteostat-shaped frames (daily for 04, hourly for 05) go through
+convert_units, the NaN cleanup done after fetching, generate_log_lines, event
+encoding and sending to the local ingest stand-in. Every stage reports its
+best wall time, throughput, peak traced memory and the memory blocks it leaves
+allocated. `send_to_logscale` is the serialize and send stages together. The
+stand-in runs in the same process, so the send stage includes its parsing.
+
+    python benchmarks/bench_pipeline.py --rows 20000 --output results.json
+    python benchmarks/bench_pipeline.py --rows 20000 --baseline results.json --threshold 0.2
+
+With --baseline the run exits with status 1 when any stage's time per row, or
+peak memory per row, grew by more than the threshold.
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import logscale_client  # noqa: E402
+from logscale_client import LogScaleClient, encode_json  # noqa: E402
+from logscale_standin import StandinServer  # noqa: E402
+
+DAILY_COLUMNS = ['tavg', 'tmin', 'tmax', 'prcp', 'snow', 'wdir', 'wspd', 'wpgt', 'pres', 'tsun']
+HOURLY_COLUMNS = ['temp', 'dwpt', 'rhum', 'prcp', 'snow', 'wdir', 'wspd', 'wpgt', 'pres', 'tsun', 'coco']
+MISSING_SHARE = 0.1  # share of NaN values, as in real Meteostat data
+LOCATION = {
+    'city_name': 'Ann Arbor', 'country_name': 'US',
+    'latitude': 42.2808, 'longitude': -83.7430, 'timezone': 'America/Detroit',
+}
+SUN_AND_MOON_INFO = {
+    'moon.phase': 'Full Moon',
+    'sun_info': {
+        'dawn': '2024-06-01T05:31:00-04:00', 'sunrise': '2024-06-01T06:02:00-04:00',
+        'noon': '2024-06-01T13:38:00-04:00', 'sunset': '2024-06-01T21:13:00-04:00',
+        'dusk': '2024-06-01T21:45:00-04:00',
+    },
+}
+
+
+def load_script(file_name, module_name):
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(REPO_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_frame(rng, rows, columns, freq):
+    """Build a Meteostat-shaped frame with plausible metric values and some missing ones."""
+    ranges = {
+        'tavg': (-20, 35), 'tmin': (-25, 25), 'tmax': (-15, 40), 'temp': (-20, 35), 'dwpt': (-25, 25),
+        'rhum': (10, 100), 'prcp': (0, 30), 'snow': (0, 500), 'wdir': (0, 360), 'wspd': (0, 60),
+        'wpgt': (0, 100), 'pres': (980, 1040), 'tsun': (0, 60), 'coco': (1, 27),
+    }
+    index = pd.date_range(end=datetime(2024, 6, 1), periods=rows, freq=freq, name='time')
+    data = {}
+    for column in columns:
+        low, high = ranges[column]
+        values = rng.uniform(low, high, rows).round(1)
+        values[rng.random(rows) < MISSING_SHARE] = np.nan
+        data[column] = values
+    frame = pd.DataFrame(data, index=index)
+    frame['station_name'] = 'Ann Arbor Municipal'
+    return frame
+
+
+def clean(data):
+    """The NaN cleanup both fetch_weather_data functions run after convert_units."""
+    return data.replace([np.nan, np.inf, -np.inf], None)
+
+
+def measure(stage, prepare, repeat):
+    """
+    Time `stage(prepare())` and trace its memory.
+    Returns the best wall time of `repeat` untraced runs, then the peak traced
+    memory and the number of blocks still allocated when the stage returned,
+    from one extra traced run.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        argument = prepare()
+        gc.collect()  # start every run without garbage left by the previous one
+        start = time.perf_counter()
+        stage(argument)
+        best = min(best, time.perf_counter() - start)
+
+    argument = prepare()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    output = stage(argument)  # kept alive so its blocks are counted
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del output
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    return best, peak, blocks
+
+
+def run_pipeline(name, frame, convert, generate, client, rows, repeat):
+    """Run every stage of one script's pipeline, each on the previous stage's output."""
+    converted = convert(frame.copy())
+    cleaned = clean(converted)
+    log_lines = generate(cleaned)
+    encoded = [encode_json(event) for event in log_lines]
+
+    def send(encoded_events):
+        summary = client.send_encoded(encoded_events)
+        if summary.get('failed_chunks'):
+            raise RuntimeError(f"{summary['failed_chunks']} chunks failed to send")
+        return summary
+
+    stages = [
+        ('convert_units', convert, frame.copy),
+        ('clean', clean, lambda: converted),
+        ('generate_log_lines', generate, lambda: cleaned),
+        ('serialize', lambda events: [encode_json(event) for event in events], lambda: log_lines),
+        ('send', send, lambda: encoded),
+    ]
+    results = {}
+    for stage_name, stage, prepare in stages:
+        seconds, peak, blocks = measure(stage, prepare, repeat)
+        results[f"{name}.{stage_name}"] = {
+            "rows": rows,
+            "seconds": seconds,
+            "rows_per_s": rows / seconds if seconds else 0.0,
+            "us_per_row": seconds / rows * 1e6,
+            "peak_bytes": peak,
+            "allocated_blocks": blocks,
+        }
+    return results
+
+
+def compare(results, baseline, threshold, memory_threshold):
+    """Print each stage against the baseline and return the names of the stages that regressed."""
+    regressions = []
+    print(f"\n{'stage':<30}{'us/row':>10}{'baseline':>10}{'change':>9}{'peak MB':>10}{'baseline':>10}")
+    for stage, result in results.items():
+        base = baseline.get(stage)
+        if base is None:
+            print(f"{stage:<30}{result['us_per_row']:>10.2f}{'-':>10}")
+            continue
+        time_change = result['us_per_row'] / base['us_per_row'] - 1 if base['us_per_row'] else 0.0
+        memory_change = ((result['peak_bytes'] / result['rows']) / (base['peak_bytes'] / base['rows']) - 1
+                         if base['peak_bytes'] else 0.0)
+        flag = ''
+        if time_change > threshold or memory_change > memory_threshold:
+            regressions.append(stage)
+            flag = '  REGRESSED'
+        print(f"{stage:<30}{result['us_per_row']:>10.2f}{base['us_per_row']:>10.2f}{time_change:>+9.0%}"
+              f"{result['peak_bytes'] / 1e6:>10.1f}{base['peak_bytes'] / 1e6:>10.1f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the 04 and 05 ingest pipelines.")
+    parser.add_argument('--rows', type=int, default=20000, help="rows per synthetic frame (default: 20000)")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per stage; the best is kept (default: 5)")
+    parser.add_argument('--scripts', nargs='+', choices=['04', '05'], default=['04', '05'],
+                        help="pipelines to benchmark (default: both)")
+    parser.add_argument('--units', choices=['metric', 'imperial'], default='imperial',
+                        help="units passed to convert_units (default: imperial, which converts)")
+    parser.add_argument('--seed', type=int, default=42, help="seed for the synthetic frames (default: 42)")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against the results in this JSON file")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="largest allowed growth in time per row (default: 0.2, i.e. 20%%)")
+    parser.add_argument('--memory-threshold', type=float, default=0.2,
+                        help="largest allowed growth in peak memory per row (default: 0.2)")
+    args = parser.parse_args()
+
+    case_study = load_script('04_log200_case_study.py', 'case_study') if '04' in args.scripts else None
+    periodic_fetch = load_script('05_log200_periodic_fetch.py', 'periodic_fetch') if '05' in args.scripts else None
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server = StandinServer(port=0).start()
+    client = LogScaleClient('bench', base_url=server.url)
+    rng = np.random.default_rng(args.seed)
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # The ephemeris and timezone caches start cold and stay out of the checkout
+        os.chdir(workdir)
+        try:
+            if case_study:
+                frame = synthetic_frame(rng, args.rows, DAILY_COLUMNS, 'D')
+                results.update(run_pipeline(
+                    '04', frame,
+                    lambda data: case_study.convert_units(data, args.units),
+                    lambda data: case_study.generate_log_lines(data, 'bench', 'bench', LOCATION),
+                    client, args.rows, args.repeat))
+            if periodic_fetch:
+                frame = synthetic_frame(rng, args.rows, HOURLY_COLUMNS, 'h')
+                results.update(run_pipeline(
+                    '05', frame,
+                    lambda data: periodic_fetch.convert_units(data, args.units),
+                    lambda data: periodic_fetch.generate_log_lines(
+                        data, SUN_AND_MOON_INFO, 'bench', 'bench', LOCATION, ''),
+                    client, args.rows, args.repeat))
+        finally:
+            os.chdir(cwd)
+            server.shutdown()
+
+    print(f"\n{'stage':<30}{'rows/s':>12}{'us/row':>10}{'peak MB':>10}{'blocks':>12}")
+    for stage, result in results.items():
+        print(f"{stage:<30}{result['rows_per_s']:>12.0f}{result['us_per_row']:>10.2f}"
+              f"{result['peak_bytes'] / 1e6:>10.1f}{result['allocated_blocks']:>12}")
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec='seconds'),
+            "rows": args.rows,
+            "repeat": args.repeat,
+            "units": args.units,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "json_backend": logscale_client.JSON_BACKEND,
+        },
+        "stages": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)['stages']
+        regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) regressed past the threshold: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo stage regressed past the threshold.")
+
+
+if __name__ == "__main__":
+    main()
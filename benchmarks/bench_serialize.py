@@ -0,0 +1,87 @@
+"""
+Encode cost per event for the structured ingest path.
+
+Compares the old demo path (the payload encoded once for the printed curl
+command and again for the request) with single-pass encoding through the
+stdlib json encoder and, when it is installed, orjson.
+
+    python benchmarks/bench_serialize.py --events 100000
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logscale_client  # noqa: E402
+from logscale_client import DEFAULT_TAGS, encode_structured  # noqa: E402
+
+
+def load_structured_script():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '01_log200_ingest_structured.py')
+    spec = importlib.util.spec_from_file_location('ingest_structured', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def encode_twice(events):
+    """The old path: json.dumps for the printed curl command, then again for the request body."""
+    payload = [{"tags": DEFAULT_TAGS, "events": events}]
+    json.dumps(payload)
+    return json.dumps(payload).encode('utf-8')
+
+
+def encode_once_json(events):
+    backend = logscale_client.orjson
+    logscale_client.orjson = None
+    try:
+        return encode_structured(events)[0]
+    finally:
+        logscale_client.orjson = backend
+
+
+def encode_once_orjson(events):
+    return encode_structured(events)[0]
+
+
+def measure(encode, events, repeat):
+    """Return the best wall time of `repeat` runs and the encoded body size."""
+    best = float('inf')
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(encode(events))
+        best = min(best, time.perf_counter() - start)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the encode cost per structured event.")
+    parser.add_argument('--events', type=int, default=100000, help="events per batch (default: 100000)")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per encoder; the best is reported (default: 5)")
+    args = parser.parse_args()
+
+    structured = load_structured_script()
+    events = [structured.generate_weather_event('bench', 'bench') for _ in range(args.events)]
+
+    encoders = [('json x2 (old demo path)', encode_twice), ('json x1', encode_once_json)]
+    if logscale_client.orjson is not None:
+        encoders.append(('orjson x1', encode_once_orjson))
+    else:
+        print("orjson is not installed; skipping the orjson backend.")
+
+    print(f"\n{'encoder':<26}{'us/event':>10}{'MB/s':>10}{'bytes':>14}")
+    baseline = None
+    for name, encode in encoders:
+        elapsed, size = measure(encode, events, args.repeat)
+        baseline = baseline or elapsed
+        print(f"{name:<26}{elapsed / args.events * 1e6:>10.2f}{size / elapsed / (1024 * 1024):>10.1f}"
+              f"{size:>14}   {baseline / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+import math
+import os
+from typing import Iterable, List
+
+SENT_EVENTS_FILE = os.path.join('cache', 'sent_events.bloom')
+DEFAULT_CAPACITY = 200000  # keys per generation
+DEFAULT_ERROR_RATE = 0.0001
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string keys using double hashing."""
+
+    def __init__(self, capacity: int, error_rate: float, bits: bytearray = None, count: int = 0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.size + 7) // 8)
+        self.count = count
+
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RotatingBloomFilter:
+    """
+    Compact, bounded memory of recently sent event keys.
+
+    Keys are added to the current generation; once it holds `capacity` keys it
+    becomes the previous generation and a fresh one is started, so the oldest
+    keys are forgotten while the last `capacity`..`2 * capacity` keys are always
+    remembered. Membership checks look at both generations. False positives
+    (a new key reported as seen) happen at roughly `error_rate` per generation.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE,
+                 path: str = SENT_EVENTS_FILE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.path = path
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous = BloomFilter(capacity, error_rate)
+        self._load()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.current or key in self.previous
+
+    def add_many(self, keys: Iterable[str]):
+        for key in keys:
+            if self.current.count >= self.capacity:
+                self.previous = self.current
+                self.current = BloomFilter(self.capacity, self.error_rate)
+            self.current.add(key)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as file:
+                header = json.loads(file.readline())
+                if header['capacity'] != self.capacity or header['error_rate'] != self.error_rate:
+                    logging.warning("Sent-event filter settings changed; starting with an empty filter.")
+                    return
+                size = len(self.current.bits)
+                current_bits, previous_bits = bytearray(file.read(size)), bytearray(file.read(size))
+                if len(current_bits) != size or len(previous_bits) != size:
+                    raise ValueError("truncated filter")
+                self.current = BloomFilter(self.capacity, self.error_rate, current_bits, header['current_count'])
+                self.previous = BloomFilter(self.capacity, self.error_rate, previous_bits, header['previous_count'])
+        except (OSError, ValueError, KeyError):
+            logging.warning(f"Ignoring unreadable sent-event filter {self.path}")
+
+    def save(self):
+        header = {
+            'capacity': self.capacity,
+            'error_rate': self.error_rate,
+            'current_count': self.current.count,
+            'previous_count': self.previous.count,
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(json.dumps(header).encode('utf-8') + b'\n')
+            file.write(self.current.bits)
+            file.write(self.previous.bits)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,186 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import threading
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Set
+
+from zoneinfo import ZoneInfo
+
+EPHEMERIS_CACHE_DIR = os.path.join('cache', 'ephemeris')
+COORDINATE_PRECISION = 4  # decimal places, roughly 11 m
+LRU_SIZE = 8192
+
+_cache_lock = threading.Lock()
+_unsaved: Set['EphemerisCache'] = set()  # caches with dates computed by get_sun_and_moon_info
+
+
+def get_moon_phase_name(moon_phase_value):
+    if moon_phase_value < 0.125:
+        return "New Moon"
+    elif moon_phase_value < 0.25:
+        return "Waxing Crescent"
+    elif moon_phase_value < 0.375:
+        return "First Quarter"
+    elif moon_phase_value < 0.5:
+        return "Waxing Gibbous"
+    elif moon_phase_value < 0.625:
+        return "Full Moon"
+    elif moon_phase_value < 0.75:
+        return "Waning Gibbous"
+    elif moon_phase_value < 0.875:
+        return "Last Quarter"
+    else:
+        return "Waning Crescent"
+
+
+def compute_sun_and_moon_info(latitude: float, longitude: float, tz_name: str, day: date) -> Dict[str, Any]:
+    """
+    Compute sun times and the moon phase for a location and date with astral.
+    Args:
+        latitude (float): Latitude of the location.
+        longitude (float): Longitude of the location.
+        tz_name (str): IANA timezone name used for the sun times.
+        day (date): The date to compute.
+    Returns:
+        Dict[str, Any]: ISO-formatted sun times under 'sun_info' and the 'moon_phase' name.
+    """
+    # astral is imported here so that warm-cache lookups never load it
+    from astral import LocationInfo
+    from astral.moon import phase
+    from astral.sun import sun
+
+    city = LocationInfo('', '', tz_name, latitude, longitude)
+    s = sun(city.observer, date=day, tzinfo=ZoneInfo(tz_name))
+    moon_phase_value = (phase(day) % 30) / 30  # Normalize to [0, 1] range
+    return {
+        'sun_info': {
+            'dawn': s['dawn'].isoformat(),
+            'sunrise': s['sunrise'].isoformat(),
+            'noon': s['noon'].isoformat(),
+            'sunset': s['sunset'].isoformat(),
+            'dusk': s['dusk'].isoformat(),
+        },
+        'moon_phase': get_moon_phase_name(moon_phase_value)
+    }
+
+
+class EphemerisCache:
+    """
+    Sun and moon information for one location, cached per date on disk.
+
+    The location is keyed by coordinates rounded to COORDINATE_PRECISION and its
+    timezone name; each location is stored as one JSON file in `cache_dir`.
+    """
+
+    def __init__(self, latitude: float, longitude: float, tz_name: str,
+                 cache_dir: str = EPHEMERIS_CACHE_DIR):
+        self.latitude = round(float(latitude), COORDINATE_PRECISION)
+        self.longitude = round(float(longitude), COORDINATE_PRECISION)
+        self.tz_name = str(tz_name)
+        file_name = f"{self.latitude}_{self.longitude}_{self.tz_name.replace('/', '-')}.json"
+        self.path = os.path.join(cache_dir, file_name)
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+        self.dirty = False
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError):
+            logging.warning(f"Ignoring unreadable ephemeris cache file {self.path}")
+            return {}
+
+    def get(self, day: date) -> Dict[str, Any]:
+        """Return the sun and moon information for a date, computing it on a cache miss."""
+        key = day.isoformat()
+        info = self.entries.get(key)
+        if info is None:
+            info = self.entries[key] = compute_sun_and_moon_info(self.latitude, self.longitude, self.tz_name, day)
+            self.dirty = True
+        return info
+
+    def precompute(self, start: date, end: date) -> int:
+        """
+        Fill the cache for every date from start to end (inclusive) and save it.
+        Returns:
+            int: The number of dates that had to be computed.
+        """
+        computed = 0
+        day = start
+        while day <= end:
+            if day.isoformat() not in self.entries:
+                self.get(day)
+                computed += 1
+            day += timedelta(days=1)
+        self.save()
+        logging.debug(f"Ephemeris cache {self.path}: {computed} dates computed for {start} to {end}")
+        return computed
+
+    def save(self):
+        """
+        Write the cache to disk if it changed since it was loaded.
+
+        Entries already on disk are merged in first, so backfill processes that
+        share a location do not drop each other's dates.
+        """
+        if not self.dirty:
+            return
+        on_disk = self._load()
+        on_disk.update(self.entries)
+        self.entries = on_disk
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(self.entries, file)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def get_location_cache(latitude: float, longitude: float, tz_name: Any) -> EphemerisCache:
+    """Return the process-wide cache for a location, loading it from disk on first use."""
+    return _location_cache(round(float(latitude), COORDINATE_PRECISION),
+                           round(float(longitude), COORDINATE_PRECISION), str(tz_name))
+
+
+@lru_cache(maxsize=64)
+def _location_cache(latitude: float, longitude: float, tz_name: str) -> EphemerisCache:
+    return EphemerisCache(latitude, longitude, tz_name)
+
+
+def get_sun_and_moon_info(latitude: float, longitude: float, tz_name: Any, day: date) -> Dict[str, Any]:
+    """
+    Return the sun and moon information for a location and date.
+
+    Lookups go through an in-process LRU first, then the on-disk cache; only a
+    miss in both runs astral. New dates are written by `save_caches`, once per
+    run and at exit, not on every miss. Every caller gets its own copy, so
+    changing it does not change the cache.
+    """
+    return copy.deepcopy(_cached_sun_and_moon_info(round(float(latitude), COORDINATE_PRECISION),
+                                                   round(float(longitude), COORDINATE_PRECISION), str(tz_name), day))
+
+
+@lru_cache(maxsize=LRU_SIZE)
+def _cached_sun_and_moon_info(latitude: float, longitude: float, tz_name: str, day: date) -> Dict[str, Any]:
+    with _cache_lock:
+        cache = _location_cache(latitude, longitude, tz_name)
+        info = cache.get(day)
+        if cache.dirty:
+            _unsaved.add(cache)
+    return info
+
+
+def save_caches():
+    """Write the location caches that get_sun_and_moon_info added dates to."""
+    with _cache_lock:
+        while _unsaved:
+            _unsaved.pop().save()
+
+
+atexit.register(save_caches)
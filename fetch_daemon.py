@@ -0,0 +1,219 @@
+import fcntl
+import json
+import logging
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DAEMON_PID_FILE = os.path.join('cache', 'periodic_fetch.pid')
+DAEMON_STATE_FILE = os.path.join('cache', 'periodic_fetch_state.json')
+DAEMON_LOG_FILE = 'periodic_fetch.log'
+FETCH_LOCK_FILE = os.path.join('cache', 'periodic_fetch.lock')
+
+DEFAULT_INTERVAL_MINUTES = 60
+DEFAULT_JITTER_SECONDS = 120
+DEFAULT_MAX_CATCHUP_HOURS = 72
+
+
+@contextmanager
+def fetch_lock(path: str = FETCH_LOCK_FILE):
+    """
+    Hold an exclusive, non-blocking lock for the duration of one fetch.
+
+    Yields True if the lock was acquired and False if another fetch (from cron
+    or the daemon) is still running.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_state(path: str = DAEMON_STATE_FILE) -> Dict[str, Any]:
+    if os.path.exists(path):
+        with open(path, 'r') as file:
+            return json.load(file)
+    return {}
+
+
+def save_state(state: Dict[str, Any], path: str = DAEMON_STATE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(state, file, indent=4)
+    os.replace(tmp_path, path)
+
+
+def record_success(end: datetime, path: str = DAEMON_STATE_FILE):
+    """Persist the end of the last window that LogScale accepted."""
+    state = load_state(path)
+    state['last_success_end'] = end.isoformat()
+    state['last_run'] = datetime.utcnow().isoformat()
+    state['consecutive_failures'] = 0
+    save_state(state, path)
+
+
+def record_failure(path: str = DAEMON_STATE_FILE):
+    state = load_state(path)
+    state['last_run'] = datetime.utcnow().isoformat()
+    state['consecutive_failures'] = state.get('consecutive_failures', 0) + 1
+    save_state(state, path)
+
+
+def fetch_window(state: Dict[str, Any], now: datetime, interval: timedelta,
+                 max_catchup: timedelta) -> Tuple[datetime, datetime]:
+    """
+    Return the (start, end) window for the next fetch.
+
+    The window starts where the last successful fetch ended, so intervals missed
+    during downtime or skipped while a run was in progress are caught up in one
+    fetch. It never reaches further back than `max_catchup`.
+    """
+    start = now - interval
+    if state.get('last_success_end'):
+        start = min(start, datetime.fromisoformat(state['last_success_end']))
+    return max(start, now - max_catchup), now
+
+
+def next_run_time(now: datetime, interval: timedelta, jitter_seconds: float) -> datetime:
+    """Return the next interval boundary after `now`, plus a random jitter."""
+    interval_seconds = interval.total_seconds()
+    elapsed = (now - datetime(1970, 1, 1)).total_seconds()
+    boundary = datetime(1970, 1, 1) + timedelta(seconds=(elapsed // interval_seconds + 1) * interval_seconds)
+    return boundary + timedelta(seconds=random.uniform(0, jitter_seconds))
+
+
+class FetchDaemon:
+    """
+    Resident scheduler that runs `job(start, end)` once per interval.
+
+    Modules, caches and the ingest connection pool stay warm between runs. A run
+    that is still going when the next one is due is not overlapped: the due run
+    is skipped and its interval is coalesced into the following window.
+    """
+
+    def __init__(self, job: Callable[[datetime, datetime], bool],
+                 interval_minutes: float = DEFAULT_INTERVAL_MINUTES,
+                 jitter_seconds: float = DEFAULT_JITTER_SECONDS,
+                 max_catchup_hours: float = DEFAULT_MAX_CATCHUP_HOURS):
+        self.job = job
+        self.interval = timedelta(minutes=interval_minutes)
+        self.jitter_seconds = jitter_seconds
+        self.max_catchup = timedelta(hours=max_catchup_hours)
+        self.stop_event = threading.Event()
+        self.worker: Optional[threading.Thread] = None
+
+    def run(self):
+        """Run until SIGTERM or SIGINT, catching up missed intervals on start."""
+        os.makedirs(os.path.dirname(DAEMON_PID_FILE), exist_ok=True)
+        with open(DAEMON_PID_FILE, 'w') as file:
+            file.write(str(os.getpid()))
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop_event.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: self.stop_event.set())
+        logging.info(f"Fetch daemon started (pid {os.getpid()}, interval {self.interval}, jitter {self.jitter_seconds}s)")
+
+        try:
+            self.trigger()  # catch up anything missed while the daemon was down
+            while not self.stop_event.is_set():
+                due = next_run_time(datetime.utcnow(), self.interval, self.jitter_seconds)
+                logging.info(f"Next fetch at {due.isoformat()}Z")
+                if self.stop_event.wait((due - datetime.utcnow()).total_seconds()):
+                    break
+                self.trigger()
+        finally:
+            if self.worker is not None:
+                self.worker.join()
+            if os.path.exists(DAEMON_PID_FILE):
+                os.remove(DAEMON_PID_FILE)
+            logging.info("Fetch daemon stopped")
+
+    def trigger(self):
+        """Start a fetch in the background unless the previous one is still running."""
+        if self.worker is not None and self.worker.is_alive():
+            logging.warning("Previous fetch is still running; coalescing this interval into the next one.")
+            return
+        self.worker = threading.Thread(target=self.run_once, name='fetch', daemon=True)
+        self.worker.start()
+
+    def run_once(self):
+        with fetch_lock() as acquired:
+            if not acquired:
+                logging.warning("Another fetch holds the lock; skipping this interval.")
+                return
+            start, end = fetch_window(load_state(), datetime.utcnow(), self.interval, self.max_catchup)
+            logging.info(f"Fetching {start.isoformat()}Z to {end.isoformat()}Z")
+            try:
+                ok = self.job(start, end)
+            except Exception:
+                logging.error("Fetch failed: ", exc_info=True)
+                ok = False
+            if ok:
+                record_success(end)
+            else:
+                record_failure()
+
+
+def read_pid() -> Optional[int]:
+    """Return the pid of the running daemon, or None if it is not running."""
+    if not os.path.exists(DAEMON_PID_FILE):
+        return None
+    try:
+        with open(DAEMON_PID_FILE, 'r') as file:
+            pid = int(file.read().strip())
+        if pid <= 0:  # 0 or a negative pid would signal a whole process group
+            raise ValueError(f"invalid pid {pid}")
+        os.kill(pid, 0)
+    except PermissionError:  # running, as another user
+        return pid
+    except (OSError, ValueError):
+        logging.warning(f"Removing stale daemon pid file {DAEMON_PID_FILE}")
+        try:
+            os.remove(DAEMON_PID_FILE)
+        except FileNotFoundError:
+            pass
+        return None
+    return pid
+
+
+def start_daemon(script_path: str) -> int:
+    """Start `script_path --daemon` detached from the terminal and return its pid."""
+    pid = read_pid()
+    if pid is not None:
+        return pid
+    with open(DAEMON_LOG_FILE, 'a') as log_file:
+        process = subprocess.Popen([sys.executable, script_path, '--daemon'],
+                                   stdout=log_file, stderr=subprocess.STDOUT,
+                                   stdin=subprocess.DEVNULL, start_new_session=True)
+    return process.pid
+
+
+def stop_daemon() -> bool:
+    """Ask the running daemon to stop. Returns False if it was not running."""
+    pid = read_pid()
+    if pid is None:
+        return False
+    os.kill(pid, signal.SIGTERM)
+    return True
+
+
+def daemon_status() -> Dict[str, Any]:
+    """Return whether the daemon is running together with its persisted state."""
+    status = {'running': False, 'pid': None}
+    pid = read_pid()
+    if pid is not None:
+        status.update(running=True, pid=pid)
+    status.update(load_state())
+    return status
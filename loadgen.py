@@ -0,0 +1,146 @@
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_LOAD_BATCH_SIZE = 5000
+DEFAULT_LOAD_RATE = 10000  # events per second, 0 for unthrottled
+PROGRESS_INTERVAL = 10.0  # seconds between progress log lines
+PRECIPITATION_CHOICES = np.array([0, 1, 2, 5, 10, 20])
+
+
+class TokenBucket:
+    """
+    Rate controller that paces callers to `rate` tokens per second.
+
+    The bucket starts empty and up to `burst` tokens accumulate while idle. A
+    request for more tokens than are available is granted immediately and the
+    caller sleeps off the debt, so batches larger than the burst size still
+    average out to the target rate.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+
+    def acquire(self, tokens: float):
+        """Block until `tokens` may be spent. A rate of 0 never blocks."""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= tokens
+        if self.tokens < 0:
+            time.sleep(-self.tokens / self.rate)
+
+
+def draw_weather(rng: np.random.Generator, size: int) -> Dict[str, np.ndarray]:
+    """Draw a batch of weather values with the same ranges as the single-event generators."""
+    return {
+        'temperature': rng.integers(-10, 36, size),  # °C
+        'humidity': rng.integers(20, 91, size),  # %
+        'precipitation': rng.choice(PRECIPITATION_CHOICES, size),  # mm
+        'wind_speed': rng.integers(0, 101, size),  # km/h
+    }
+
+
+def timestamps(offsets: np.ndarray, unit: str, now: datetime) -> List[str]:
+    """Format `now - offsets` (whole days or minutes) as ISO 8601 strings for a whole batch."""
+    stamps = np.datetime64(now, 'us') - offsets.astype(f'timedelta64[{unit}]')
+    return np.char.add(np.datetime_as_string(stamps, unit='us'), 'Z').tolist()
+
+
+def structured_batch(rng: np.random.Generator, size: int, encounter_id: str, alias: str) -> List[bytes]:
+    """
+    Generate a batch of encoded structured events shaped like `generate_weather_event` in 01.
+    Args:
+        rng (np.random.Generator): The seeded random generator.
+        size (int): Number of events in the batch.
+        encounter_id (str): The encounter ID for the events.
+        alias (str): The alias for the events.
+    Returns:
+        List[bytes]: The JSON encoded events, ready for `LogScaleClient.send_encoded`.
+    """
+    values = draw_weather(rng, size)
+    stamps = timestamps(rng.integers(1, 7, size), 'D', datetime.now())
+    observer = (f'"observer.id":{json.dumps(encounter_id)},"observer.alias":{json.dumps(alias)}').replace('%', '%%')
+    template = (
+        '{"timestamp":"%s","attributes":{"temperature":%d,"humidity_percentage":%d,'
+        '"precipitation":"%d mm","wind_speed":%d,"message":"Weather update at timestamp %s",'
+        '"source":"/home/ec2-user/var/log/weather.log","sourcetype":"weatherdata","env":"prod",'
+        + observer + '}}'
+    )
+    rows = zip(stamps, values['temperature'].tolist(), values['humidity'].tolist(),
+               values['precipitation'].tolist(), values['wind_speed'].tolist(), stamps)
+    return [(template % row).encode('utf-8') for row in rows]
+
+
+def raw_batch(rng: np.random.Generator, size: int, encounter_id: str, alias: str) -> List[str]:
+    """
+    Generate a batch of raw log lines shaped like `generate_raw_log` in 02.
+    Args:
+        rng (np.random.Generator): The seeded random generator.
+        size (int): Number of lines in the batch.
+        encounter_id (str): The encounter ID for the lines.
+        alias (str): The alias for the lines.
+    Returns:
+        List[str]: The raw log lines.
+    """
+    values = draw_weather(rng, size)
+    stamps = timestamps(rng.integers(1, 6, size), 'm', datetime.utcnow())
+    template = (
+        "[%s] Temp: %d°C, Humidity: %d%%, Precipitation: %dmm, Wind Speed: %dkm/h, "
+        "Encounter ID: " + str(encounter_id).replace('%', '%%') + ", Alias: " + str(alias).replace('%', '%%')
+    )
+    rows = zip(stamps, values['temperature'].tolist(), values['humidity'].tolist(),
+               values['precipitation'].tolist(), values['wind_speed'].tolist())
+    return [template % row for row in rows]
+
+
+def run_load_test(make_batch: Callable[[int], List[Any]], send: Callable[[List[Any]], int],
+                  total_events: int, rate: float = DEFAULT_LOAD_RATE,
+                  batch_size: int = DEFAULT_LOAD_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Stream generated batches into an ingest sender at a controlled rate.
+    Args:
+        make_batch (Callable[[int], List[Any]]): Returns a batch of the given size.
+        send (Callable[[List[Any]], int]): Sends a batch and returns the number of events that failed.
+        total_events (int): Number of events to send in total.
+        rate (float): Target events per second, 0 for as fast as possible.
+        batch_size (int): Events generated and sent per batch.
+    Returns:
+        Dict[str, Any]: Summary of the run.
+    """
+    bucket = TokenBucket(rate, burst=max(rate, batch_size))
+    start = time.perf_counter()
+    last_progress = start
+    sent = failed = batches = 0
+    while sent < total_events:
+        size = min(batch_size, total_events - sent)
+        bucket.acquire(size)
+        failed += send(make_batch(size))
+        sent += size
+        batches += 1
+        now = time.perf_counter()
+        if now - last_progress >= PROGRESS_INTERVAL:
+            logging.info(f"Load test: {sent}/{total_events} events, {sent / (now - start):.0f} events/s")
+            last_progress = now
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "events": sent,
+        "failed_events": failed,
+        "batches": batches,
+        "elapsed_s": elapsed,
+        "events_per_s": sent / elapsed if elapsed else 0.0,
+        "target_events_per_s": rate,
+    }
+    logging.info(f"Load test sent {sent} events ({failed} failed) in {batches} batches "
+                 f"in {elapsed:.2f}s ({summary['events_per_s']:.0f} events/s, target {rate or 'unthrottled'})")
+    return summary
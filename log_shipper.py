@@ -0,0 +1,274 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from log_writer import rotated_segments
+from logscale_client import DEFAULT_RAW_BATCH_BYTES, DEFAULT_RETRY_BACKOFF, LogScaleClient
+from spool import RETRYABLE_CLIENT_ERRORS
+
+SHIPPER_STATE_FILE = os.path.join('cache', 'log_shipper.json')
+SHIPPER_REJECTED_DIR = os.path.join('cache', 'log_shipper_rejected')
+DEFAULT_POLL_SECONDS = 1.0
+MAX_RETRY_BACKOFF = 60.0  # seconds
+
+
+class ShipperStopped(Exception):
+    """Raised inside the shipper when `stop` was called, to unwind without checkpointing."""
+
+
+def segment_name(path: str) -> str:
+    """Return a rotated segment's name without its .gz suffix, as recorded in the checkpoint."""
+    return os.path.basename(path[:-3] if path.endswith('.gz') else path)
+
+
+class LogShipper:
+    """
+    Tails a log file and its rotated segments and ships new lines to the raw endpoint.
+
+    Files are read in blocks of `block_bytes` and split into lines with one
+    bytes.split per block. Each block's complete lines are sent as one
+    newline-delimited request, and the byte offset after them is checkpointed
+    only once LogScale has accepted it, so a restart resumes exactly after the
+    last acknowledged line. Only a crash between LogScale accepting a request
+    and the checkpoint being written can resend that one request.
+
+    The checkpoint records the offset in the file being read, with its inode
+    for the live file or its name for a rotated segment, and the name of the
+    newest rotated segment that was shipped completely. Rotated segments newer
+    than that are shipped oldest first, before the live file; gzipped segments
+    are read through gzip, where offsets count uncompressed bytes, so a
+    segment is resumed by name whether or not it was compressed meanwhile.
+
+    Failed requests are retried with backoff until LogScale accepts them. A
+    request LogScale rejects as invalid is written to `rejected_dir` instead,
+    and shipping carries on after it. `stop` ends the run at the next wait.
+    """
+
+    def __init__(self, client: LogScaleClient, path: str, state_file: str = SHIPPER_STATE_FILE,
+                 block_bytes: int = DEFAULT_RAW_BATCH_BYTES, poll_seconds: float = DEFAULT_POLL_SECONDS,
+                 rejected_dir: str = SHIPPER_REJECTED_DIR):
+        if client.endpoint != 'raw':
+            raise ValueError("LogShipper needs a client for the raw endpoint")
+        self.client = client
+        self.path = path
+        self.state_file = state_file
+        self.block_bytes = block_bytes
+        self.poll_seconds = poll_seconds
+        self.rejected_dir = rejected_dir
+        self.stopped = threading.Event()
+        self.state = self.load_state()
+        self.stats = {"lines": 0, "bytes": 0, "requests": 0, "segments": 0, "rejected_lines": 0}
+
+    def load_state(self) -> Dict[str, Any]:
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r') as file:
+                    return json.load(file)
+            except (OSError, json.JSONDecodeError):
+                logging.warning(f"Ignoring unreadable shipper checkpoint {self.state_file}")
+        return {'inode': None, 'segment': None, 'offset': 0, 'completed_through': None}
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        tmp_path = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(self.state, file, indent=4)
+        os.replace(tmp_path, self.state_file)
+
+    def pending_segments(self) -> List[str]:
+        """Return the rotated segments that have not been shipped completely, oldest first."""
+        completed = self.state.get('completed_through')
+        pending = {}
+        for path in rotated_segments(self.path):
+            name = segment_name(path)
+            if completed is None or name > completed:
+                # Prefer the plain file while the writer is still compressing it
+                if name not in pending or not path.endswith('.gz'):
+                    pending[name] = path
+        return [pending[name] for name in sorted(pending)]
+
+    def resume_offset(self, path: str, is_segment: bool) -> int:
+        """Return where to start reading the oldest unshipped file."""
+        inode, offset = self.state.get('inode'), self.state.get('offset', 0)
+        segment = self.state.get('segment')
+        if segment is not None:
+            # A rotated segment was being shipped; it is the oldest pending one unless it was completed
+            return offset if is_segment and segment == segment_name(path) else 0
+        if inode is None:
+            return 0
+        if not path.endswith('.gz') and os.stat(path).st_ino == inode:
+            return offset
+        # The file being read when the checkpoint was taken has since been rotated and compressed
+        if is_segment and not self.is_live_inode(inode):
+            return offset
+        return 0
+
+    def is_live_inode(self, inode: int) -> bool:
+        try:
+            return os.stat(self.path).st_ino == inode
+        except FileNotFoundError:
+            return False
+
+    def stop(self):
+        """Ask a running `run` to return; lines not yet accepted are shipped by the next run."""
+        self.stopped.set()
+
+    def wait(self, seconds: float):
+        """Sleep for `seconds`, or raise ShipperStopped as soon as `stop` is called."""
+        if self.stopped.wait(seconds):
+            raise ShipperStopped()
+
+    def run(self, follow: bool = True):
+        """Ship everything that is pending, then keep following the live file unless `follow` is False."""
+        try:
+            while not self.stopped.is_set():
+                for segment in self.pending_segments():
+                    self.ship_segment(segment)
+                if not os.path.exists(self.path):
+                    if not follow:
+                        return
+                    self.wait(self.poll_seconds)
+                    continue
+                if not self.ship_live(follow) and not follow:
+                    return
+        except ShipperStopped:
+            logging.info("Shipper stopped; the next run resumes after the last acknowledged line.")
+        finally:
+            logging.info(f"Shipped {self.stats['lines']} lines ({self.stats['bytes']} bytes) "
+                         f"in {self.stats['requests']} requests from {self.stats['segments']} rotated segments")
+
+    def ship_segment(self, path: str):
+        """Ship the rest of a rotated segment and record it as completed."""
+        try:
+            source = gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+        except FileNotFoundError:  # compressed since it was listed
+            path += '.gz'
+            source = gzip.open(path, 'rb')
+        with source:
+            offset = self.resume_offset(path, is_segment=True)
+            source.seek(offset)
+            self.ship_from(source, None, offset, final=True, segment=segment_name(path))
+        self.state = {'inode': None, 'segment': None, 'offset': 0, 'completed_through': segment_name(path)}
+        self.save_state()
+        self.stats["segments"] += 1
+        logging.info(f"Shipped rotated segment {path}")
+
+    def ship_live(self, follow: bool) -> bool:
+        """
+        Ship the live file as it grows until it is rotated away.
+        Returns:
+            bool: True if the file was rotated and its tail shipped, False if it
+            reached the end of the file without following.
+        """
+        with open(self.path, 'rb') as source:
+            if self.pending_segments():
+                return True  # rotated between listing the segments and opening the file
+            inode = os.fstat(source.fileno()).st_ino
+            offset = self.resume_offset(self.path, is_segment=False)
+            if offset > os.fstat(source.fileno()).st_size:
+                logging.warning(f"{self.path} is shorter than the checkpoint; it was truncated, reading it from the start")
+                offset = 0
+            source.seek(offset)
+            while True:
+                offset = self.ship_from(source, inode, offset, final=False)
+                if not self.is_live_inode(inode):
+                    # Rotated: ship what was written before the writer let go of it
+                    self.ship_from(source, inode, offset, final=True)
+                    pending = self.pending_segments()
+                    if pending:
+                        self.state = {'inode': None, 'segment': None, 'offset': 0,
+                                      'completed_through': segment_name(pending[0])}
+                        self.save_state()
+                        self.stats["segments"] += 1
+                    return True
+                if not follow:
+                    return False
+                self.wait(self.poll_seconds)
+
+    def ship_from(self, source, inode: Optional[int], offset: int, final: bool,
+                  segment: Optional[str] = None) -> int:
+        """
+        Ship complete lines from `source` until its current end.
+
+        `inode` identifies the live file and `segment` the name of a rotated
+        segment in the checkpoint.
+
+        A trailing line without a newline is left for the next call unless
+        `final` is set, in which case it is shipped as the last line.
+        Returns:
+            int: The offset after the last shipped line.
+        """
+        partial = b''
+        while True:
+            block = source.read(self.block_bytes)
+            if not block:
+                break
+            lines = (partial + block).split(b'\n')
+            partial = lines.pop()
+            if lines:
+                offset = self.send(lines, inode, offset + sum(len(line) + 1 for line in lines), segment)
+        if partial and final:
+            offset = self.send([partial], inode, offset + len(partial), segment)
+        elif partial:
+            source.seek(offset)
+        return offset
+
+    def send(self, lines: List[bytes], inode: Optional[int], offset: int, segment: Optional[str] = None) -> int:
+        """Send lines until LogScale accepts or rejects them, then checkpoint `offset`."""
+        body = b'\n'.join(line for line in lines if line)
+        if body:
+            backoff = DEFAULT_RETRY_BACKOFF
+            while True:
+                try:
+                    response = self.client.post(body=body)
+                except requests.RequestException as e:
+                    logging.warning(f"Sending {len(lines)} lines failed: {e}")
+                else:
+                    if response.ok:
+                        self.stats["lines"] += len(lines)
+                        self.stats["bytes"] += len(body)
+                        self.stats["requests"] += 1
+                        break
+                    if 400 <= response.status_code < 500 and response.status_code not in RETRYABLE_CLIENT_ERRORS:
+                        self.reject(body, len(lines), offset, response)
+                        break
+                    logging.warning(f"Sending {len(lines)} lines got status {response.status_code}: {response.text}")
+                logging.warning(f"Retrying {len(lines)} lines in {backoff:.1f}s")
+                self.wait(backoff)
+                backoff = min(backoff * 2, MAX_RETRY_BACKOFF)
+        self.state.update(inode=inode, segment=segment, offset=offset)
+        self.save_state()
+        return offset
+
+    def reject(self, body: bytes, line_count: int, offset: int, response: requests.Response):
+        """Set aside a request LogScale will never accept, so it does not block the lines after it."""
+        os.makedirs(self.rejected_dir, exist_ok=True)
+        path = os.path.join(self.rejected_dir, f"{time.time_ns()}-{offset}.log")
+        with open(path, 'wb') as file:
+            file.write(body + b'\n')
+        self.stats["rejected_lines"] += line_count
+        logging.error(f"LogScale rejected {line_count} lines ({response.status_code}: {response.text}); "
+                      f"kept in {path} for inspection")
+
+
+def shipper_from_config(config: Dict[str, Any], client: LogScaleClient, path: str) -> LogShipper:
+    """
+    Build a log shipper from the script configuration.
+    Args:
+        config (Dict[str, Any]): The loaded config.json contents.
+        client (LogScaleClient): A client for the raw endpoint.
+        path (str): The live log file to ship.
+    Returns:
+        LogShipper: The configured shipper.
+    """
+    return LogShipper(
+        client, path,
+        block_bytes=int(config.get('raw_batch_max_bytes', DEFAULT_RAW_BATCH_BYTES)),
+        poll_seconds=float(config.get('shipper_poll_seconds', DEFAULT_POLL_SECONDS)),
+    )
@@ -0,0 +1,165 @@
+import glob
+import gzip
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+DEFAULT_BUFFER_BYTES = 64 * 1024
+DEFAULT_FLUSH_INTERVAL = 1.0  # seconds buffered lines may wait before they reach the file
+DEFAULT_ROTATE_BYTES = 100 * 1024 * 1024  # 0 disables size-based rotation
+DEFAULT_ROTATE_SECONDS = 0  # 0 disables time-based rotation
+FSYNC_POLICIES = ['never', 'interval', 'rotate', 'always']
+ROTATED_SUFFIX_FORMAT = '%Y%m%d-%H%M%S-%f'  # fixed width, so segment names sort by rotation time
+
+
+def rotated_segments(path: str) -> List[str]:
+    """Return the rotated segments of a log file, oldest first, compressed or not."""
+    segments = [name for name in glob.glob(glob.escape(path) + '.*')
+                if not name.endswith('.tmp')]
+    return sorted(segments, key=lambda name: name[:-3] if name.endswith('.gz') else name)
+
+
+class RotatingLogWriter:
+    """
+    Append-only log writer that keeps its file open between writes.
+
+    Lines are buffered in `buffer_bytes` of memory and reach the file at least
+    every `flush_interval` seconds. `fsync` controls durability: 'never' leaves
+    it to the OS, 'interval' syncs on every periodic flush, 'rotate' syncs when a
+    segment is closed and 'always' syncs after every write. The file is rotated
+    to `<path>.<YYYYmmdd-HHMMSS-ffffff>` when it would exceed `rotate_bytes` or
+    is older than `rotate_seconds`; rotated segments are gzipped in the
+    background if `compress` is set, and only the newest `max_segments` are kept
+    (0 keeps all).
+    """
+
+    def __init__(self, path: str, buffer_bytes: int = DEFAULT_BUFFER_BYTES,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, fsync: str = 'rotate',
+                 rotate_bytes: int = DEFAULT_ROTATE_BYTES, rotate_seconds: float = DEFAULT_ROTATE_SECONDS,
+                 compress: bool = False, max_segments: int = 0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}. Valid policies are: {FSYNC_POLICIES}")
+        self.path = path
+        self.buffer_bytes = buffer_bytes
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        self.max_segments = max_segments
+        self.compressors: List[threading.Thread] = []
+        self.stats = {"lines": 0, "bytes": 0, "flushes": 0, "fsyncs": 0, "rotations": 0}
+        self._open()
+
+    def __enter__(self) -> 'RotatingLogWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open(self):
+        self.file = open(self.path, 'ab', buffering=self.buffer_bytes)
+        self.size = self.file.tell()
+        self.opened_at = time.monotonic()
+        self.last_flush = self.opened_at
+
+    def write(self, line: str):
+        """Write one newline-terminated line."""
+        self.write_many([line])
+
+    def write_many(self, lines: List[str]):
+        """Write newline-terminated lines in one buffered write, rotating first if needed."""
+        data = ''.join(lines).encode('utf-8')
+        now = time.monotonic()
+        if self.size and (
+                (self.rotate_bytes and self.size + len(data) > self.rotate_bytes)
+                or (self.rotate_seconds and now - self.opened_at >= self.rotate_seconds)):
+            self.rotate()
+        self.file.write(data)
+        self.size += len(data)
+        self.stats["lines"] += len(lines)
+        self.stats["bytes"] += len(data)
+        if self.fsync == 'always':
+            self.flush(sync=True)
+        elif now - self.last_flush >= self.flush_interval:
+            self.flush(sync=self.fsync == 'interval')
+
+    def flush(self, sync: bool = False):
+        """Push buffered lines to the file, and to disk if `sync` is set."""
+        self.file.flush()
+        self.stats["flushes"] += 1
+        if sync:
+            os.fsync(self.file.fileno())
+            self.stats["fsyncs"] += 1
+        self.last_flush = time.monotonic()
+
+    def rotate(self):
+        """Close the current segment under a timestamped name and start a new file."""
+        self.flush(sync=self.fsync != 'never')
+        self.file.close()
+        segment = f"{self.path}.{datetime.now().strftime(ROTATED_SUFFIX_FORMAT)}"
+        os.replace(self.path, segment)
+        self.stats["rotations"] += 1
+        logging.debug(f"Rotated {self.path} to {segment} ({self.size} bytes)")
+        self._open()
+        if self.compress:
+            compressor = threading.Thread(target=self._compress, args=(segment,), name='log-compress')
+            compressor.start()
+            self.compressors = [thread for thread in self.compressors if thread.is_alive()] + [compressor]
+        else:
+            self._prune()
+
+    def _compress(self, segment: str):
+        """Gzip a rotated segment next to itself, then remove the uncompressed copy."""
+        tmp_path = f"{segment}.gz.tmp"
+        try:
+            with open(segment, 'rb') as source, gzip.open(tmp_path, 'wb') as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+        except FileNotFoundError:  # pruned while waiting to be compressed
+            return
+        os.replace(tmp_path, f"{segment}.gz")
+        os.remove(segment)
+        self._prune()
+
+    def _prune(self):
+        if not self.max_segments:
+            return
+        for segment in rotated_segments(self.path)[:-self.max_segments]:
+            try:
+                os.remove(segment)
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        """Flush and close the current file and wait for pending compressions."""
+        self.flush(sync=self.fsync != 'never')
+        self.file.close()
+        for compressor in self.compressors:
+            compressor.join()
+
+
+def writer_from_config(config: Dict[str, Any], path: str, **overrides: Optional[Any]) -> RotatingLogWriter:
+    """
+    Build a log writer from the script configuration.
+    Args:
+        config (Dict[str, Any]): The loaded config.json contents.
+        path (str): The log file to write.
+        overrides: Settings that replace the configured ones when not None.
+    Returns:
+        RotatingLogWriter: The configured writer.
+    """
+    settings = {
+        'buffer_bytes': int(config.get('log_buffer_bytes', DEFAULT_BUFFER_BYTES)),
+        'flush_interval': float(config.get('log_flush_interval', DEFAULT_FLUSH_INTERVAL)),
+        'fsync': config.get('log_fsync', 'rotate'),
+        'rotate_bytes': int(config.get('log_rotate_bytes', DEFAULT_ROTATE_BYTES)),
+        'rotate_seconds': float(config.get('log_rotate_seconds', DEFAULT_ROTATE_SECONDS)),
+        'compress': bool(config.get('log_compress', False)),
+        'max_segments': int(config.get('log_max_segments', 0)),
+    }
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    return RotatingLogWriter(path, **settings)
@@ -0,0 +1,661 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from spool import (DEFAULT_REPLAY_BATCH_BYTES, DEFAULT_SPOOL_MAX_BYTES, SPOOL_DIR, Spool, SpoolReplayer,
+                   get_spool, start_replayer)
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+try:
+    import orjson
+except ImportError:  # the faster JSON encoder is optional
+    orjson = None
+
+LOGSCALE_BASE_URL = 'https://cloud.us.humio.com'
+ENDPOINT_PATHS = {
+    'structured': '/api/v1/ingest/humio-structured',
+    'raw': '/api/v1/ingest/raw',
+}
+CONTENT_TYPES = {
+    'structured': 'application/json',
+    'raw': 'text/plain',
+}
+
+DEFAULT_CONNECT_TIMEOUT = 5.0  # seconds
+DEFAULT_READ_TIMEOUT = 30.0  # seconds
+DEFAULT_POOL_SIZE = 10
+DEFAULT_BATCH_MAX_BYTES = 4 * 1024 * 1024  # uncompressed request body size
+DEFAULT_BATCH_MAX_EVENTS = 5000
+DEFAULT_UPLOAD_WORKERS = 4
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 1.0  # seconds, doubled after every retry round
+DEFAULT_RAW_BATCH_BYTES = 1024 * 1024  # uncompressed raw request body size
+DEFAULT_RAW_BATCH_LINES = 10000
+DEFAULT_RAW_LINGER_MS = 200  # longest a buffered line waits before its batch is sent
+DEFAULT_RAW_MAX_IN_FLIGHT = 4
+COMPRESSION_MODES = ['none', 'gzip', 'zstd']
+DEFAULT_COMPRESSION_LEVELS = {'gzip': 6, 'zstd': 3}
+
+DEFAULT_TAGS = {
+    "host": "weatherhost",
+    "source": "weatherdata"
+}
+
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+# 'demo' prints the explanatory walkthrough; 'production' only logs a short preview
+OUTPUT_MODES = ['demo', 'production']
+DEFAULT_PREVIEW_EVENTS = 1
+
+# One keep-alive session per endpoint URL, shared by every client in the process
+_sessions: Dict[str, requests.Session] = {}
+
+
+def encode_json(obj: Any) -> bytes:
+    """Encode an object as compact UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def structured_envelope(tags: Optional[Dict[str, str]] = None) -> Tuple[bytes, bytes]:
+    """Return the encoded prefix and suffix that wrap a batch of encoded events."""
+    prefix = b'[{"tags":' + encode_json(tags if tags is not None else DEFAULT_TAGS) + b',"events":['
+    return prefix, b']}]'
+
+
+def encode_structured(events: List[Dict[str, Any]],
+                      tags: Optional[Dict[str, str]] = None) -> Tuple[bytes, List[bytes]]:
+    """
+    Encode a humio-structured request body, encoding every event exactly once.
+    Args:
+        events (List[Dict[str, Any]]): The events to encode.
+        tags (Dict[str, str]): Tags for the event batch.
+    Returns:
+        Tuple[bytes, List[bytes]]: The request body and the encoded events it is built from.
+    """
+    encoded = [encode_json(event) for event in events]
+    prefix, suffix = structured_envelope(tags)
+    return prefix + b','.join(encoded) + suffix, encoded
+
+
+def preview_lines(encoded: List[bytes], limit: int) -> str:
+    """Render the first `limit` already encoded events or lines for display, without re-encoding."""
+    shown = b'\n'.join(encoded[:limit]).decode('utf-8', errors='replace')
+    if len(encoded) > limit:
+        shown += f"\n... ({len(encoded) - limit} more)"
+    return shown
+
+
+def get_session(url: str, pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """
+    Return the pooled session for an endpoint URL, creating it on first use.
+    Args:
+        url (str): The full ingest endpoint URL.
+        pool_size (int): Maximum number of keep-alive connections kept for the endpoint.
+    Returns:
+        requests.Session: The shared session for the endpoint.
+    """
+    session = _sessions.get(url)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _sessions[url] = session
+    return session
+
+
+def close_sessions():
+    """Close every pooled session and drop its connections."""
+    for session in _sessions.values():
+        session.close()
+    _sessions.clear()
+
+
+class LogScaleClient:
+    """
+    Ingest client for a single LogScale endpoint ('structured' or 'raw').
+
+    Requests reuse a pooled keep-alive connection to the endpoint, are bounded
+    by connect/read timeouts, and have their latency recorded in `latencies`.
+    `base_url` points the client at another LogScale host, such as the local
+    stand-in in logscale_standin.py. With a `spool`, batched uploads and
+    `post(spooled=True)` write every body to it before sending and leave the
+    bodies LogScale did not accept there for replay.
+    """
+
+    def __init__(self, api_token: str, endpoint: str = 'structured',
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 batch_max_bytes: int = DEFAULT_BATCH_MAX_BYTES,
+                 batch_max_events: int = DEFAULT_BATCH_MAX_EVENTS,
+                 upload_workers: int = DEFAULT_UPLOAD_WORKERS,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 compression: str = 'none',
+                 compression_level: Optional[int] = None,
+                 base_url: Optional[str] = None,
+                 spool: Optional[Spool] = None):
+        if endpoint not in ENDPOINT_PATHS:
+            raise ValueError(f"Unknown LogScale endpoint: {endpoint}")
+        self.api_token = api_token
+        self.endpoint = endpoint
+        self.url = (base_url or LOGSCALE_BASE_URL).rstrip('/') + ENDPOINT_PATHS[endpoint]
+        self.headers = {
+            "Authorization": f"Bearer {api_token}",
+            "Content-Type": CONTENT_TYPES[endpoint]
+        }
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = get_session(self.url, max(pool_size, upload_workers))
+        self.batch_max_bytes = batch_max_bytes
+        self.batch_max_events = batch_max_events
+        self.upload_workers = upload_workers
+        self.max_retries = max_retries
+        if compression not in COMPRESSION_MODES:
+            raise ValueError(f"Unknown compression mode: {compression}. Valid modes are: {COMPRESSION_MODES}")
+        if compression == 'zstd' and zstandard is None:
+            logging.warning("zstandard is not installed, falling back to gzip compression.")
+            compression = 'gzip'
+        self.compression = compression
+        self.compression_level = (compression_level if compression_level is not None
+                                  else DEFAULT_COMPRESSION_LEVELS.get(compression))
+        self.spool = spool
+        self.latencies: List[float] = []
+        self.compression_stats: List[Dict[str, float]] = []
+
+    def post(self, body: Any = None, json_body: Any = None, spooled: bool = False,
+             content_encoding: Optional[str] = None) -> requests.Response:
+        """
+        POST a body to the endpoint over the pooled connection.
+        Args:
+            body (Any): Raw request body (str or bytes).
+            json_body (Any): Object to be serialized as the JSON request body.
+            spooled (bool): Write the body to the spool first and keep it there unless LogScale accepts it.
+            content_encoding (str): Codec the body is already compressed with; it is sent as is
+                with a matching Content-Encoding header instead of being compressed again.
+        Returns:
+            requests.Response: The response from LogScale.
+        """
+        if json_body is not None:
+            body = encode_json(json_body)
+        elif isinstance(body, str):
+            body = body.encode('utf-8')
+        segment = self.spool.append(body) if spooled and self.spool is not None and body else None
+        try:
+            response = self._post(body, content_encoding)
+        except requests.RequestException:
+            if segment is not None:
+                self.spool.release(segment)
+                logging.warning(f"Request failed; its body is kept in {self.spool.directory} for replay")
+            raise
+        if segment is not None:
+            if response.ok:
+                self.spool.ack(segment)
+            else:
+                self.spool.release(segment)
+                logging.warning(f"Request rejected ({response.status_code}); its body is kept in {self.spool.directory} for replay")
+        return response
+
+    def _post(self, body: bytes, content_encoding: Optional[str] = None) -> requests.Response:
+        headers = self.headers
+        if content_encoding is not None:
+            headers = dict(headers, **{"Content-Encoding": content_encoding})
+        elif self.compression != 'none' and body:
+            body = self.compress(body)
+            headers = dict(headers, **{"Content-Encoding": self.compression})
+
+        start = time.perf_counter()
+        response = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+        latency = time.perf_counter() - start
+        self.latencies.append(latency)
+        logging.debug(f"POST {self.url} -> {response.status_code} in {latency * 1000:.1f} ms")
+        return response
+
+    def compress(self, body: bytes) -> bytes:
+        """
+        Compress a request body with the configured codec and record ratio and CPU time.
+        Args:
+            body (bytes): The uncompressed request body.
+        Returns:
+            bytes: The compressed request body.
+        """
+        start = time.thread_time()
+        if self.compression == 'zstd':
+            compressed = zstandard.ZstdCompressor(level=self.compression_level).compress(body)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.compression_level)
+        cpu_time = time.thread_time() - start
+        stats = {
+            "raw_bytes": len(body),
+            "compressed_bytes": len(compressed),
+            "ratio": len(body) / len(compressed),
+            "cpu_ms": cpu_time * 1000,
+        }
+        self.compression_stats.append(stats)
+        logging.info(
+            f"Compressed batch with {self.compression} level {self.compression_level}: "
+            f"{stats['raw_bytes']} -> {stats['compressed_bytes']} bytes "
+            f"(ratio {stats['ratio']:.1f}x) in {stats['cpu_ms']:.1f} ms CPU"
+        )
+        return compressed
+
+    def send_structured(self, events: List[Dict[str, Any]],
+                        tags: Optional[Dict[str, str]] = None) -> Tuple[int, str]:
+        """
+        Send structured events to the humio-structured endpoint.
+        Args:
+            events (List[Dict[str, Any]]): The events to send.
+            tags (Dict[str, str]): Tags for the event batch.
+        Returns:
+            Tuple[int, str]: The HTTP status code and response text.
+        """
+        body, _ = encode_structured(events, tags)
+        response = self.post(body=body)
+        return response.status_code, response.text
+
+    def send_batched(self, events: List[Dict[str, Any]],
+                     tags: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Send structured events as size-bounded chunks on a pool of upload workers.
+
+        Each event is encoded once; chunks are capped by `batch_max_bytes` and
+        `batch_max_events`. Chunks that fail are retried, alone, up to
+        `max_retries` times with exponential backoff.
+        Args:
+            events (List[Dict[str, Any]]): The events to send.
+            tags (Dict[str, str]): Tags for every event batch.
+        Returns:
+            Dict[str, Any]: Throughput summary for the upload.
+        """
+        return self.send_encoded([encode_json(event) for event in events], tags)
+
+    def send_encoded(self, encoded_events: List[bytes],
+                     tags: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Send already encoded structured events the same way as `send_batched`.
+        Args:
+            encoded_events (List[bytes]): The JSON encoded events to send.
+            tags (Dict[str, str]): Tags for every event batch.
+        Returns:
+            Dict[str, Any]: Throughput summary for the upload.
+        """
+        start = time.perf_counter()
+        bodies = self.structured_bodies(encoded_events, tags)
+        segments = [self.spool.append(body) for body, _ in bodies] if self.spool is not None else []
+        pending = list(range(len(bodies)))
+        backoff = DEFAULT_RETRY_BACKOFF
+        with ThreadPoolExecutor(max_workers=self.upload_workers) as executor:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    logging.warning(f"Retrying {len(pending)} failed chunk(s) in {backoff:.1f}s (attempt {attempt}/{self.max_retries})")
+                    time.sleep(backoff)
+                    backoff *= 2
+                results = list(executor.map(lambda i: self._send_chunk(bodies[i][0]), pending))
+                pending = [i for i, ok in zip(pending, results) if not ok]
+                if not pending:
+                    break
+
+        settle_segments(self.spool, segments, pending)
+        return upload_summary(bodies, pending, time.perf_counter() - start, spooled=bool(segments))
+
+    def structured_bodies(self, encoded_events: List[bytes],
+                          tags: Optional[Dict[str, str]] = None) -> List[Tuple[bytes, int]]:
+        """Wrap encoded events into request bodies within the batch limits, with their event counts."""
+        prefix, suffix = structured_envelope(tags)
+        chunks = chunk_encoded(encoded_events, self.batch_max_bytes - len(prefix) - len(suffix), self.batch_max_events)
+        return [(prefix + b','.join(chunk) + suffix, len(chunk)) for chunk in chunks]
+
+    def _send_chunk(self, body: bytes) -> bool:
+        """POST one encoded chunk and report whether LogScale accepted it."""
+        try:
+            response = self.post(body=body)
+        except requests.RequestException as e:
+            logging.warning(f"Chunk upload failed: {e}")
+            return False
+        if response.ok:
+            return True
+        logging.warning(f"Chunk upload rejected: Status Code: {response.status_code}, Response: {response.text}")
+        return False
+
+    def send_raw(self, raw_log: str) -> Tuple[int, str]:
+        """
+        Send raw log data to the raw endpoint.
+        Args:
+            raw_log (str): The raw log message(s), newline separated.
+        Returns:
+            Tuple[int, str]: The HTTP status code and response text.
+        """
+        response = self.post(body=raw_log)
+        return response.status_code, response.text
+
+    def latency_summary(self) -> Dict[str, float]:
+        """Summarize recorded request latencies in milliseconds."""
+        if not self.latencies:
+            return {"requests": 0}
+        ordered = sorted(self.latencies)
+        return {
+            "requests": len(ordered),
+            "min_ms": ordered[0] * 1000,
+            "avg_ms": sum(ordered) / len(ordered) * 1000,
+            "p95_ms": ordered[int(0.95 * (len(ordered) - 1))] * 1000,
+            "max_ms": ordered[-1] * 1000,
+        }
+
+
+class RawBatcher:
+    """
+    Collects raw log lines into newline-delimited request bodies for the raw endpoint.
+
+    A batch is flushed when it reaches `max_bytes` or `max_lines`, or when its
+    oldest line has waited `linger_ms`, whichever comes first. At most
+    `max_in_flight` requests are outstanding; `add` blocks while they are, so a
+    slow LogScale slows the producer down instead of growing the buffer. Failed
+    batches are retried like structured chunks. Use it as a context manager, or
+    call `close` to flush the remainder and wait for every request.
+    """
+
+    def __init__(self, client: LogScaleClient,
+                 max_bytes: int = DEFAULT_RAW_BATCH_BYTES,
+                 max_lines: int = DEFAULT_RAW_BATCH_LINES,
+                 linger_ms: float = DEFAULT_RAW_LINGER_MS,
+                 max_in_flight: int = DEFAULT_RAW_MAX_IN_FLIGHT):
+        if client.endpoint != 'raw':
+            raise ValueError("RawBatcher needs a client for the raw endpoint")
+        self.client = client
+        self.max_bytes = max_bytes
+        self.max_lines = max_lines
+        self.linger = linger_ms / 1000
+        self.lines: List[bytes] = []
+        self.size = 0
+        self.first_added = 0.0
+        self.lock = threading.Lock()  # guards the buffer
+        self.stats_lock = threading.Lock()  # guards flush_stats; upload workers never take `lock`
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.flush_stats = {
+            "flushes": 0,
+            "flushes_by_bytes": 0,
+            "flushes_by_lines": 0,
+            "flushes_by_linger": 0,
+            "flushes_by_close": 0,
+            "lines": 0,
+            "bytes": 0,
+            "failed_batches": 0,
+            "failed_lines": 0,
+            "spooled_lines": 0,
+            "blocked_s": 0.0,
+        }
+        self.closed = threading.Event()
+        self.linger_thread = threading.Thread(target=self._linger_loop, name='raw-linger', daemon=True)
+        self.linger_thread.start()
+
+    def __enter__(self) -> 'RawBatcher':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, line: str):
+        """Buffer one raw log line, flushing if the batch is full."""
+        self.add_many([line])
+
+    def add_many(self, lines: List[str]):
+        """Buffer raw log lines, flushing whenever the batch is full."""
+        with self.lock:
+            for line in lines:
+                encoded = line.encode('utf-8')
+                size = len(encoded) + 1  # separating newline
+                if self.lines and self.size + size > self.max_bytes:
+                    self._flush('bytes')
+                if not self.lines:
+                    self.first_added = time.monotonic()
+                self.lines.append(encoded)
+                self.size += size
+                if len(self.lines) >= self.max_lines:
+                    self._flush('lines')
+
+    def flush(self):
+        """Send whatever is buffered now."""
+        with self.lock:
+            self._flush('close')
+
+    def close(self):
+        """Flush the remaining lines and wait for every outstanding request."""
+        self.closed.set()
+        self.linger_thread.join()
+        self.flush()
+        self.executor.shutdown(wait=True)
+        stats = self.stats()
+        logging.info(
+            f"Raw batcher sent {stats['lines']} lines in {stats['flushes']} batches "
+            f"({stats['flushes_by_bytes']} by bytes, {stats['flushes_by_lines']} by lines, "
+            f"{stats['flushes_by_linger']} by linger), {stats['failed_lines']} lines failed, "
+            f"blocked on in-flight requests for {stats['blocked_s']:.2f}s"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return flush statistics, including the average batch size."""
+        with self.stats_lock:
+            stats = dict(self.flush_stats)
+        stats["avg_lines_per_flush"] = stats["lines"] / stats["flushes"] if stats["flushes"] else 0.0
+        stats["avg_bytes_per_flush"] = stats["bytes"] / stats["flushes"] if stats["flushes"] else 0.0
+        return stats
+
+    def _flush(self, reason: str):
+        """Hand the buffered batch to an upload worker. Callers hold `lock`."""
+        if not self.lines:
+            return
+        body = b'\n'.join(self.lines)
+        line_count = len(self.lines)
+        self.lines, self.size = [], 0
+
+        start = time.perf_counter()
+        self.in_flight.acquire()
+        with self.stats_lock:
+            self.flush_stats["flushes"] += 1
+            self.flush_stats[f"flushes_by_{reason}"] += 1
+            self.flush_stats["blocked_s"] += time.perf_counter() - start
+        self.executor.submit(self._send, body, line_count)
+
+    def _send(self, body: bytes, line_count: int):
+        spool = self.client.spool
+        segment = spool.append(body) if spool is not None else None
+        try:
+            backoff = DEFAULT_RETRY_BACKOFF
+            for attempt in range(self.client.max_retries + 1):
+                if attempt:
+                    logging.warning(f"Retrying raw batch of {line_count} lines in {backoff:.1f}s (attempt {attempt}/{self.client.max_retries})")
+                    time.sleep(backoff)
+                    backoff *= 2
+                if self.client._send_chunk(body):
+                    if segment is not None:
+                        spool.ack(segment)
+                    with self.stats_lock:
+                        self.flush_stats["lines"] += line_count
+                        self.flush_stats["bytes"] += len(body)
+                    return
+            logging.error(f"Raw batch of {line_count} lines could not be sent" +
+                          (f"; kept in {spool.directory} for replay." if segment is not None else "."))
+            if segment is not None:
+                spool.release(segment)
+            with self.stats_lock:
+                self.flush_stats["failed_batches"] += 1
+                self.flush_stats["failed_lines"] += line_count
+                if segment is not None:
+                    self.flush_stats["spooled_lines"] += line_count
+        finally:
+            self.in_flight.release()
+
+    def _linger_loop(self):
+        """Flush a partial batch once its oldest line has waited `linger` seconds."""
+        while not self.closed.is_set():
+            with self.lock:
+                waited = time.monotonic() - self.first_added
+                if self.lines and waited >= self.linger:
+                    self._flush('linger')
+                    timeout = self.linger
+                else:
+                    timeout = self.linger - waited if self.lines else self.linger
+            self.closed.wait(timeout)
+
+
+def chunk_events(events: List[Dict[str, Any]], max_bytes: int, max_events: int) -> List[List[bytes]]:
+    """
+    Encode events and group them into chunks bounded by byte size and event count.
+    Args:
+        events (List[Dict[str, Any]]): The events to encode.
+        max_bytes (int): Maximum encoded size of the events in one chunk.
+        max_events (int): Maximum number of events in one chunk.
+    Returns:
+        List[List[bytes]]: The encoded events, grouped per chunk.
+    """
+    return chunk_encoded([encode_json(event) for event in events], max_bytes, max_events)
+
+
+def chunk_encoded(encoded_events: List[bytes], max_bytes: int, max_events: int) -> List[List[bytes]]:
+    """
+    Group encoded events into chunks bounded by byte size and event count.
+    Args:
+        encoded_events (List[bytes]): The JSON encoded events.
+        max_bytes (int): Maximum encoded size of the events in one chunk.
+        max_events (int): Maximum number of events in one chunk.
+    Returns:
+        List[List[bytes]]: The encoded events, grouped per chunk.
+    """
+    chunks = []
+    current: List[bytes] = []
+    current_bytes = 0
+    for encoded in encoded_events:
+        size = len(encoded) + 1  # separating comma
+        if current and (current_bytes + size > max_bytes or len(current) >= max_events):
+            chunks.append(current)
+            current, current_bytes = [], 0
+        current.append(encoded)
+        current_bytes += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def settle_segments(spool: Optional[Spool], segments: List[str], pending: List[int]):
+    """Remove the spooled bodies LogScale accepted and leave the `pending` ones for replay."""
+    failed = set(pending)
+    for i, segment in enumerate(segments):
+        if i in failed:
+            spool.release(segment)
+        else:
+            spool.ack(segment)
+
+
+def upload_summary(bodies: List[Tuple[bytes, int]], pending: List[int], elapsed: float,
+                   spooled: bool = False) -> Dict[str, Any]:
+    """
+    Summarize and log a batched upload.
+    Args:
+        bodies (List[Tuple[bytes, int]]): The request bodies and their event counts.
+        pending (List[int]): Indexes of the bodies that could not be sent.
+        elapsed (float): Duration of the upload in seconds.
+        spooled (bool): Whether the bodies that could not be sent were kept in a spool.
+    Returns:
+        Dict[str, Any]: Throughput summary for the upload.
+    """
+    failed = set(pending)
+    sent = [i for i in range(len(bodies)) if i not in failed]
+    sent_events = sum(bodies[i][1] for i in sent)
+    sent_bytes = sum(len(bodies[i][0]) for i in sent)
+    summary = {
+        "events": sent_events,
+        "bytes": sent_bytes,
+        "chunks": len(bodies),
+        "failed_chunks": len(pending),
+        "failed_events": sum(bodies[i][1] for i in pending),
+        "spooled_events": sum(bodies[i][1] for i in pending) if spooled else 0,
+        "elapsed_s": elapsed,
+        "events_per_s": sent_events / elapsed if elapsed else 0.0,
+        "mb_per_s": sent_bytes / elapsed / (1024 * 1024) if elapsed else 0.0,
+    }
+    logging.info(
+        f"Uploaded {sent_events} events in {len(bodies) - len(pending)}/{len(bodies)} chunks "
+        f"in {elapsed:.2f}s ({summary['events_per_s']:.0f} events/s, {summary['mb_per_s']:.2f} MB/s)"
+    )
+    if pending and spooled:
+        logging.warning(f"{len(pending)} chunk(s) with {summary['failed_events']} events could not be sent; "
+                        f"they are kept in the spool for replay.")
+    elif pending:
+        logging.error(f"{len(pending)} chunk(s) with {summary['failed_events']} events could not be sent.")
+    return summary
+
+
+def client_from_config(config: Dict[str, Any], token_field: str, endpoint: str = 'structured',
+                       spool: bool = False, replay: Optional[str] = None) -> LogScaleClient:
+    """
+    Build a client from the script configuration.
+    Args:
+        config (Dict[str, Any]): The loaded config.json contents.
+        token_field (str): The config key holding the API token for this script.
+        endpoint (str): Either 'structured' or 'raw'.
+        spool (bool): Attach the spool for this token, unless `spool` is false in the config.
+        replay (str): With a spool, replay what earlier runs left in it: 'once' before
+            returning, or 'background' on a thread for long-running senders.
+    Returns:
+        LogScaleClient: The configured client.
+    """
+    if spool and config.get('spool', True):
+        # One spool per token, so replayed bodies go to the repository they were meant for
+        spool = get_spool(os.path.join(SPOOL_DIR, token_field),
+                          max_bytes=int(config.get('spool_max_bytes', DEFAULT_SPOOL_MAX_BYTES)),
+                          fsync=bool(config.get('spool_fsync', False)))
+    else:
+        spool = None
+    client = LogScaleClient(
+        config[token_field],
+        endpoint=endpoint,
+        connect_timeout=float(config.get('connect_timeout', DEFAULT_CONNECT_TIMEOUT)),
+        read_timeout=float(config.get('read_timeout', DEFAULT_READ_TIMEOUT)),
+        pool_size=int(config.get('pool_size', DEFAULT_POOL_SIZE)),
+        batch_max_bytes=int(config.get('batch_max_bytes', DEFAULT_BATCH_MAX_BYTES)),
+        batch_max_events=int(config.get('batch_max_events', DEFAULT_BATCH_MAX_EVENTS)),
+        upload_workers=int(config.get('upload_workers', DEFAULT_UPLOAD_WORKERS)),
+        max_retries=int(config.get('max_retries', DEFAULT_MAX_RETRIES)),
+        compression=config.get('compression', 'none'),
+        compression_level=int(config['compression_level']) if 'compression_level' in config else None,
+        base_url=config.get('logscale_url') or None,
+        spool=spool,
+    )
+    batch_bytes = int(config.get('spool_replay_batch_bytes', DEFAULT_REPLAY_BATCH_BYTES))
+    if spool is not None and replay == 'once':
+        SpoolReplayer(client, spool, batch_bytes).drain()
+    elif spool is not None and replay == 'background':
+        start_replayer(client, spool, batch_bytes)
+    return client
+
+
+def raw_batcher_from_config(config: Dict[str, Any], client: LogScaleClient) -> RawBatcher:
+    """
+    Build a raw batcher from the script configuration.
+    Args:
+        config (Dict[str, Any]): The loaded config.json contents.
+        client (LogScaleClient): A client for the raw endpoint.
+    Returns:
+        RawBatcher: The configured batcher.
+    """
+    return RawBatcher(
+        client,
+        max_bytes=int(config.get('raw_batch_max_bytes', DEFAULT_RAW_BATCH_BYTES)),
+        max_lines=int(config.get('raw_batch_max_lines', DEFAULT_RAW_BATCH_LINES)),
+        linger_ms=float(config.get('raw_linger_ms', DEFAULT_RAW_LINGER_MS)),
+        max_in_flight=int(config.get('raw_max_in_flight', DEFAULT_RAW_MAX_IN_FLIGHT)),
+    )
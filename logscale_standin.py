@@ -0,0 +1,243 @@
+import argparse
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from logscale_client import ENDPOINT_PATHS, zstandard
+
+STATS_PATH = '/_standin/stats'
+RESET_PATH = '/_standin/reset'
+ENDPOINTS_BY_PATH = {path: endpoint for endpoint, path in ENDPOINT_PATHS.items()}
+
+
+class IngestStats:
+    """Thread-safe counters of what the stand-in received and how it answered."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.requests = 0
+            self.events = 0
+            self.lines = 0
+            self.bytes = 0  # as received, possibly compressed
+            self.decoded_bytes = 0
+            self.statuses: Dict[int, int] = {}
+            self.latencies: List[float] = []
+
+    def record(self, status: int, latency: float, received: int = 0, decoded: int = 0,
+               events: int = 0, lines: int = 0):
+        with self.lock:
+            self.requests += 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.latencies.append(latency)
+            if status == 200:
+                self.events += events
+                self.lines += lines
+                self.bytes += received
+                self.decoded_bytes += decoded
+
+    def summary(self) -> Dict[str, Any]:
+        with self.lock:
+            elapsed = time.time() - self.started
+            ordered = sorted(self.latencies)
+            summary = {
+                "elapsed_s": elapsed,
+                "requests": self.requests,
+                "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+                "events": self.events,
+                "lines": self.lines,
+                "bytes": self.bytes,
+                "decoded_bytes": self.decoded_bytes,
+                "events_per_s": self.events / elapsed if elapsed else 0.0,
+                "lines_per_s": self.lines / elapsed if elapsed else 0.0,
+            }
+            if ordered:
+                summary.update(
+                    latency_avg_ms=sum(ordered) / len(ordered) * 1000,
+                    latency_p50_ms=ordered[len(ordered) // 2] * 1000,
+                    latency_p95_ms=ordered[int(0.95 * (len(ordered) - 1))] * 1000,
+                    latency_max_ms=ordered[-1] * 1000,
+                )
+            return summary
+
+
+class PayloadError(ValueError):
+    """The request body is not a valid ingest payload."""
+
+
+def decode_body(body: bytes, encoding: Optional[str]) -> bytes:
+    """Undo the request's Content-Encoding."""
+    if not encoding or encoding == 'identity':
+        return body
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise PayloadError("zstd bodies need the zstandard package")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    raise PayloadError(f"Unsupported Content-Encoding: {encoding}")
+
+
+def count_structured_events(body: bytes) -> int:
+    """Validate a humio-structured payload and return its number of events."""
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise PayloadError(f"Body is not JSON: {e}")
+    if not isinstance(payload, list):
+        raise PayloadError("Body must be a JSON array of event batches")
+    events = 0
+    for batch in payload:
+        if not isinstance(batch, dict) or not isinstance(batch.get('events'), list):
+            raise PayloadError("Every batch must be an object with an 'events' array")
+        if 'tags' in batch and not isinstance(batch['tags'], dict):
+            raise PayloadError("Batch 'tags' must be an object")
+        for event in batch['events']:
+            if not isinstance(event, dict) or 'timestamp' not in event:
+                raise PayloadError("Every event must be an object with a 'timestamp'")
+        events += len(batch['events'])
+    return events
+
+
+def count_raw_lines(body: bytes) -> int:
+    """Validate a raw payload and return its number of non-empty lines."""
+    try:
+        text = body.decode('utf-8')
+    except UnicodeDecodeError:
+        raise PayloadError("Raw body is not UTF-8")
+    return sum(1 for line in text.split('\n') if line.strip())
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real endpoints
+    server: 'StandinServer'
+
+    def do_GET(self):
+        if self.path == STATS_PATH:
+            self.respond(200, json.dumps(self.server.stats.summary(), indent=4))
+        else:
+            self.respond(404, '{"error": "not found"}')
+
+    def do_POST(self):
+        start = time.perf_counter()
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == RESET_PATH:
+            self.server.stats.reset()
+            self.respond(200, '{}')
+            return
+
+        endpoint = ENDPOINTS_BY_PATH.get(self.path)
+        if endpoint is None:
+            self.respond(404, '{"error": "unknown ingest endpoint"}')
+            return
+        status, text, events, lines, decoded = self.ingest(endpoint, body)
+        self.respond(status, text, retry_after=status == 429)
+        self.server.stats.record(status, time.perf_counter() - start, len(body), decoded, events, lines)
+
+    def ingest(self, endpoint: str, body: bytes):
+        """Return (status, response text, events, lines, decoded bytes) for one ingest request."""
+        settings = self.server
+        authorization = self.headers.get('Authorization', '')
+        token = authorization[len('Bearer '):] if authorization.startswith('Bearer ') else ''
+        if not token or (settings.tokens and token not in settings.tokens):
+            return 401, '{"error": "invalid or missing bearer token"}', 0, 0, 0
+
+        if settings.latency:
+            time.sleep(settings.latency + random.uniform(0, settings.jitter))
+        roll = random.random()
+        if roll < settings.throttle_rate:
+            return 429, '{"error": "too many requests"}', 0, 0, 0
+        if roll < settings.throttle_rate + settings.error_rate:
+            return random.choice([500, 502, 503]), '{"error": "injected failure"}', 0, 0, 0
+
+        try:
+            decoded = decode_body(body, self.headers.get('Content-Encoding'))
+            if endpoint == 'structured':
+                return 200, '{}', count_structured_events(decoded), 0, len(decoded)
+            return 200, '{}', 0, count_raw_lines(decoded), len(decoded)
+        except (PayloadError, OSError) as e:
+            return 400, json.dumps({"error": str(e)}), 0, 0, 0
+
+    def respond(self, status: int, text: str, retry_after: bool = False):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if retry_after:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} {format % args}")
+
+
+class StandinServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering like the LogScale ingest endpoints.
+
+    Requests are checked for a bearer token (any token, or one of `tokens`),
+    decompressed and validated. `latency` (+ up to `jitter`) seconds are added
+    to every ingest request, and a `throttle_rate` share is answered with 429
+    and an `error_rate` share with a 5xx, before the body is looked at.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8080, tokens: Optional[List[str]] = None,
+                 latency: float = 0.0, jitter: float = 0.0, throttle_rate: float = 0.0, error_rate: float = 0.0):
+        super().__init__((host, port), StandinHandler)
+        self.tokens = set(tokens or [])
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.stats = IngestStats()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StandinServer':
+        """Serve on a background thread, for use from benchmarks."""
+        threading.Thread(target=self.serve_forever, name='logscale-standin', daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the LogScale ingest endpoints.")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8080, help="port to listen on (default: 8080)")
+    parser.add_argument('--token', action='append', dest='tokens',
+                        help="accepted bearer token; repeat for several (default: accept any token)")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="latency added to every ingest request")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="random extra latency of up to this much")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with a 5xx")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+    server = StandinServer(args.host, args.port, args.tokens, args.latency_ms / 1000, args.jitter_ms / 1000,
+                           args.throttle_rate, args.error_rate)
+    logging.info(f"LogScale stand-in listening on {server.url} (stats at {server.url}{STATS_PATH})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats.summary(), indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
+import importlib.util
 import json
 import os
 import logging
 import subprocess
+from fetch_daemon import daemon_status, start_daemon, stop_daemon
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -89,8 +91,18 @@ def set_config_field(field):
     save_config(config)
     print(f"Configuration updated: {field} set to {config[field]}")
 
+# Load a numbered script as a module, for the checks it defines itself
+def load_script(script_name):
+    spec = importlib.util.spec_from_file_location(os.path.splitext(script_name)[0], script_name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
 # Validate configuration
 def validate_config(script_id):
+    if script_id == '05':
+        # 05 understands the locations list, so its own check is the one that counts
+        return load_script('05_log200_periodic_fetch.py').validate_config()
     config = load_config()
     missing_fields = [field for field in REQUIRED_FIELDS[script_id] if field not in config or config[field] == '' or config[field] == 'REPLACEME']
     if missing_fields:
@@ -156,6 +168,36 @@ def delete_cron_job():
     except subprocess.CalledProcessError:
         print("No crontab set for ec2-user.")
 
+# Start the periodic fetch daemon
+def start_fetch_daemon():
+    if not validate_config('05'):
+        print("\nPlease set the missing configuration fields using option 5.")
+        return
+    status = daemon_status()
+    if status['running']:
+        print(f"Fetch daemon is already running (pid {status['pid']}).")
+        return
+    pid = start_daemon(os.path.abspath('05_log200_periodic_fetch.py'))
+    print(f"Fetch daemon started (pid {pid}). Output is written to periodic_fetch.log.")
+
+# Stop the periodic fetch daemon
+def stop_fetch_daemon():
+    if stop_daemon():
+        print("Fetch daemon asked to stop. It exits after any fetch in progress completes.")
+    else:
+        print("Fetch daemon is not running.")
+
+# Show periodic fetch daemon status
+def show_fetch_daemon():
+    status = daemon_status()
+    if status['running']:
+        print(f"Fetch daemon is running (pid {status['pid']}).")
+    else:
+        print("Fetch daemon is not running.")
+    print(f"Last run: {status.get('last_run', 'never')}")
+    print(f"Last successful window end: {status.get('last_success_end', 'never')}")
+    print(f"Consecutive failures: {status.get('consecutive_failures', 0)}")
+
 # Main menu
 def main_menu():
     while True:
@@ -179,6 +221,9 @@ def main_menu():
 ║ 10. Set up cron job for 05_log200_periodic_fetch.py                        ║
 ║ 11. Show current cron job for 05_log200_periodic_fetch.py                  ║
 ║ 12. Delete cron job for 05_log200_periodic_fetch.py                        ║
+║ 13. Start fetch daemon for 05_log200_periodic_fetch.py                     ║
+║ 14. Stop fetch daemon for 05_log200_periodic_fetch.py                      ║
+║ 15. Show fetch daemon status for 05_log200_periodic_fetch.py               ║
 ║  0. Exit                                                                   ║
 ╚════════════════════════════════════════════════════════════════════════════╝
         """)
@@ -228,6 +273,12 @@ def main_menu():
             show_cron_job()
         elif choice == '12':
             delete_cron_job()
+        elif choice == '13':
+            start_fetch_daemon()
+        elif choice == '14':
+            stop_fetch_daemon()
+        elif choice == '15':
+            show_fetch_daemon()
         elif choice == '0':
             break
         else:
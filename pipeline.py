@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import reprlib
+import time
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from logscale_client import DEFAULT_RETRY_BACKOFF, LogScaleClient, settle_segments, upload_summary
+
+DEFAULT_QUEUE_SIZE = 2  # items waiting between two stages before the upstream stage blocks
+DEFAULT_SEND_CONCURRENCY = 2  # batches uploaded at the same time
+
+_END = object()  # end-of-stream marker passed down the queues
+
+# aiohttp is imported on the first upload, so a periodic run with nothing new to send never loads it
+if TYPE_CHECKING:
+    import aiohttp
+
+
+class Stage(NamedTuple):
+    """
+    One step of a pipeline.
+
+    `func` takes an item and returns the item for the next stage, or None to
+    pass nothing on. Coroutine functions are awaited on the event loop; plain
+    functions run in `executor` (a thread or process pool) or, without one,
+    inline on the loop, which only suits cheap bookkeeping. `concurrency`
+    workers take items from the stage's queue. `flush` is called once after the
+    last item and may return a final item, for stages that group items.
+    """
+    name: str
+    func: Callable[[Any], Any]
+    concurrency: int = 1
+    executor: Optional[Executor] = None
+    flush: Optional[Callable[[], Any]] = None
+
+
+async def run_pipeline(items: Iterable[Any], stages: List[Stage], queue_size: int = DEFAULT_QUEUE_SIZE,
+                       stats: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Stream items through the stages, with a bounded queue in front of every stage.
+
+    All stages run at the same time, so a stage works on item N+1 while the
+    next one still handles item N; when a stage falls behind, its full queue
+    blocks the stages before it. An item whose stage raises is logged and
+    dropped, and the rest carry on.
+    Args:
+        items (Iterable[Any]): The items for the first stage.
+        stages (List[Stage]): The stages, in order; the last one's results are discarded.
+        queue_size (int): Maximum items waiting in front of each stage.
+        stats (Dict[str, Dict[str, Any]]): Filled with the per-stage counters as
+            the pipeline runs, for callers that report progress meanwhile.
+    Returns:
+        Dict[str, Any]: Elapsed time and, per stage, the items processed and
+        failed, the time spent in `func` and the utilization of its workers.
+    """
+    loop = asyncio.get_running_loop()
+    queues: List[Optional[asyncio.Queue]] = [asyncio.Queue(queue_size) for _ in stages] + [None]
+    if stats is None:
+        stats = {}
+    stats.update({stage.name: {"items": 0, "failed": 0, "busy_s": 0.0} for stage in stages})
+
+    async def call(stage: Stage, item: Any) -> Any:
+        if asyncio.iscoroutinefunction(stage.func):
+            return await stage.func(item)
+        if stage.executor is not None:
+            return await loop.run_in_executor(stage.executor, stage.func, item)
+        return stage.func(item)
+
+    async def worker(stage: Stage, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]):
+        while True:
+            item = await inbox.get()
+            if item is _END:
+                return
+            start = time.perf_counter()
+            try:
+                result = await call(stage, item)
+            except Exception:
+                stats[stage.name]["failed"] += 1
+                logging.error(f"Pipeline stage {stage.name} failed for {reprlib.repr(item)}: ", exc_info=True)
+                continue
+            finally:
+                stats[stage.name]["busy_s"] += time.perf_counter() - start
+            stats[stage.name]["items"] += 1
+            if result is not None and outbox is not None:
+                await outbox.put(result)
+
+    async def run_stage(index: int, stage: Stage):
+        inbox, outbox = queues[index], queues[index + 1]
+        await asyncio.gather(*(worker(stage, inbox, outbox) for _ in range(stage.concurrency)))
+        if stage.flush is not None:
+            result = stage.flush()
+            if result is not None and outbox is not None:
+                await outbox.put(result)
+        if outbox is not None:
+            for _ in range(stages[index + 1].concurrency):
+                await outbox.put(_END)
+
+    async def feed():
+        for item in items:
+            await queues[0].put(item)
+        for _ in range(stages[0].concurrency):
+            await queues[0].put(_END)
+
+    start = time.perf_counter()
+    await asyncio.gather(feed(), *(run_stage(index, stage) for index, stage in enumerate(stages)))
+    elapsed = time.perf_counter() - start
+
+    for stage in stages:
+        stage_stats = stats[stage.name]
+        stage_stats["utilization"] = stage_stats["busy_s"] / (elapsed * stage.concurrency) if elapsed else 0.0
+        logging.info(f"Pipeline stage {stage.name}: {stage_stats['items']} items, {stage_stats['failed']} failed, "
+                     f"busy {stage_stats['busy_s']:.2f}s ({stage_stats['utilization']:.0%} of {stage.concurrency} workers)")
+    return {"elapsed_s": elapsed, "stages": stats}
+
+
+class AsyncSender:
+    """
+    aiohttp counterpart of `LogScaleClient.send_encoded`, for send stages.
+
+    It takes the URL, token, timeouts, batch limits, compression and retry
+    settings from `client`, writes bodies to the client's spool like it, and
+    records request latencies in the client's `latencies`. All uploads share
+    one connection pool of `connections` (by default the client's
+    `upload_workers`), which caps the requests in flight across every
+    concurrent send. Compression runs on a thread so the loop keeps serving
+    other uploads. Use it as an async context manager inside the running loop.
+    """
+
+    def __init__(self, client: LogScaleClient, connections: Optional[int] = None):
+        if client.endpoint != 'structured':
+            raise ValueError("AsyncSender needs a client for the structured endpoint")
+        self.client = client
+        self.connections = connections or client.upload_workers
+        self.session: Optional['aiohttp.ClientSession'] = None
+
+    async def __aenter__(self) -> 'AsyncSender':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def post(self, body: bytes) -> bool:
+        """POST one request body and report whether LogScale accepted it."""
+        import aiohttp
+
+        client = self.client
+        if self.session is None:
+            connect_timeout, read_timeout = client.timeout
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connections),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
+            )
+        headers = client.headers
+        if client.compression != 'none' and body:
+            body = await asyncio.to_thread(client.compress, body)
+            headers = dict(headers, **{"Content-Encoding": client.compression})
+
+        start = time.perf_counter()
+        try:
+            async with self.session.post(client.url, data=body, headers=headers) as response:
+                text = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.warning(f"Chunk upload failed: {e!r}")
+            return False
+        latency = time.perf_counter() - start
+        client.latencies.append(latency)
+        logging.debug(f"POST {client.url} -> {response.status} in {latency * 1000:.1f} ms")
+        if response.ok:
+            return True
+        logging.warning(f"Chunk upload rejected: Status Code: {response.status}, Response: {text}")
+        return False
+
+    async def send_encoded(self, encoded_events: List[bytes],
+                           tags: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Send encoded structured events as size-bounded chunks, retrying failed chunks with backoff.
+        Args:
+            encoded_events (List[bytes]): The JSON encoded events to send.
+            tags (Dict[str, str]): Tags for every event batch.
+        Returns:
+            Dict[str, Any]: Throughput summary for the upload, as from `LogScaleClient.send_encoded`.
+        """
+        client = self.client
+        start = time.perf_counter()
+        bodies = client.structured_bodies(encoded_events, tags)
+        segments = []
+        if client.spool is not None:
+            segments = await asyncio.to_thread(lambda: [client.spool.append(body) for body, _ in bodies])
+        pending = list(range(len(bodies)))
+        backoff = DEFAULT_RETRY_BACKOFF
+        for attempt in range(client.max_retries + 1):
+            if attempt:
+                logging.warning(f"Retrying {len(pending)} failed chunk(s) in {backoff:.1f}s (attempt {attempt}/{client.max_retries})")
+                await asyncio.sleep(backoff)
+                backoff *= 2
+            results = await asyncio.gather(*(self.post(bodies[i][0]) for i in pending))
+            pending = [i for i, ok in zip(pending, results) if not ok]
+            if not pending:
+                break
+        settle_segments(client.spool, segments, pending)
+        return upload_summary(bodies, pending, time.perf_counter() - start, spooled=bool(segments))
@@ -0,0 +1,333 @@
+import fcntl
+import gzip
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from logscale_client import LogScaleClient
+
+SPOOL_DIR = os.path.join('cache', 'spool')
+SEGMENT_SUFFIX = '.seg'
+REJECTED_SUFFIX = '.rejected'
+DEFAULT_SPOOL_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_REPLAY_BATCH_BYTES = 16 * 1024 * 1024  # uncompressed replay request body size
+DEFAULT_REPLAY_POLL_SECONDS = 5.0
+DEFAULT_REPLAY_GZIP_LEVEL = 6  # used when the client itself does not compress
+MAX_REPLAY_BACKOFF = 300.0  # seconds
+RETRYABLE_CLIENT_ERRORS = {401, 403, 408, 429}  # fixed by waiting or by a new token, not by changing the body
+
+# One spool per directory, shared by every client in the process, so in-flight segments are known to all
+_spools: Dict[str, 'Spool'] = {}
+_replayers: Dict[str, 'SpoolReplayer'] = {}
+_spools_lock = threading.Lock()
+
+
+def segment_owner(path: str) -> int:
+    """Return the process ID recorded in a segment's name."""
+    return int(os.path.basename(path).split('-')[1])
+
+
+def file_size(path: str) -> int:
+    """Return a file's size, or 0 if another process removed it meanwhile."""
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Spool:
+    """
+    Write-ahead spool of request bodies for one ingest endpoint.
+
+    Every request body is written to its own segment file before it is sent,
+    as `<time_ns>-<pid>-<seq>.seg`, and the segment is removed once LogScale
+    accepted it. A body that could not be sent is released and stays on disk
+    for a `SpoolReplayer`, in this process or the next one that runs. Segments
+    are written to a temporary name and renamed, so a reader never sees a
+    partial one; with `fsync` they also survive a power loss.
+
+    The spool holds at most `max_bytes`. When a new segment would exceed it,
+    the oldest segments are evicted first, except those still being sent by
+    this process.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_SPOOL_MAX_BYTES, fsync: bool = False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.in_flight: Set[str] = set()
+        self.sequence = itertools.count()
+        self.stats = {"appended": 0, "acked": 0, "released": 0, "evicted": 0, "evicted_bytes": 0}
+        os.makedirs(directory, exist_ok=True)
+        self.size = self.disk_usage()
+
+    def disk_usage(self) -> int:
+        return sum(file_size(path) for path in self.segments(include_in_flight=True))
+
+    def segments(self, include_in_flight: bool = False) -> List[str]:
+        """Return the spooled segments, oldest first, without those this process is still sending."""
+        try:
+            with os.scandir(self.directory) as entries:
+                names = sorted(entry.name for entry in entries if entry.name.endswith(SEGMENT_SUFFIX))
+        except FileNotFoundError:
+            return []
+        paths = [os.path.join(self.directory, name) for name in names]
+        if include_in_flight:
+            return paths
+        in_flight = set(self.in_flight)
+        return [path for path in paths if path not in in_flight]
+
+    def pending(self) -> List[str]:
+        """Return the segments that are waiting for replay: released here, or left by a process that has exited."""
+        pid = os.getpid()
+        owners_alive: Dict[int, bool] = {}
+        pending = []
+        for path in self.segments():
+            owner = segment_owner(path)
+            if owner != pid and owners_alive.setdefault(owner, process_alive(owner)):
+                continue  # that process is still running and replays its own segments
+            pending.append(path)
+        return pending
+
+    def append(self, body: bytes) -> str:
+        """Write a request body to a new segment before it is sent, and mark it in flight."""
+        name = f"{time.time_ns():020d}-{os.getpid()}-{next(self.sequence):06d}{SEGMENT_SUFFIX}"
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(body)
+            if self.fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        with self.lock:
+            if self.size + len(body) > self.max_bytes:
+                self._evict(len(body))
+            os.replace(tmp_path, path)
+            self.in_flight.add(path)
+            self.size += len(body)
+            self.stats["appended"] += 1
+        return path
+
+    def ack(self, path: str):
+        """Remove a segment that LogScale accepted."""
+        with self.lock:
+            self.in_flight.discard(path)
+            self._remove(path)
+            self.stats["acked"] += 1
+
+    def release(self, path: str):
+        """Leave a segment that could not be sent to the replayer."""
+        with self.lock:
+            self.in_flight.discard(path)
+            self.stats["released"] += 1
+
+    def reject(self, path: str):
+        """Set aside a segment that LogScale will never accept, so replay does not retry it forever."""
+        with self.lock:
+            self.in_flight.discard(path)
+            try:
+                size = os.path.getsize(path)
+                os.replace(path, path[:-len(SEGMENT_SUFFIX)] + REJECTED_SUFFIX)
+            except FileNotFoundError:
+                return
+            self.size -= size
+        logging.error(f"LogScale rejected spooled segment {path}; kept as {REJECTED_SUFFIX} for inspection")
+
+    def _remove(self, path: str):
+        """Delete a segment and account for its size. Callers hold `lock`."""
+        size = file_size(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:  # evicted, or replayed by another process
+            return
+        self.size -= size
+
+    def _evict(self, needed: int):
+        """Drop the oldest segments until `needed` more bytes fit. Callers hold `lock`."""
+        # Other processes append and replay too, so count again before dropping anything
+        segments = self.segments(include_in_flight=True)
+        self.size = sum(file_size(path) for path in segments)
+        for path in segments:
+            if self.size + needed <= self.max_bytes:
+                return
+            if path in self.in_flight:
+                continue
+            size = file_size(path)
+            self._remove(path)
+            self.stats["evicted"] += 1
+            self.stats["evicted_bytes"] += size
+            logging.warning(f"Spool {self.directory} is over {self.max_bytes} bytes; evicted {path} ({size} bytes)")
+
+
+def get_spool(directory: str, max_bytes: int = DEFAULT_SPOOL_MAX_BYTES, fsync: bool = False) -> Spool:
+    """Return the process-wide spool for a directory, creating it on first use."""
+    with _spools_lock:
+        if directory not in _spools:
+            _spools[directory] = Spool(directory, max_bytes, fsync)
+        return _spools[directory]
+
+
+def join_bodies(endpoint: str, bodies: List[bytes]) -> bytes:
+    """
+    Merge spooled request bodies into one request body.
+
+    Structured bodies are JSON arrays of event batches, so their batches are
+    concatenated into one array; raw bodies are joined with newlines.
+    """
+    if endpoint == 'raw':
+        return b'\n'.join(bodies)
+    return b'[' + b','.join(body.strip()[1:-1] for body in bodies) + b']'
+
+
+class SpoolReplayer:
+    """
+    Background thread that drains a spool into LogScale.
+
+    Pending segments are merged, oldest first, into requests of up to
+    `batch_bytes` and sent compressed: with the client's codec, or gzip if the
+    client does not compress. Accepted segments are removed. While LogScale is
+    unreachable or throttling, the replayer backs off exponentially up to
+    MAX_REPLAY_BACKOFF seconds. A request rejected as malformed is split into
+    single segments, and a single rejected segment is set aside as
+    `.rejected`. Only one process replays a spool at a time.
+
+    Long-running senders `start()` it as a thread; short-lived scripts call
+    `drain()` once instead.
+    """
+
+    def __init__(self, client: 'LogScaleClient', spool: Spool, batch_bytes: int = DEFAULT_REPLAY_BATCH_BYTES,
+                 poll_seconds: float = DEFAULT_REPLAY_POLL_SECONDS):
+        self.client = client
+        self.spool = spool
+        self.batch_bytes = batch_bytes
+        self.poll_seconds = poll_seconds
+        self.backoff = poll_seconds
+        self.isolate = 0  # segments still to be sent one by one after a rejected batch
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='spool-replay', daemon=True)
+        self.stats = {"requests": 0, "segments": 0, "bytes": 0, "failures": 0}
+
+    def start(self) -> 'SpoolReplayer':
+        self.thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self.stopped.set()
+        self.thread.join(timeout)
+
+    def _run(self):
+        while not self.stopped.is_set():
+            self.drain()
+            self.stopped.wait(self.backoff)
+
+    def drain(self) -> bool:
+        """
+        Replay pending segments until the spool is empty or a batch has to wait for a backoff.
+        Returns:
+            bool: False if another process holds the spool's replay lock, True otherwise.
+        """
+        lock_path = os.path.join(self.spool.directory, '.replay.lock')
+        with open(lock_path, 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:  # another process is replaying this spool
+                self.backoff = self.poll_seconds
+                return False
+            try:
+                while not self.stopped.is_set() and self.replay_once():
+                    pass
+            except Exception:
+                logging.error(f"Replay of {self.spool.directory} failed: ", exc_info=True)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return True
+
+    def next_batch(self) -> Tuple[List[str], List[bytes]]:
+        """Read the oldest pending segments, up to `batch_bytes` in total."""
+        paths, bodies, size = [], [], 0
+        for path in self.spool.pending():
+            try:
+                with open(path, 'rb') as file:
+                    body = file.read()
+            except FileNotFoundError:  # acked or evicted meanwhile
+                continue
+            if bodies and (size + len(body) > self.batch_bytes or self.isolate):
+                break
+            paths.append(path)
+            bodies.append(body)
+            size += len(body)
+        return paths, bodies
+
+    def replay_once(self) -> bool:
+        """
+        Send one batch of pending segments.
+        Returns:
+            bool: True if a batch was accepted and more may be pending, False
+            if the spool is empty or the batch has to wait for a backoff.
+        """
+        paths, bodies = self.next_batch()
+        if not paths:
+            self.backoff = self.poll_seconds
+            return False
+
+        client = self.client
+        body = join_bodies(client.endpoint, bodies)
+        codec = client.compression if client.compression != 'none' else 'gzip'
+        compressed = client.compress(body) if codec == client.compression else gzip.compress(body, DEFAULT_REPLAY_GZIP_LEVEL)
+        try:
+            response = client.post(body=compressed, content_encoding=codec)
+            status = response.status_code
+        except Exception as e:  # requests.RequestException, kept generic so this module does not import requests
+            logging.warning(f"Spool replay of {len(paths)} segments failed: {e}")
+            status = None
+
+        if status is not None and status < 300:
+            for path in paths:
+                self.spool.ack(path)
+            self.isolate = max(self.isolate - len(paths), 0)
+            self.backoff = self.poll_seconds
+            self.stats["requests"] += 1
+            self.stats["segments"] += len(paths)
+            self.stats["bytes"] += len(body)
+            logging.info(f"Replayed {len(paths)} spooled segments ({len(body)} -> {len(compressed)} bytes) from {self.spool.directory}")
+            return True
+
+        self.stats["failures"] += 1
+        if status is not None and 400 <= status < 500 and status not in RETRYABLE_CLIENT_ERRORS:
+            if len(paths) == 1:
+                self.spool.reject(paths[0])
+                self.isolate = max(self.isolate - 1, 0)
+                return True
+            logging.warning(f"LogScale rejected a replay batch of {len(paths)} segments ({status}); retrying them one by one")
+            self.isolate = len(paths)
+            return True
+
+        if status is not None:
+            logging.warning(f"Spool replay of {len(paths)} segments got status {status}")
+        self.backoff = min(self.backoff * 2, MAX_REPLAY_BACKOFF)
+        logging.warning(f"Retrying spool replay in {self.backoff:.0f}s")
+        return False
+
+
+def start_replayer(client: 'LogScaleClient', spool: Spool,
+                   batch_bytes: int = DEFAULT_REPLAY_BATCH_BYTES) -> SpoolReplayer:
+    """Start the process-wide replayer for a spool, unless it is already running."""
+    with _spools_lock:
+        if spool.directory not in _replayers:
+            _replayers[spool.directory] = SpoolReplayer(client, spool, batch_bytes).start()
+        return _replayers[spool.directory]
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+STATION_INDEX_FILE = os.path.join('cache', 'station_index.pkl')
+STATION_INDEX_MAX_AGE = 7 * 24 * 3600  # seconds before the catalogue is checked for changes
+EARTH_RADIUS_KM = 6371.0088
+
+_index_lock = threading.Lock()
+_index: Optional['StationIndex'] = None  # the process-wide index, checked for age on every call
+
+
+def to_unit_vectors(latitudes, longitudes) -> np.ndarray:
+    """Convert degrees to 3D points on the unit sphere, where chord order equals great-circle order."""
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lon = np.radians(np.asarray(longitudes, dtype=float))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_km(chord):
+    """Convert a chord length on the unit sphere to a haversine distance in km."""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+class StationIndex:
+    """
+    KD-tree over the Meteostat station catalogue for O(log n) nearest-station lookups.
+
+    Stations are indexed as points on the unit sphere, so the nearest point by
+    chord length is the nearest station by haversine distance. The index is
+    pickled to STATION_INDEX_FILE together with a fingerprint of the catalogue
+    and is only rebuilt when the catalogue changes.
+    """
+
+    def __init__(self, ids, names, latitudes, longitudes, fingerprint: str):
+        self.ids = np.asarray(ids, dtype=object)
+        self.names = np.asarray(names, dtype=object)
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.fingerprint = fingerprint
+        self.checked_at = time.time()
+        self.tree = cKDTree(to_unit_vectors(self.latitudes, self.longitudes))
+
+    @classmethod
+    def from_catalogue(cls, catalogue) -> 'StationIndex':
+        """Build the index from a Meteostat `Stations().fetch()` frame."""
+        catalogue = catalogue.dropna(subset=['latitude', 'longitude'])
+        return cls(catalogue.index, catalogue['name'], catalogue['latitude'],
+                   catalogue['longitude'], catalogue_fingerprint(catalogue))
+
+    def nearest(self, latitude: float, longitude: float) -> Tuple[str, str, float]:
+        """
+        Return the nearest station to a point.
+        Returns:
+            Tuple[str, str, float]: Station ID, station name and distance in km.
+        """
+        chord, position = self.tree.query(to_unit_vectors([latitude], [longitude])[0])
+        return self.ids[position], self.names[position], float(chord_to_km(chord))
+
+    def nearest_many(self, latitudes, longitudes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the nearest station to each of many points in one batched query.
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Station IDs, names and distances in km.
+        """
+        chords, positions = self.tree.query(to_unit_vectors(latitudes, longitudes))
+        return self.ids[positions], self.names[positions], chord_to_km(chords)
+
+    def save(self, path: str = STATION_INDEX_FILE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+
+def catalogue_fingerprint(catalogue) -> str:
+    digest = hashlib.sha1()
+    digest.update(np.asarray(catalogue.index, dtype=str).astype('U').tobytes())
+    digest.update(np.ascontiguousarray(catalogue[['latitude', 'longitude']].to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+
+def load_index(path: str = STATION_INDEX_FILE) -> Optional[StationIndex]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+    except Exception:
+        logging.warning(f"Ignoring unreadable station index {path}")
+        return None
+
+
+def fetch_catalogue():
+    from meteostat import Stations
+    return Stations().fetch()
+
+
+def get_station_index() -> StationIndex:
+    """
+    Return the process-wide station index.
+
+    The index in memory, or else the pickled one, is used as long as it is
+    younger than STATION_INDEX_MAX_AGE, so a resident daemon also picks up
+    catalogue changes. After that the catalogue is fetched again; the tree is
+    only rebuilt if the catalogue's fingerprint changed.
+    """
+    global _index
+    with _index_lock:
+        index = _index
+        if index is None or time.time() - index.checked_at >= STATION_INDEX_MAX_AGE:
+            index = load_index() or index  # another process may have refreshed it meanwhile
+        if index is not None and time.time() - index.checked_at < STATION_INDEX_MAX_AGE:
+            _index = index
+            return index
+
+        catalogue = fetch_catalogue()
+        if index is not None and index.fingerprint == catalogue_fingerprint(catalogue.dropna(subset=['latitude', 'longitude'])):
+            logging.debug("Station catalogue unchanged; keeping the station index")
+            index.checked_at = time.time()
+        else:
+            logging.info(f"Building station index over {len(catalogue)} stations")
+            index = StationIndex.from_catalogue(catalogue)
+        index.save()
+        _index = index
+        return index
+
+
+def nearest_station(latitude: float, longitude: float) -> Tuple[str, str, float]:
+    """Return (station ID, station name, distance in km) of the station nearest to a point."""
+    return get_station_index().nearest(float(latitude), float(longitude))
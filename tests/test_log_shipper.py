@@ -0,0 +1,73 @@
+import gzip
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from log_shipper import LogShipper  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.text = ''
+
+
+class FakeRawClient:
+    """Accepts requests until `fail_after` of them went through, then answers 503."""
+    endpoint = 'raw'
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.accepted = []
+        self.on_failure = None
+
+    def post(self, body=None):
+        if self.fail_after is not None and len(self.accepted) >= self.fail_after:
+            if self.on_failure is not None:
+                self.on_failure()
+            return FakeResponse(503)
+        self.accepted.extend(body.split(b'\n'))
+        return FakeResponse(200)
+
+
+def write_segments(tmp_path):
+    log_path = str(tmp_path / 'atmospheric_data.log')
+    lines = [f'line {number:04d}'.encode() for number in range(200)]
+    with gzip.open(log_path + '.20240601-000000-000000.gz', 'wb') as file:
+        file.write(b'\n'.join(lines[:120]) + b'\n')
+    with open(log_path, 'wb') as file:
+        file.write(b'\n'.join(lines[120:]) + b'\n')
+    return log_path, lines
+
+
+def test_stopping_inside_a_gzipped_segment_resumes_without_resending(tmp_path):
+    log_path, lines = write_segments(tmp_path)
+    state_file = str(tmp_path / 'cache' / 'log_shipper.json')
+
+    client = FakeRawClient(fail_after=3)
+    shipper = LogShipper(client, log_path, state_file=state_file, block_bytes=100, poll_seconds=0)
+    client.on_failure = shipper.stop
+    shipper.run(follow=False)
+    assert 0 < len(client.accepted) < 120
+    assert shipper.state['segment'] == 'atmospheric_data.log.20240601-000000-000000'
+
+    resumed = FakeRawClient()
+    LogShipper(resumed, log_path, state_file=state_file, block_bytes=100, poll_seconds=0).run(follow=False)
+
+    assert client.accepted + resumed.accepted == lines
+
+
+def test_restart_after_a_completed_run_sends_nothing(tmp_path):
+    log_path, lines = write_segments(tmp_path)
+    state_file = str(tmp_path / 'cache' / 'log_shipper.json')
+
+    client = FakeRawClient()
+    LogShipper(client, log_path, state_file=state_file, block_bytes=100, poll_seconds=0).run(follow=False)
+    assert client.accepted == lines
+
+    again = FakeRawClient()
+    LogShipper(again, log_path, state_file=state_file, block_bytes=100, poll_seconds=0).run(follow=False)
+    assert again.accepted == []
@@ -0,0 +1,61 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(REPO_DIR, '05_log200_periodic_fetch.py')
+
+# Runs the script with every outgoing connection refused, so a network call
+# made before the startup checkpoint fails the run instead of being timed
+PROBE = """
+import runpy
+import socket
+import sys
+
+def refuse(*args, **kwargs):
+    raise OSError("network access before the startup checkpoint")
+
+socket.socket.connect = refuse
+socket.create_connection = refuse
+sys.argv = [sys.argv[1]]
+runpy.run_path(sys.argv[0], run_name='__main__')
+"""
+
+CONFIG = {
+    'logscale_api_token_case_study': 'test-token',
+    'encounter_id': 'test',
+    'alias': 'test',
+    'city_name': 'Ann Arbor',
+    'country_name': 'US',
+    'latitude': '42.2808',
+    'longitude': '-83.7430',
+    'units': 'metric',
+    'extreme_field': 'none',
+    'extreme_level': 'none',
+    'logscale_url': 'http://127.0.0.1:9',
+}
+
+
+def load_periodic_fetch():
+    spec = importlib.util.spec_from_file_location('periodic_fetch', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_time_to_first_network_call_is_within_budget(tmp_path):
+    periodic_fetch = load_periodic_fetch()
+    (tmp_path / 'config.json').write_text(json.dumps(CONFIG))
+    env = dict(os.environ, **{periodic_fetch.STARTUP_PROBE_ENV: '1'})
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [REPO_DIR, env.get('PYTHONPATH')]))
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', PROBE, SCRIPT], cwd=tmp_path, env=env,
+                            capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+
+    assert result.returncode == periodic_fetch.STARTUP_PROBE_EXIT_CODE, result.stderr
+    assert elapsed <= periodic_fetch.STARTUP_BUDGET_SECONDS, f"startup took {elapsed:.3f}s"
@@ -0,0 +1,101 @@
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from logscale_client import LogScaleClient, RawBatcher  # noqa: E402
+from logscale_standin import StandinServer  # noqa: E402
+from spool import REJECTED_SUFFIX, SEGMENT_SUFFIX, Spool, SpoolReplayer  # noqa: E402
+
+
+@pytest.fixture
+def standin():
+    server = StandinServer(port=0).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def files(directory, suffix):
+    return sorted(name for name in os.listdir(directory) if name.endswith(suffix))
+
+
+def test_replayed_segments_are_deleted_once_accepted(tmp_path, standin):
+    spool = Spool(str(tmp_path / 'spool'))
+    client = LogScaleClient('test-token', endpoint='raw', base_url=standin.url, spool=spool)
+    for body in (b'first line', b'second line\nthird line'):
+        spool.release(spool.append(body))
+    assert len(files(spool.directory, SEGMENT_SUFFIX)) == 2
+
+    assert SpoolReplayer(client, spool).drain()
+
+    assert files(spool.directory, SEGMENT_SUFFIX) == []
+    assert standin.stats.summary()["lines"] == 3
+    # Replay goes through the client, so its request is recorded like any other
+    assert len(client.latencies) == 1
+
+
+def test_segment_rejected_on_its_own_is_set_aside(tmp_path, standin):
+    spool = Spool(str(tmp_path / 'spool'))
+    client = LogScaleClient('test-token', endpoint='structured', base_url=standin.url, spool=spool)
+    spool.release(spool.append(b'[{"events": [{"timestamp": "2024-06-01T00:00:00Z", "rawstring": "kept"}]}]'))
+    spool.release(spool.append(b'[{"events": [not json'))
+
+    replayer = SpoolReplayer(client, spool)
+    assert replayer.drain()
+
+    assert files(spool.directory, SEGMENT_SUFFIX) == []
+    assert len(files(spool.directory, REJECTED_SUFFIX)) == 1
+    assert standin.stats.summary()["events"] == 1
+    assert replayer.stats["segments"] == 1
+
+
+def test_segments_of_a_running_process_are_left_to_it(tmp_path):
+    spool = Spool(str(tmp_path / 'spool'))
+    own = spool.append(b'own line')
+    spool.release(own)
+    running = os.path.join(spool.directory, f"{0:020d}-{os.getppid()}-000000{SEGMENT_SUFFIX}")
+    with open(running, 'wb') as file:
+        file.write(b'line of a running process')
+    exited = os.path.join(spool.directory, f"{1:020d}-999999999-000000{SEGMENT_SUFFIX}")
+    with open(exited, 'wb') as file:
+        file.write(b'line of an exited process')
+
+    assert spool.pending() == [exited, own]
+
+
+def test_failed_replay_keeps_segments(tmp_path):
+    spool = Spool(str(tmp_path / 'spool'))
+    client = LogScaleClient('test-token', endpoint='raw', base_url='http://127.0.0.1:9', spool=spool)
+    segment = spool.append(b'line')
+    spool.release(segment)
+
+    replayer = SpoolReplayer(client, spool)
+    assert not replayer.replay_once()
+
+    assert spool.pending() == [segment]
+    assert replayer.stats["failures"] == 1
+
+
+def test_raw_batcher_flushes_by_lines_and_on_close(standin):
+    client = LogScaleClient('test-token', endpoint='raw', base_url=standin.url)
+    with RawBatcher(client, max_lines=4, linger_ms=60000) as batcher:
+        batcher.add_many([f'line {number}' for number in range(10)])
+
+    stats = batcher.stats()
+    assert (stats["flushes_by_lines"], stats["flushes_by_close"]) == (2, 1)
+    assert stats["lines"] == 10
+    assert standin.stats.summary()["lines"] == 10
+
+
+def test_raw_batcher_flushes_by_bytes(standin):
+    client = LogScaleClient('test-token', endpoint='raw', base_url=standin.url)
+    with RawBatcher(client, max_bytes=32, linger_ms=60000) as batcher:
+        batcher.add_many(['x' * 10] * 6)
+
+    stats = batcher.stats()
+    assert stats["flushes_by_bytes"] == 2
+    assert stats["lines"] == 6
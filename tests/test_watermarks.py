@@ -0,0 +1,58 @@
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from watermarks import HOUR, WatermarkStore, merge_ranges  # noqa: E402
+
+
+def test_overlapping_and_touching_ranges_merge():
+    ranges = [(date(2024, 1, 10), date(2024, 1, 20)), (date(2024, 1, 1), date(2024, 1, 5)),
+              (date(2024, 1, 15), date(2024, 1, 25)), (date(2024, 1, 6), date(2024, 1, 8)),
+              (date(2024, 2, 1), date(2024, 2, 2))]
+
+    assert merge_ranges(ranges) == [(date(2024, 1, 1), date(2024, 1, 8)),
+                                    (date(2024, 1, 10), date(2024, 1, 25)),
+                                    (date(2024, 2, 1), date(2024, 2, 2))]
+
+
+def test_marked_ranges_merge_and_leave_gaps_missing(tmp_path):
+    store = WatermarkStore(str(tmp_path / 'cache' / 'watermarks.json'))
+    store.mark('key', date(2024, 1, 1), date(2024, 1, 10))
+    store.mark('key', date(2024, 1, 5), date(2024, 1, 15))
+    store.mark('key', date(2024, 1, 20), date(2024, 1, 31))
+
+    assert store.covered('key') == [(date(2024, 1, 1), date(2024, 1, 15)), (date(2024, 1, 20), date(2024, 1, 31))]
+    assert store.missing('key', date(2023, 12, 30), date(2024, 2, 2)) == [
+        (date(2023, 12, 30), date(2023, 12, 31)), (date(2024, 1, 16), date(2024, 1, 19)),
+        (date(2024, 2, 1), date(2024, 2, 2))]
+
+
+def test_save_merges_ranges_saved_by_another_process(tmp_path):
+    path = str(tmp_path / 'cache' / 'watermarks.json')
+    first, second = WatermarkStore(path), WatermarkStore(path)
+    first.mark('key', date(2024, 1, 1), date(2024, 1, 10))
+    second.mark('key', date(2024, 1, 8), date(2024, 1, 20))
+    second.mark('other', date(2024, 3, 1), date(2024, 3, 1))
+
+    reloaded = WatermarkStore(path)
+    assert reloaded.covered('key') == [(date(2024, 1, 1), date(2024, 1, 20))]
+    assert reloaded.covered('other') == [(date(2024, 3, 1), date(2024, 3, 1))]
+
+
+def test_only_acknowledged_hours_up_to_the_watermark_count_as_sent(tmp_path):
+    store = WatermarkStore(str(tmp_path / 'cache' / 'watermarks.json'))
+    start = datetime(2024, 6, 1)
+    hours = [start + i * HOUR for i in range(6)]
+    store.mark_hours('key', hours[:2] + hours[3:5], save=False)
+    store.advance('key', hours[3])
+
+    assert store.covered_hours('key') == [(hours[0], hours[1]), (hours[3], hours[4])]
+    assert store.acknowledged('key', [start - HOUR] + hours) == [hours[0], hours[1], hours[3]]
+    assert WatermarkStore(store.path).acknowledged('key', hours) == [hours[0], hours[1], hours[3]]
+    assert store.acknowledged('unknown', hours) == []
+    assert merge_ranges([(hours[0], hours[0]), (hours[1], hours[2])], HOUR) == [(hours[0], hours[2])]
+    assert merge_ranges([(hours[0], hours[0]), (hours[2], hours[2])], timedelta(hours=1)) == [
+        (hours[0], hours[0]), (hours[2], hours[2])]
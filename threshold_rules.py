@@ -0,0 +1,110 @@
+import csv
+import logging
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+
+THRESHOLDS_FILE = 'atmospheric_thresholds.csv'
+MONITORING_FILE = 'atmospheric_monitoring.csv'
+OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+}
+
+
+class Rule(NamedTuple):
+    data_point: str
+    operator: str
+    threshold: float
+    site: str  # empty for every site
+    message: str  # formatted with {value} and {units}
+
+
+class RuleSet:
+    """
+    Threshold rules compiled once and evaluated over whole batches of readings.
+
+    Rules come from THRESHOLDS_FILE (data_point, operator, threshold, site,
+    message); units come from MONITORING_FILE. A rule with a site applies to
+    that site only and replaces the rules without a site for the same data
+    point and operator there. Evaluation is one NumPy comparison per rule over
+    the batch; only readings that break a rule have a message formatted, in
+    the order the rules are listed.
+    """
+
+    def __init__(self, rules: List[Rule], units: Dict[str, str]):
+        for rule in rules:
+            if rule.operator not in OPERATORS:
+                raise ValueError(f"Unknown operator {rule.operator!r} for {rule.data_point}. Valid operators are: {list(OPERATORS)}")
+        self.rules = rules
+        self.units = units
+        # Split each message around {value} once, with the units already filled in
+        self.templates = []
+        for rule in rules:
+            before, _, after = rule.message.partition('{value}')
+            units_text = units.get(rule.data_point, '')
+            self.templates.append((before.format(units=units_text), after.format(units=units_text)))
+        self.data_points = sorted({rule.data_point for rule in rules})
+        # Sites whose own rule replaces the rule without a site, per (data_point, operator)
+        self.overridden = {}
+        for rule in rules:
+            if rule.site:
+                self.overridden.setdefault((rule.data_point, rule.operator), []).append(rule.site)
+
+    @classmethod
+    def load(cls, thresholds_path: str = THRESHOLDS_FILE, monitoring_path: str = MONITORING_FILE) -> 'RuleSet':
+        with open(monitoring_path, 'r', encoding='utf-8', newline='') as file:
+            # Descriptions contain unquoted commas, so units are taken from the end of each row
+            rows = list(csv.reader(file))[1:]
+            units = {row[0]: row[-2] for row in rows if len(row) >= 4}
+        with open(thresholds_path, 'r', encoding='utf-8', newline='') as file:
+            rules = [Rule(row['data_point'], row['operator'].strip(), float(row['threshold']),
+                          (row.get('site') or '').strip(), row['message'])
+                     for row in csv.DictReader(file)]
+        unknown = sorted({rule.data_point for rule in rules} - set(units))
+        if unknown:
+            logging.warning(f"Threshold rules for data points not in {monitoring_path}: {', '.join(unknown)}")
+        return cls(rules, units)
+
+    def evaluate(self, readings: Dict[str, Sequence[float]],
+                 sites: Union[None, str, Sequence[str]] = None) -> List[List[str]]:
+        """
+        Evaluate every rule over a batch of readings.
+        Args:
+            readings (Dict[str, Sequence[float]]): Equal-length value columns per data point.
+            sites (str or Sequence[str]): The site of every reading, one site for the whole batch, or None.
+        Returns:
+            List[List[str]]: The messages of the rules each reading breaks.
+        """
+        size = len(next(iter(readings.values()))) if readings else 0
+        messages: List[List[str]] = [[] for _ in range(size)]
+        site_column = None
+        if sites is not None:
+            site_column = np.asarray(sites if not isinstance(sites, str) else [sites] * size, dtype=object)
+
+        columns = {name: np.asarray(values, dtype=float) for name, values in readings.items()}
+        for rule, (before, after) in zip(self.rules, self.templates):
+            values = columns.get(rule.data_point)
+            if values is None:
+                continue
+            mask = OPERATORS[rule.operator](values, rule.threshold)
+            if rule.site:
+                if site_column is None:
+                    continue
+                mask &= site_column == rule.site
+            elif site_column is not None and (rule.data_point, rule.operator) in self.overridden:
+                mask &= ~np.isin(site_column, self.overridden[(rule.data_point, rule.operator)])
+
+            raw_values = readings[rule.data_point]
+            for row in np.flatnonzero(mask).tolist():
+                messages[row].append(before + str(raw_values[row]) + after)
+        return messages
+
+
+@lru_cache(maxsize=1)
+def load_rules(thresholds_path: str = THRESHOLDS_FILE, monitoring_path: str = MONITORING_FILE) -> RuleSet:
+    """Return the rule set, compiled once per process."""
+    return RuleSet.load(thresholds_path, monitoring_path)
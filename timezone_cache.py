@@ -0,0 +1,74 @@
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Dict
+
+from zoneinfo import ZoneInfo
+
+TIMEZONE_CACHE_FILE = os.path.join('cache', 'timezones.json')
+COORDINATE_PRECISION = 4  # decimal places, roughly 11 m
+
+_cache_lock = threading.Lock()
+_loaded_caches: Dict[str, Dict[str, str]] = {}
+
+
+def _load_cache(path: str) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, json.JSONDecodeError):
+        logging.warning(f"Ignoring unreadable timezone cache file {path}")
+        return {}
+
+
+def _save_cache(path: str, cache: Dict[str, str]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(cache, file, indent=4)
+    os.replace(tmp_path, path)
+
+
+def get_timezone_name(latitude: float, longitude: float, cache_file: str = TIMEZONE_CACHE_FILE) -> str:
+    """
+    Look up the IANA timezone name for a coordinate, using the persistent cache first.
+
+    TimezoneFinder (and its polygon data) is only imported and loaded on a cache miss.
+    Args:
+        latitude (float): Latitude of the location.
+        longitude (float): Longitude of the location.
+        cache_file (str): Path of the JSON cache file.
+    Returns:
+        str: The IANA timezone name.
+    """
+    key = f"{round(float(latitude), COORDINATE_PRECISION)},{round(float(longitude), COORDINATE_PRECISION)}"
+    with _cache_lock:
+        cache = _loaded_caches.get(cache_file)
+        if cache is None:
+            cache = _loaded_caches[cache_file] = _load_cache(cache_file)
+        tz_name = cache.get(key)
+        if tz_name:
+            return tz_name
+
+        tz_name = _timezone_finder().timezone_at(lat=float(latitude), lng=float(longitude))
+        if not tz_name:
+            raise Exception("Could not determine the timezone.")
+        cache[key] = tz_name
+        _save_cache(cache_file, cache)
+    logging.debug(f"Cached timezone {tz_name} for {key}")
+    return tz_name
+
+
+@lru_cache(maxsize=1)
+def _timezone_finder():
+    from timezonefinder import TimezoneFinder
+    return TimezoneFinder()
+
+
+def get_timezone(latitude: float, longitude: float) -> ZoneInfo:
+    """Return the ZoneInfo for a coordinate, see get_timezone_name."""
+    return ZoneInfo(get_timezone_name(latitude, longitude))
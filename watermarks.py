@@ -0,0 +1,174 @@
+import fcntl
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+WATERMARK_FILE = os.path.join('cache', 'watermarks.json')
+HOUR = timedelta(hours=1)
+
+
+def location_key(config: Dict, location: Dict) -> str:
+    """Key a location's watermarks by observer and rounded coordinates."""
+    return f"{config['encounter_id']}:{float(location['latitude']):.4f},{float(location['longitude']):.4f}"
+
+
+def merge_ranges(ranges: List[Tuple[date, date]], step: timedelta = timedelta(days=1)) -> List[Tuple[date, date]]:
+    """Sort inclusive ranges and merge the ones that overlap or touch, i.e. are at most `step` apart."""
+    ranges = sorted(ranges)
+    merged = ranges[:1]
+    for range_start, range_end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if range_start <= last_end + step:
+            merged[-1] = (last_start, max(last_end, range_end))
+        else:
+            merged.append((range_start, range_end))
+    return merged
+
+
+def merge_entries(current: Dict, other: Dict) -> Dict:
+    """Combine two records of one key: the union of their ranges and the later high watermark."""
+    merged = dict(other, **current)
+    ranges = [(date.fromisoformat(start), date.fromisoformat(end))
+              for entry in (current, other) for start, end in entry.get('ranges', [])]
+    if ranges:
+        merged['ranges'] = [[s.isoformat(), e.isoformat()] for s, e in merge_ranges(ranges)]
+    hours = [(datetime.fromisoformat(start), datetime.fromisoformat(end))
+             for entry in (current, other) for start, end in entry.get('hours', [])]
+    if hours:
+        merged['hours'] = [[s.isoformat(), e.isoformat()] for s, e in merge_ranges(hours, HOUR)]
+    watermarks = [entry['high_watermark'] for entry in (current, other) if entry.get('high_watermark')]
+    if watermarks:
+        merged['high_watermark'] = max(watermarks, key=datetime.fromisoformat)
+    return merged
+
+
+class WatermarkStore:
+    """
+    Persisted record of the date ranges that LogScale has acknowledged, per key.
+
+    Ranges are inclusive (start, end) dates, kept merged and sorted. Keys can
+    also carry a high watermark, the latest observation time sent, and the
+    acknowledged observation hours as inclusive (start, end) times. Callers
+    mark a range or advance a watermark only after its events have been
+    accepted, so a crash never records data that was not delivered.
+
+    04 and 05 share the file, so `save` merges with what other processes
+    saved meanwhile instead of overwriting it. Ranges and watermarks only
+    grow, so merging never loses a commit.
+    """
+
+    def __init__(self, path: str = WATERMARK_FILE):
+        self.path = path
+        self.data: Dict[str, Dict] = self.load()
+
+    def load(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError):
+            logging.warning(f"Ignoring unreadable watermark file {self.path}")
+            return {}
+
+    def covered(self, key: str) -> List[Tuple[date, date]]:
+        """Return the acknowledged date ranges for a key."""
+        return [(date.fromisoformat(start), date.fromisoformat(end))
+                for start, end in self.data.get(key, {}).get('ranges', [])]
+
+    def last_date(self, key: str):
+        """Return the last acknowledged date for a key, or None."""
+        ranges = self.covered(key)
+        return ranges[-1][1] if ranges else None
+
+    def missing(self, key: str, start: date, end: date) -> List[Tuple[date, date]]:
+        """
+        Return the parts of start..end (inclusive) that have not been acknowledged yet.
+        Args:
+            key (str): The location key.
+            start (date): First date of the requested range.
+            end (date): Last date of the requested range.
+        Returns:
+            List[Tuple[date, date]]: The gaps and missing suffix, in date order.
+        """
+        gaps = []
+        cursor = start
+        for covered_start, covered_end in self.covered(key):
+            if covered_end < cursor:
+                continue
+            if covered_start > end:
+                break
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start - timedelta(days=1)))
+            cursor = max(cursor, covered_end + timedelta(days=1))
+        if cursor <= end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def mark(self, key: str, start: date, end: date):
+        """Record start..end (inclusive) as acknowledged and persist the store."""
+        merged = merge_ranges(self.covered(key) + [(start, end)])
+        self.data.setdefault(key, {})['ranges'] = [[s.isoformat(), e.isoformat()] for s, e in merged]
+        self.save()
+
+    def high_watermark(self, key: str) -> Optional[datetime]:
+        """Return the latest acknowledged observation time for a key, or None."""
+        value = self.data.get(key, {}).get('high_watermark')
+        return datetime.fromisoformat(value) if value else None
+
+    def advance(self, key: str, observed: datetime, save: bool = True):
+        """Raise the key's high watermark to `observed` if it is later, and persist the store unless save is False."""
+        current = self.high_watermark(key)
+        if current is None or observed > current:
+            self.data.setdefault(key, {})['high_watermark'] = observed.isoformat()
+        if save:
+            self.save()
+
+    def covered_hours(self, key: str) -> List[Tuple[datetime, datetime]]:
+        """Return the acknowledged observation hours for a key as inclusive time ranges."""
+        return [(datetime.fromisoformat(start), datetime.fromisoformat(end))
+                for start, end in self.data.get(key, {}).get('hours', [])]
+
+    def mark_hours(self, key: str, observed: Iterable[datetime], save: bool = True):
+        """Record hourly observation times as acknowledged, and persist the store unless save is False."""
+        hours = merge_ranges(self.covered_hours(key) + [(time, time) for time in observed], HOUR)
+        self.data.setdefault(key, {})['hours'] = [[s.isoformat(), e.isoformat()] for s, e in hours]
+        if save:
+            self.save()
+
+    def acknowledged(self, key: str, observed: Iterable[datetime]) -> List[datetime]:
+        """
+        Return the observation times that LogScale has acknowledged for a key.
+
+        A time counts only if it is at or before the high watermark and inside
+        the acknowledged hours.
+        """
+        high_watermark = self.high_watermark(key)
+        if high_watermark is None:
+            return []
+        hours = self.covered_hours(key)
+        starts = [start for start, _ in hours]
+        acknowledged = []
+        for time in observed:
+            position = bisect_right(starts, time) - 1
+            if time <= high_watermark and position >= 0 and time <= hours[position][1]:
+                acknowledged.append(time)
+        return acknowledged
+
+    def save(self):
+        """Merge the store with the file on disk under an exclusive lock and write it atomically."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                for key, entry in self.load().items():
+                    self.data[key] = merge_entries(self.data[key], entry) if key in self.data else entry
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as file:
+                    json.dump(self.data, file, indent=4)
+                os.replace(tmp_path, self.path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,144 @@
+import fcntl
+import logging
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+WEATHER_STORE_DIR = 'weather_store'
+FREQUENCIES = {'daily': 'D', 'hourly': 'h'}
+DEFAULT_SETTLE_HOURS = 48  # Meteostat may still fill in or correct rows this recent
+
+
+class WeatherStore:
+    """
+    Local columnar store of fetched Meteostat data.
+
+    Frames are kept as they come from Meteostat (metric units, NaN for missing
+    values) in one Parquet file per granularity, station and month:
+    `<root>/<granularity>/<station_id>/<YYYY-MM>.parquet`. Reads are memory
+    mapped and push date-range filters and column selection down to Parquet,
+    so only the requested rows and columns are materialized.
+
+    Meteostat returns all-NaN placeholders for hours it has not published yet
+    and may revise recent rows, so rows with no values and rows newer than
+    `settle_hours` do not count as stored: they are fetched again and replaced.
+    """
+
+    def __init__(self, root: str = WEATHER_STORE_DIR, settle_hours: float = DEFAULT_SETTLE_HOURS):
+        self.root = root
+        self.settle_hours = settle_hours
+
+    def partition_path(self, granularity: str, station_id: str, month: str) -> str:
+        return os.path.join(self.root, granularity, str(station_id), f"{month}.parquet")
+
+    def months(self, start: datetime, end: datetime) -> List[str]:
+        return [period.strftime('%Y-%m') for period in pd.period_range(start, end, freq='M')]
+
+    def append(self, granularity: str, station_id: str, data: pd.DataFrame):
+        """
+        Merge a fetched frame into the station's monthly partitions.
+
+        Rows already in a partition are replaced by the newly fetched ones. Each
+        partition is read, merged and rewritten under an exclusive lock, so
+        threads and processes that append to the same month do not drop each
+        other's rows.
+        """
+        if data.empty:
+            return
+        data = data.rename_axis('time')
+        for month, rows in data.groupby(data.index.strftime('%Y-%m')):
+            path = self.partition_path(granularity, station_id, month)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(f"{path}.lock", 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    if os.path.exists(path):
+                        existing = pq.read_table(path, memory_map=True).to_pandas()
+                        rows = pd.concat([existing, rows])
+                        rows = rows[~rows.index.duplicated(keep='last')]
+                    rows = rows.sort_index()
+                    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+                    os.close(fd)
+                    try:
+                        pq.write_table(pa.Table.from_pandas(rows), tmp_path)
+                        os.replace(tmp_path, path)
+                    except BaseException:
+                        os.remove(tmp_path)
+                        raise
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(self, granularity: str, station_id: str, start: datetime, end: datetime,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Read the stored rows between start and end (inclusive).
+        Args:
+            granularity (str): 'daily' or 'hourly'.
+            station_id (str): The Meteostat station ID.
+            start (datetime): First timestamp to read.
+            end (datetime): Last timestamp to read.
+            columns (List[str]): Columns to read, all of them by default.
+        Returns:
+            pd.DataFrame: The stored rows, indexed by time.
+        """
+        filters = [('time', '>=', pd.Timestamp(start)), ('time', '<=', pd.Timestamp(end))]
+        read_columns = None if columns is None else ['time'] + [c for c in columns if c != 'time']
+        frames = []
+        for month in self.months(start, end):
+            path = self.partition_path(granularity, station_id, month)
+            if os.path.exists(path):
+                table = pq.read_table(path, columns=read_columns, filters=filters, memory_map=True)
+                frames.append(table.to_pandas())
+        if not frames:
+            return pd.DataFrame(index=pd.DatetimeIndex([], name='time'))
+        return pd.concat(frames).sort_index()
+
+    def settled(self, stored: pd.DataFrame) -> pd.Series:
+        """Return a mask of the stored rows that hold values and are older than the settle window."""
+        cutoff = pd.Timestamp(datetime.utcnow()) - pd.Timedelta(hours=self.settle_hours)
+        has_values = stored.notna().any(axis=1) if len(stored.columns) else pd.Series(False, index=stored.index)
+        return has_values & (stored.index <= cutoff)
+
+    def read_through(self, granularity: str, station_id: str, start: datetime, end: datetime,
+                     fetch: Callable[[datetime, datetime], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Return the rows between start and end, fetching only the ones the store lacks.
+
+        `fetch(first_missing, last_missing)` is called at most once, for the span
+        between the first and last timestamp that is not stored or not settled
+        yet, and the fetched rows replace the stored ones. The result is the
+        stored rows merged with the fetched ones, not a second read, so a
+        concurrent append to the same partitions cannot change it.
+        """
+        freq = FREQUENCIES[granularity]
+        stored = self.read(granularity, station_id, start, end)
+        expected = pd.date_range(pd.Timestamp(start).ceil(freq), pd.Timestamp(end).floor(freq), freq=freq)
+        missing = expected.difference(stored.index[self.settled(stored)])
+        if missing.empty:
+            logging.debug(f"Weather store hit for {station_id} {start} to {end}")
+            return stored
+
+        logging.debug(f"Weather store missing {len(missing)} of {len(expected)} rows for {station_id}; fetching")
+        fetched = fetch(missing[0].to_pydatetime(), missing[-1].to_pydatetime())
+        if fetched.empty:
+            return stored
+        self.append(granularity, station_id, fetched)
+        merged = pd.concat([stored, fetched.rename_axis('time')])
+        merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        return merged.loc[pd.Timestamp(start):pd.Timestamp(end)]
+
+
+def store_from_config(config: Dict[str, Any]) -> WeatherStore:
+    """
+    Build the weather store from the script configuration.
+    Args:
+        config (Dict[str, Any]): The loaded config.json contents.
+    Returns:
+        WeatherStore: The store, with `weather_store_settle_hours` as its settle window.
+    """
+    return WeatherStore(settle_hours=float(config.get('weather_store_settle_hours', DEFAULT_SETTLE_HOURS)))